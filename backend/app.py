@@ -1,24 +1,38 @@
+import base64
 import os
+import threading
 import warnings
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 # Set matplotlib backend to 'Agg' before importing matplotlib
 import matplotlib
-import numpy as np
 import pandas as pd
-from flask import Flask, jsonify
+from flask import Flask, Response, abort, jsonify, request, url_for
 from flask_cors import CORS
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score
-from sklearn.model_selection import train_test_split
-from sqlalchemy import create_engine
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 
-matplotlib.use('Agg')  # Non-interactive backend that doesn't require Tkinter
-import matplotlib.pyplot as plt
+from data_access import DatasetAccess, partition_spec
+from dataset_schema import STRESS_LEVEL_SCHEMA
+from dataset_cache import DatasetCache
+from evaluation import downsample_curve, ensure_evaluation, kde_grids
+from forest_engine import ENGINE_COMPILED, ENGINES, compile_and_benchmark, scoring_model
+from local_mirror import read_mirror
+from hive_pool import CircuitBreaker, create_hive_engine, ping, pool_stats
+from instrumentation import in_current_context, init_app, log_event, metrics, numeric_stats, observe_stage, span
+from micro_batcher import MicroBatcher
+from model_plots import PLOT_FORMATS, PLOT_SPECS, PlotRenderer, render_error_image
+from model_registry import ModelRegistry
+from plot_cache import PlotCache, content_etag, plot_key
+from prediction import PredictionError, parse_records, predict_proba, to_feature_matrix
+from profiling import Profiler, ProfileStore, add_memory_reports, memory_requested
+from serving import ReloadGuard, Warmup
+from model_tuning import SEARCH_METHODS
+from training_jobs import TRAINING_MODES, TrainingJobQueue
+from training_parallelism import TrainingParallelism
 
-import base64
-import seaborn as sns
-from sklearn.metrics import confusion_matrix, classification_report
+matplotlib.use('Agg')  # Non-interactive backend that doesn't require Tkinter
 
 # 忽略警告
 warnings.filterwarnings("ignore", category=UserWarning)
@@ -32,8 +46,98 @@ HIVE_PORT = 10005        # 默认端口，请根据实际情况修改
 HIVE_USER = '24130'      # 如果需要用户名，请填写
 HIVE_DATABASE = 'default'  # 默认数据库名，请根据实际情况修改
 
-# 创建 SQLAlchemy 引擎
-engine = create_engine(f'hive://{HIVE_USER}@{HIVE_HOST}:{HIVE_PORT}/{HIVE_DATABASE}')
+# Hive连接池与熔断配置
+HIVE_POOL_SIZE = 5             # 常驻连接数
+HIVE_MAX_OVERFLOW = 10         # 高峰时允许额外创建的连接数
+HIVE_POOL_TIMEOUT = 10         # 等待空闲连接的最长秒数
+HIVE_POOL_RECYCLE = 1800       # 连接最长存活秒数
+HIVE_POOL_PRE_PING = True      # 借出连接前探活
+HIVE_CONNECT_TIMEOUT = 3       # 建立连接的超时秒数
+HIVE_QUERY_TIMEOUT = 60        # 单条查询的超时秒数
+HIVE_BREAKER_FAILURES = 3      # 连续失败多少次后熔断，直接使用本地数据
+HIVE_BREAKER_PROBE_INTERVAL = 10  # 熔断期间后台探测Hive的间隔（秒）
+
+# Hive数据表配置
+DATASET_TABLE = 'stress_level_dataset'
+DATASET_INVALID_ROWS = 'drop'  # 缺失、非整数或超出取值范围的行：'drop' 丢弃，'raise' 报错
+DATASET_PARTITION_FILTER = {}  # 只读取指定分区，如 {'ingest_date': '2026-10-18'}；为空表示读取全部分区
+
+# 数据集缓存配置
+DATASET_CACHE_TTL = 600        # 数据快照最长存活时间（秒）
+DATASET_PROBE_INTERVAL = 30    # 两次新鲜度探测的最短间隔（秒）
+DATASET_PROBE_PARTITIONS = 3   # 分区表探测时读取元数据的最新分区数量
+PARTITION_PROBE_PARAMETERS = ('transient_lastDdlTime', 'numFiles', 'totalSize')  # 分区元数据中用于判断变化的参数
+
+# 图表缓存配置
+PLOT_CACHE_MAX_BYTES = 128 * 1024 * 1024  # 内存缓存字节上限
+PLOT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plot_store')  # 磁盘缓存目录，None 表示不启用
+PLOT_MIN_DPI = 50
+PLOT_MAX_DPI = 300
+PLOT_WORKERS = None          # 图表渲染进程数，None 表示CPU核数，0 表示在请求线程内渲染
+PLOT_RENDER_TIMEOUT = 60     # 单个图表渲染超时时间（秒）
+
+# 指标接口配置
+METRICS_ROC_POINTS = 100     # ROC曲线默认重采样点数
+METRICS_KDE_POINTS = 64      # 核密度估计默认网格点数
+METRICS_TOP_FEATURES = 4     # 默认计算核密度估计的重要特征数量
+METRICS_MAX_POINTS = 1000    # 客户端可请求的最大点数
+
+# 在线预测微批处理配置
+PREDICT_BATCH_MAX_ROWS = 1024    # 合并推理的最大行数
+PREDICT_BATCH_MAX_WAIT_MS = 2.0  # 第一个请求进入队列后最多等待的毫秒数
+
+# 超参数搜索配置
+TUNING_WORKERS = None          # 交叉验证并行进程数，None 表示每个训练任务的CPU预算
+TUNING_MAX_TIME_BUDGET = 3600  # 单次搜索允许的最长时间预算（秒），请求未指定时也使用该值
+
+# 运行时指标与结构化日志
+REQUEST_LOGS = True          # 每个请求输出一行包含请求ID与各阶段耗时的JSON日志
+
+# 请求ID、请求/阶段耗时直方图与 Prometheus 格式的 /metrics 接口
+init_app(app, request_logs=REQUEST_LOGS)
+
+# 按需性能剖析：带 X-Profile 请求头（cprofile 或 sampling）与管理令牌的请求，或管理员开启抽样后随机选中的请求
+PROFILING_ADMIN_TOKEN = os.environ.get('PROFILING_ADMIN_TOKEN')  # 管理令牌，未设置时剖析与管理接口均关闭
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profile_store')  # 剖析结果目录
+PROFILE_MAX_FILES = 200      # 最多保留的剖析结果数，超过时删除最旧的
+profiler = Profiler(ProfileStore(PROFILE_DIR, max_profiles=PROFILE_MAX_FILES), admin_token=PROFILING_ADMIN_TOKEN)
+profiler.init_app(app)
+
+# 创建带连接池的 SQLAlchemy 引擎
+engine = create_hive_engine(f'hive://{HIVE_USER}@{HIVE_HOST}:{HIVE_PORT}/{HIVE_DATABASE}',
+                            pool_size=HIVE_POOL_SIZE, max_overflow=HIVE_MAX_OVERFLOW,
+                            pool_timeout=HIVE_POOL_TIMEOUT, pool_recycle=HIVE_POOL_RECYCLE,
+                            pool_pre_ping=HIVE_POOL_PRE_PING, connect_timeout=HIVE_CONNECT_TIMEOUT,
+                            query_timeout=HIVE_QUERY_TIMEOUT)
+
+# Hive熔断器：连续失败后所有读取直接走本地数据，后台探测到Hive恢复后再切回
+hive_breaker = CircuitBreaker(lambda: ping(engine), failure_threshold=HIVE_BREAKER_FAILURES,
+                              probe_interval=HIVE_BREAKER_PROBE_INTERVAL, name='hive')
+
+# 模型仓库：启动时加载当前版本，只读接口直接使用，不再重复训练
+model_registry = ModelRegistry()
+current_record = model_registry.load_current()
+if current_record is not None:
+    # 旧版本没有保存评估结果时补算一次并持久化
+    ensure_evaluation(current_record, model_registry)
+
+# 后台训练任务队列：训练在独立进程中执行，不占用请求线程
+TRAINING_WORKERS = 1
+# 训练并行度：可用CPU核数在所有Web工作进程的训练任务之间平分，避免同时训练时超额占用主机
+TRAINING_BACKEND = 'threads'   # 'threads' 线程并行（共享数据），'processes' 进程并行
+TRAINING_N_JOBS = None         # 每个训练任务的并行度上限，None 表示使用全部CPU预算
+TRAINING_MAX_MEMORY_MB = None  # 每个训练任务的内存上限（MB），None 表示不限制
+WEB_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))  # Web服务工作进程数（与 gunicorn 的 WEB_CONCURRENCY 一致）
+training_parallelism = TrainingParallelism(backend=TRAINING_BACKEND, n_jobs=TRAINING_N_JOBS,
+                                           max_memory_mb=TRAINING_MAX_MEMORY_MB, web_workers=WEB_WORKERS,
+                                           training_workers=TRAINING_WORKERS)
+# 进行中的训练任务与图表预渲染在此登记，gunicorn 主进程在登记期间推迟平滑重启（见 gunicorn.conf.py）
+reload_guard = ReloadGuard(os.path.join(model_registry.root_dir, 'reload_holds'))
+training_jobs = TrainingJobQueue(model_registry.root_dir, max_workers=TRAINING_WORKERS,
+                                 parallelism=training_parallelism, reload_guard=reload_guard)
+
+# 渲染后的图表缓存，按模型版本与图表参数区分
+plot_cache = PlotCache(max_bytes=PLOT_CACHE_MAX_BYTES, disk_dir=PLOT_CACHE_DIR)
 
 # 特征名称映射字典（英文到中文）
 feature_name_mapping = {
@@ -60,42 +164,118 @@ feature_name_mapping = {
     'stress_level': '压力水平'
 }
 
+# 图表渲染引擎：各图表在进程池中并行渲染，互不影响
+plot_renderer = PlotRenderer(model_registry.root_dir, max_workers=PLOT_WORKERS,
+                             timeout=PLOT_RENDER_TIMEOUT, feature_labels=feature_name_mapping)
+# 请求侧的并发度，用于同时提交多个图表并等待结果
+plot_request_pool = ThreadPoolExecutor(max_workers=len(PLOT_SPECS) * 2)
+
 def read_from_hive(query):
-    """从Hive读取数据"""
+    """从Hive读取数据，失败或熔断时抛出异常（由数据访问层回退到本地数据）"""
+    with span('hive_query'):
+        return hive_breaker.call(pd.read_sql, query, engine)
+
+def read_local_fallback():
+    """从本地数据读取：优先内存映射Arrow镜像，其次CSV文件"""
     try:
-        df = pd.read_sql(query, engine)
-        # 去掉列名中的表名前缀
-        df.columns = [col.split('.')[-1] for col in df.columns]
-        return df
-    except Exception as e:
-        print(f"从Hive读取数据时出错: {e}")
-        # 尝试从本地CSV文件读取数据作为备选方案
-        try:
-            csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ShapCompatibleDataset.csv')
-            if os.path.exists(csv_path):
-                print(f"尝试从本地CSV文件读取数据: {csv_path}")
-                return pd.read_csv(csv_path)
-            else:
-                print(f"本地CSV文件不存在: {csv_path}")
-                return None
-        except Exception as csv_e:
-            print(f"从本地CSV文件读取数据时出错: {csv_e}")
+        df = read_mirror()
+        if df is not None:
+            print("从本地Arrow镜像读取数据")
+            return df
+    except Exception as mirror_e:
+        print(f"从本地Arrow镜像读取数据时出错: {mirror_e}")
+
+    # 尝试从本地CSV文件读取数据作为备选方案
+    try:
+        csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'ShapCompatibleDataset.csv')
+        if os.path.exists(csv_path):
+            print(f"尝试从本地CSV文件读取数据: {csv_path}")
+            return pd.read_csv(csv_path)
+        else:
+            print(f"本地CSV文件不存在: {csv_path}")
             return None
+    except Exception as csv_e:
+        print(f"从本地CSV文件读取数据时出错: {csv_e}")
+        return None
+
+def probe_dataset_version():
+    """
+    廉价的数据新鲜度探测：只读取元数据，不扫描数据。
+
+    向已有的分区表加载分区时表级的 transient_lastDdlTime 不一定变化，因此分区表还要读取
+    参与读取的分区列表（新增、删除分区），以及其中最新几个分区的元数据（覆盖写入已有分区）。
+    """
+    def show_metadata():
+        with engine.connect() as conn:
+            rows = conn.execute(text(f"SHOW TBLPROPERTIES {DATASET_TABLE}('transient_lastDdlTime')")).fetchall()
+            try:
+                names = [row[0] for row in conn.execute(text(f"SHOW PARTITIONS {DATASET_TABLE}")).fetchall()]
+            except DBAPIError:
+                return rows  # 非分区表
+            partitions = dataset_access.selected_partitions(names)
+            rows += [tuple(sorted(partition.items())) for partition in partitions]
+            for partition in partitions[-DATASET_PROBE_PARTITIONS:]:
+                described = conn.execute(text(
+                    f"DESCRIBE FORMATTED {DATASET_TABLE} PARTITION ({partition_spec(partition)})")).fetchall()
+                rows += [tuple(row) for row in described
+                         if any(str(cell).strip() in PARTITION_PROBE_PARAMETERS for cell in row)]
+            return rows
+    with span('freshness_probe'):
+        rows = hive_breaker.call(show_metadata)
+    return tuple(tuple(row) for row in rows)
+
+# 数据集结构：各列的类型与取值范围，读取时校验并转换为紧凑类型（如 int64 -> uint8）
+dataset_schema = STRESS_LEVEL_SCHEMA.select(feature_name_mapping)
+
+# 数据访问层：只查询需要的列，过滤与聚合下推到Hive，Hive不可用时在本地数据上计算
+dataset_access = DatasetAccess(DATASET_TABLE, columns=dataset_schema.names, read_sql=read_from_hive,
+                               fallback=read_local_fallback, partition_filter=DATASET_PARTITION_FILTER,
+                               schema=dataset_schema, on_invalid=DATASET_INVALID_ROWS)
+
+# 进程级数据集缓存：并发请求共享同一次加载，表未变化时不再重复查询Hive
+dataset_cache = DatasetCache(
+    loader=dataset_access.load,
+    probe=probe_dataset_version,
+    ttl=DATASET_CACHE_TTL,
+    probe_interval=DATASET_PROBE_INTERVAL,
+    name=DATASET_TABLE
+)
+
+# 数据摘要只缓存 stress_level 的分组计数（GROUP BY 在Hive上执行），与数据集共用新鲜度探测
+summary_cache = DatasetCache(
+    loader=lambda: dataset_access.value_counts('stress_level'),
+    probe=probe_dataset_version,
+    ttl=DATASET_CACHE_TTL,
+    probe_interval=DATASET_PROBE_INTERVAL,
+    name=f'{DATASET_TABLE}:summary'
+)
+
+# 启动时用本地镜像预热缓存（毫秒级），之后探测到Hive可用时再刷新
+try:
+    dataset_cache.prime(dataset_access.conform(read_mirror()))
+except Exception as e:
+    print(f"从本地Arrow镜像预热数据缓存时出错: {e}")
+
+def load_dataset():
+    """从缓存获取完整数据集快照（只读使用，请勿原地修改）"""
+    return dataset_cache.get()
 
 @app.route('/api/data-summary', methods=['GET'])
 def get_data_summary():
-    """获取数据摘要信息，而不是完整数据"""
+    """获取数据摘要信息，而不是完整数据（只查询分组计数，不读取整张表）"""
     try:
-        query = "SELECT * FROM stress_level_dataset"
-        df = read_from_hive(query)
+        counts = summary_cache.get()
 
-        if df is not None:
+        if counts is not None:
+            counts = counts.sort_values('count', ascending=False)
+            features = [col for col in dataset_access.columns if col != 'stress_level']
             # 计算摘要统计信息
             summary = {
-                '数据总行数': len(df),
-                '特征数量': len(df.columns) - 1,  # 减去目标列
-                '特征列表': [feature_name_mapping.get(col, col) for col in df.columns if col != 'stress_level'],
-                '压力水平分布': df['stress_level'].value_counts().to_dict()
+                '数据总行数': int(counts['count'].sum()),
+                '特征数量': len(features),
+                '特征列表': [feature_name_mapping.get(col, col) for col in features],
+                '压力水平分布': {(level.item() if hasattr(level, 'item') else level): int(count)
+                           for level, count in zip(counts['stress_level'], counts['count'])}
             }
             
             return jsonify({
@@ -113,192 +293,294 @@ def get_data_summary():
             'message': f'发生错误: {str(e)}'
         }), 500
 
-def train_random_forest_model(target_column='stress_level'):
+@app.route('/api/hive-status', methods=['GET'])
+def get_hive_status():
+    """获取Hive连接池与熔断器状态"""
+    return jsonify({
+        'status': 'success',
+        'pool': pool_stats(engine),
+        'breaker': hive_breaker.stats()
+    }), 200
+
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """获取数据集缓存的命中/未命中/刷新统计"""
+    return jsonify({
+        'status': 'success',
+        'dataset_cache': dataset_cache.stats(),
+        'summary_cache': summary_cache.stats(),
+        'plot_cache': plot_cache.stats()
+    }), 200
+
+@app.route('/api/train-model', methods=['POST'])
+def train_model():
     """
-    训练随机森林分类模型。
+    提交随机森林模型训练任务，立即返回任务ID，可通过 /api/jobs/<job_id> 查询进度。
 
-    :param target_column: 目标列名称，默认为 'stress_level'
-    :return: 训练好的模型、可用特征列表和模型准确率
+    请求体可选 {"mode": "full" | "incremental", "baseline": true}：incremental 只在自当前版本以来
+    新增的行上追加决策树，baseline 为 true 时同时全量重训并比较准确率。
     """
-    query = "SELECT * FROM stress_level_dataset"
-    df = read_from_hive(query)
+    options = request.get_json(silent=True) or {}
+    mode = options.get('mode', 'full')
+    if mode not in TRAINING_MODES:
+        return jsonify({
+            'status': 'error',
+            'message': f'mode 必须是以下之一: {", ".join(TRAINING_MODES)}'
+        }), 400
+
+    df = load_dataset()
     if df is None or df.empty:
-        print("无法获取数据或数据为空")
-        return None, None, None, None
-
-    # 筛选特征列和目标列
-    features = [col for col in df.columns if col != target_column]
-    if not features:
-        print("没有可用的特征列")
-        return None, None, None, None
-
-    X = df[features]
-    y = df[target_column]
-
-    # 划分训练集和测试集
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    # 创建并训练随机森林模型
-    model = RandomForestClassifier(n_estimators=300, random_state=42, max_depth=5)
-    model.fit(X_train, y_train)
-
-    # 模型评估
-    y_pred = model.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    print(f"模型准确率: {accuracy}")
-
-    return model, features, accuracy, X_test
-
-def plot_to_base64(plt):
-    """将matplotlib图表转换为base64编码的字符串"""
-    # 设置中文字体支持
-    plt.rcParams['font.sans-serif'] = ['SimHei']  # 使用黑体
-    plt.rcParams['axes.unicode_minus'] = False    # 解决负号显示问题
-    
-    buf = BytesIO()
-    plt.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-    buf.seek(0)
-    img_str = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close('all')  # 关闭所有图表，避免内存泄漏
-    return img_str
-
-def generate_model_plots(model, X_test, y_test, feature_names):
-    """生成模型可视化图表"""
-    plots = {
-        'feature_importance': "",
-        'confusion_matrix': "",
-        'feature_distribution': "",
-        'classification_report': "",
-        'auc_roc_curve': ""          #  AUC-ROC 曲线
-    }
-    
+        return jsonify({
+            'status': 'error',
+            'message': '模型训练失败，无法获取数据或数据为空'
+        }), 500
+
+    # 训练在工作进程中异步执行：被剖析的请求让该任务记录内存分配，报告见任务结果的 memory_profile
+    job, created = training_jobs.submit(df, dataset_key=dataset_cache.generation, mode=mode,
+                                        baseline=bool(options.get('baseline')), profile_memory=memory_requested())
+    print(f"{'已提交' if created else '复用进行中的'}训练任务: {job.job_id}")
+
+    return jsonify({
+        'status': 'success',
+        'message': '训练任务已提交' if created else '相同的训练任务正在进行中',
+        'job_id': job.job_id,
+        'status_url': f'/api/jobs/{job.job_id}'
+    }), 202
+
+@app.route('/api/tune', methods=['POST'])
+def tune_model():
+    """
+    提交超参数搜索任务，完成后用最佳参数训练并注册新的模型版本，可通过 /api/jobs/<job_id> 查询进度。
+
+    请求体可选 {"method": "grid" | "halving", "param_grid": {...}, "cv": 5, "time_budget": 600,
+    "patience": 5, "target_score": 0.9}。
+    """
+    options = request.get_json(silent=True) or {}
+    method = options.get('method', 'grid')
+    if method not in SEARCH_METHODS:
+        return jsonify({
+            'status': 'error',
+            'message': f'method 必须是以下之一: {", ".join(SEARCH_METHODS)}'
+        }), 400
+
+    param_grid = options.get('param_grid')
+    if param_grid is not None and (not isinstance(param_grid, dict) or not param_grid
+                                   or not all(isinstance(v, list) and v for v in param_grid.values())):
+        return jsonify({
+            'status': 'error',
+            'message': 'param_grid 必须是 {参数名: 非空候选值列表}'
+        }), 400
+
     try:
-        # 1. 特征重要性图
-        plt.figure(figsize=(10, 8))
-        importances = model.feature_importances_
-        indices = np.argsort(importances)[::-1]
-        
-        # 使用中文特征名称
-        chinese_feature_names = [feature_name_mapping.get(feature_names[i], feature_names[i]) for i in indices]
-        
-        plt.barh(range(len(indices)), importances[indices])
-        plt.yticks(range(len(indices)), chinese_feature_names)
-        plt.xlabel('特征重要性')
-        plt.title('随机森林特征重要性')
-        plots['feature_importance'] = plot_to_base64(plt)
-        
-        # 2. 混淆矩阵
-        plt.figure(figsize=(8, 6))
-        y_pred = model.predict(X_test)
-        cm = confusion_matrix(y_test, y_pred)
-        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
-        plt.xlabel('预测标签')
-        plt.ylabel('真实标签')
-        plt.title('混淆矩阵')
-        plots['confusion_matrix'] = plot_to_base64(plt)
-        
-        # 3. 特征分布图 (原 roc_curve)
-        plt.figure(figsize=(12, 8))
-        # 选择前4个最重要的特征
-        top_features = [feature_names[i] for i in indices[:4]]
-        top_features_chinese = [feature_name_mapping.get(feature, feature) for feature in top_features]
-        
-        for i, feature in enumerate(top_features):
-            plt.subplot(2, 2, i+1)
-            for target_value in np.unique(y_test):
-                sns.kdeplot(X_test[X_test.index.isin(y_test[y_test == target_value].index)][feature], 
-                           label=f'压力等级 {target_value}')
-            plt.title(f'特征: {top_features_chinese[i]}')
-            plt.xlabel(top_features_chinese[i])
-            plt.legend()
-        
-        plt.tight_layout()
-        plots['feature_distribution'] = plot_to_base64(plt) # 修改键名
-        
-        # 4. 分类报告图 (原 learning_curve)
-        plt.figure(figsize=(10, 6))
-        
-        # 计算每个类别的准确率
-        report = classification_report(y_test, y_pred, output_dict=True)
-        classes = list(report.keys())[:-3]  # 排除 'accuracy', 'macro avg', 'weighted avg'
-        
-        metrics = ['precision', 'recall', 'f1-score']
-        metrics_chinese = ['精确率', '召回率', 'F1分数']
-        x = np.arange(len(classes))
-        width = 0.25
-        
-        for i, metric in enumerate(metrics):
-            values = [report[cls][metric] for cls in classes]
-            plt.bar(x + i*width, values, width, label=metrics_chinese[i])
-        
-        plt.xlabel('压力等级')
-        plt.ylabel('得分')
-        plt.title('各压力等级的分类性能')
-        plt.xticks(x + width, classes)
-        plt.legend()
-        plt.ylim(0, 1)
-        
-        plots['classification_report'] = plot_to_base64(plt) # 修改键名
+        cv = int(options.get('cv', 5))
+        time_budget = min(float(options.get('time_budget') or TUNING_MAX_TIME_BUDGET), TUNING_MAX_TIME_BUDGET)
+        patience = int(options['patience']) if options.get('patience') is not None else None
+        target_score = float(options['target_score']) if options.get('target_score') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({
+            'status': 'error',
+            'message': 'cv、time_budget、patience、target_score 必须是数值'
+        }), 400
+    if cv < 2:
+        return jsonify({
+            'status': 'error',
+            'message': 'cv 至少为 2'
+        }), 400
 
-        # 5. AUC-ROC 曲线图 (新增)
-        # generate_auc_roc_plot 函数内部会处理 plt.close()，所以这里不需要额外关闭
-        # 它也内部处理了中文字体，如果需要的话
-        plots['auc_roc_curve'] = generate_auc_roc_plot(model, X_test, y_test)
-        
+    df = load_dataset()
+    if df is None or df.empty:
+        return jsonify({
+            'status': 'error',
+            'message': '超参数搜索失败，无法获取数据或数据为空'
+        }), 500
+
+    job, created = training_jobs.submit_tuning(df, dataset_key=dataset_cache.generation, options={
+        'param_grid': param_grid,
+        'method': method,
+        'cv': cv,
+        'n_jobs': TUNING_WORKERS,
+        'time_budget': time_budget,
+        'patience': patience,
+        'target_score': target_score,
+    }, profile_memory=memory_requested())
+    print(f"{'已提交' if created else '复用进行中的'}超参数搜索任务: {job.job_id}")
+
+    return jsonify({
+        'status': 'success',
+        'message': '超参数搜索任务已提交' if created else '相同的超参数搜索任务正在进行中',
+        'job_id': job.job_id,
+        'status_url': f'/api/jobs/{job.job_id}'
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询训练任务的状态、进度与结果"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'训练任务不存在: {job_id}'
+        }), 404
+
+    result = job['result']
+    if result is not None:
+        # 将特征重要性与特征名称配对并排序（使用中文特征名称）
+        importance_pairs = sorted(zip(result['features'], result['feature_importance']),
+                                  key=lambda x: x[1], reverse=True)
+        job['result'] = {
+            'message': '模型训练成功',
+            'model_version': result['model_version'],
+            'accuracy': result['accuracy'],
+            'lineage': result.get('lineage'),
+            'search': result.get('search'),
+            'resources': result.get('resources'),
+            'memory_profile': result.get('memory_profile'),
+            'feature_importance': {feature_name_mapping.get(name, name): importance
+                                   for name, importance in importance_pairs}
+        }
+
+    return jsonify({
+        'status': 'success',
+        'job': job,
+        'parallelism': training_parallelism.to_dict()
+    }), 200
+
+# 并发的小批量预测请求合并为一次向量化推理
+prediction_batcher = MicroBatcher(predict_proba, max_batch_rows=PREDICT_BATCH_MAX_ROWS,
+                                  max_wait_ms=PREDICT_BATCH_MAX_WAIT_MS)
+
+@app.route('/api/predict', methods=['POST'])
+def predict():
+    """
+    使用当前模型预测压力水平。
+
+    请求体可以是单条记录（JSON对象）、批量记录（JSON数组、CSV 或 Arrow IPC），
+    每条记录需包含模型的全部特征；返回每条记录的预测类别与各类别概率。
+    """
+    record = model_registry.current()
+    if record is None:
+        return jsonify({
+            'status': 'error',
+            'message': '无法进行预测，请先训练模型'
+        }), 500
+
+    try:
+        with span('parse_records'):
+            df = parse_records(request.get_data(), request.mimetype)
+            X = to_feature_matrix(df, record.features)
+    except PredictionError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    try:
+        with span('predict_proba'):
+            predictions, proba = prediction_batcher.predict(scoring_model(record), X)
     except Exception as e:
-        print(f"生成图表时出错: {str(e)}")
-        # 创建一个错误信息图
-        plt.figure(figsize=(10, 6))
-        plt.text(0.5, 0.5, f"生成图表时出错: {str(e)}", 
-                horizontalalignment='center', verticalalignment='center', fontsize=12)
-        plt.axis('off')
-        error_img = plot_to_base64(plt)
-        
-        # 将所有图表设置为错误图
-        for key in plots:
-            if not plots[key]:  # 如果该图表还没有生成
-                plots[key] = error_img
-    
-    return plots
+        print(f"预测时出错: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'预测时发生错误: {str(e)}'
+        }), 500
 
-@app.route('/api/train-model', methods=['POST'])
-def train_model():
-    """触发随机森林模型训练"""
-    model, features, accuracy, _ = train_random_forest_model()
-    if model is None:
+    return jsonify({
+        'status': 'success',
+        'model_version': record.version,
+        'inference_engine': record.inference_engine,
+        'classes': record.model.classes_.tolist(),
+        'predictions': predictions.tolist(),
+        'probabilities': proba.round(6).tolist()
+    }), 200
+
+@app.route('/api/predict/stats', methods=['GET'])
+def get_predict_stats():
+    """获取预测微批处理的队列深度与批处理统计"""
+    return jsonify({
+        'status': 'success',
+        'prediction_batcher': prediction_batcher.stats()
+    }), 200
+
+def resolve_model_version(model_version):
+    """将 current 别名解析为当前版本号，尚未训练任何模型时返回 None"""
+    if model_version == 'current':
+        return model_registry.current_version()
+    return model_version
+
+@app.route('/api/models/<model_version>/engine', methods=['GET', 'PUT'])
+def model_engine(model_version):
+    """
+    查看或切换模型版本在线预测使用的推理引擎（sklearn 或 compiled）。
+
+    切换到 compiled 时先编译并在留出测试集上校验输出与 sklearn 逐位一致，
+    同时测量两种引擎的吞吐量；校验不通过则拒绝切换。model_version 为 current 时作用于当前版本。
+    """
+    version = resolve_model_version(model_version)
+    record = model_registry.get(version) if version is not None else None
+    if record is None:
         return jsonify({
             'status': 'error',
-            'message': '模型训练失败，无法获取数据或数据为空'
+            'message': f'模型版本不存在: {model_version}'
+        }), 404
+
+    if request.method == 'GET':
+        return jsonify({
+            'status': 'success',
+            'model_version': record.version,
+            'inference_engine': record.inference_engine,
+            'engines': list(ENGINES),
+            'report': record.engine_report
+        }), 200
+
+    engine_name = (request.get_json(silent=True) or {}).get('engine')
+    if engine_name not in ENGINES:
+        return jsonify({
+            'status': 'error',
+            'message': f'engine 必须是以下之一: {", ".join(ENGINES)}'
+        }), 400
+
+    report = None
+    try:
+        if engine_name == ENGINE_COMPILED:
+            compiled, report = compile_and_benchmark(record.model, record.X_test)
+            if not report['verified']:
+                return jsonify({
+                    'status': 'error',
+                    'message': '编译后的模型输出与 sklearn 不一致，未切换推理引擎',
+                    'report': report
+                }), 409
+            record.compiled_forest = compiled
+            print(f"模型版本 {record.version} 已编译，推理吞吐量提升 {report['speedup']:.1f} 倍")
+        model_registry.set_inference_engine(record.version, engine_name, report)
+    except Exception as e:
+        print(f"切换推理引擎时出错: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'切换推理引擎时发生错误: {str(e)}'
         }), 500
-    
-    # 获取特征重要性
-    feature_importance = model.feature_importances_
-    # 将特征重要性与特征名称配对并排序
-    importance_pairs = sorted(zip(features, feature_importance), key=lambda x: x[1], reverse=True)
-    
-    # 构建返回数据（使用中文特征名称）
-    result = {
+
+    return jsonify({
         'status': 'success',
-        'message': '模型训练成功',
-        'accuracy': accuracy,
-        'feature_importance': {feature_name_mapping.get(name, name): float(importance) for name, importance in importance_pairs}
-    }
-    
-    return jsonify(result), 200
+        'model_version': record.version,
+        'inference_engine': record.inference_engine,
+        'report': record.engine_report
+    }), 200
 
 @app.route('/api/model-info', methods=['GET'])
 def get_model_info():
     """获取模型信息"""
     try:
-        model, features, accuracy, _ = train_random_forest_model()
-        if model is None:
+        record = model_registry.current()
+        if record is None:
             return jsonify({
                 'status': 'error',
                 'message': '无法获取模型信息，请先训练模型'
             }), 500
+        model, features, accuracy = record.model, record.features, record.accuracy
         
         # 获取特征重要性
-        feature_importance = model.feature_importances_
+        with span('feature_importance'):
+            feature_importance = model.feature_importances_
         # 将特征重要性与特征名称配对并排序
         importance_pairs = sorted(zip(features, feature_importance), key=lambda x: x[1], reverse=True)
         
@@ -306,6 +588,9 @@ def get_model_info():
         result = {
             'status': 'success',
             'model_type': '随机森林分类器',
+            'model_version': record.version,
+            'inference_engine': record.inference_engine,
+            'lineage': record.lineage,
             'n_estimators': model.n_estimators,
             'accuracy': accuracy,
             'feature_count': len(features),
@@ -320,63 +605,126 @@ def get_model_info():
             'message': f'获取模型信息时发生错误: {str(e)}'
         }), 500
 
+def _round_list(values, digits=4):
+    return [round(v, digits) if v is not None else None for v in values]
+
+@lru_cache(maxsize=64)
+def build_metrics_payload(model_version, roc_points, kde_points, top_features):
+    """
+    构造指定模型版本的原始评估数据，供前端自行绘图。
+
+    同一模型版本的结果不会改变，因此按参数缓存。
+    :return: 可JSON序列化的字典；版本不存在时返回 None
+    """
+    record = model_registry.get(model_version)
+    if record is None:
+        return None
+    metrics = ensure_evaluation(record, model_registry)
+
+    # ROC曲线重采样到指定点数
+    def compact_curve(curve):
+        curve = downsample_curve(curve, roc_points)
+        return {'fpr': _round_list(curve['fpr']), 'tpr': _round_list(curve['tpr']),
+                'auc': round(curve['auc'], 4)}
+
+    report = metrics['classification_report']
+    class_names = [str(cls) for cls in metrics['classes']]
+
+    importances = record.model.feature_importances_
+    order = sorted(range(len(record.features)), key=lambda i: importances[i], reverse=True)
+    top = [record.features[i] for i in order[:top_features]]
+
+    return {
+        'model_version': record.version,
+        'classes': metrics['classes'],
+        'n_test': metrics['n_test'],
+        'accuracy': metrics['accuracy'],
+        'confusion_matrix': metrics['confusion_matrix'],
+        'classification_report': {
+            'classes': class_names,
+            'precision': _round_list([report[cls]['precision'] for cls in class_names]),
+            'recall': _round_list([report[cls]['recall'] for cls in class_names]),
+            'f1_score': _round_list([report[cls]['f1-score'] for cls in class_names]),
+            'support': [report[cls]['support'] for cls in class_names],
+        },
+        'roc': {
+            'per_class': {cls: compact_curve(curve) for cls, curve in metrics['roc']['per_class'].items()},
+            'micro': compact_curve(metrics['roc']['micro']),
+            'macro': compact_curve(metrics['roc']['macro']),
+        },
+        'feature_importance': {
+            'features': [record.features[i] for i in order],
+            'names': [feature_name_mapping.get(record.features[i], record.features[i]) for i in order],
+            'importance': _round_list([float(importances[i]) for i in order], 6),
+        },
+        'feature_distribution': {
+            feature: {
+                'name': feature_name_mapping.get(feature, feature),
+                'grid': _round_list(kde['grid']),
+                'density': {cls: (_round_list(values, 6) if values is not None else None)
+                            for cls, values in kde['density'].items()},
+            }
+            for feature, kde in kde_grids(record.X_test, record.y_test, top, points=kde_points).items()
+        },
+    }
+
+@app.route('/api/metrics/<model_version>', methods=['GET'])
+def get_model_metrics(model_version):
+    """
+    以紧凑的JSON返回模型的原始评估数据（混淆矩阵、分类报告、ROC曲线点、特征重要性与核密度网格），
+    前端可直接绘图，无需服务端渲染。model_version 为 current 时返回当前版本。
+    """
+    if model_version == 'current':
+        model_version = model_registry.current_version()
+        if model_version is None:
+            return jsonify({
+                'status': 'error',
+                'message': '无法获取模型指标，请先训练模型'
+            }), 500
+
+    def bounded(name, default):
+        value = request.args.get(name, default, type=int)
+        return min(max(value, 2), METRICS_MAX_POINTS)
+
+    try:
+        payload = build_metrics_payload(model_version,
+                                        bounded('roc_points', METRICS_ROC_POINTS),
+                                        bounded('kde_points', METRICS_KDE_POINTS),
+                                        bounded('top_features', METRICS_TOP_FEATURES))
+    except Exception as e:
+        print(f"获取模型指标时出错: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'获取模型指标时发生错误: {str(e)}'
+        }), 500
+    if payload is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'模型版本不存在: {model_version}'
+        }), 404
+
+    return jsonify({'status': 'success', **payload}), 200
+
 @app.route('/api/model-plots', methods=['GET'])
 def get_model_plots():
     """获取模型可视化图表"""
     try:
         print("开始获取模型可视化图表...")
-        model, features, accuracy, X_test = train_random_forest_model()
-        if model is None:
+        record = model_registry.current()
+        if record is None:
             print("模型为空，无法生成图表")
             return jsonify({
                 'status': 'error',
                 'message': '无法生成图表，请先训练模型'
             }), 500
         
-        # 确保X_test是DataFrame格式
-        if not isinstance(X_test, pd.DataFrame):
-            X_test = pd.DataFrame(X_test, columns=features)
-            print(f"将X_test转换为DataFrame，形状: {X_test.shape}")
-        
-        # 获取测试集的真实标签 - 修改这部分逻辑
-        try:
-            print("获取测试集的真实标签...")
-            # 从原始数据集中获取数据
-            df = read_from_hive("SELECT * FROM stress_level_dataset")
-            if df is None or df.empty:
-                print("无法从Hive获取数据")
-                return jsonify({
-                    'status': 'error',
-                    'message': '无法获取数据，请检查数据源'
-                }), 500
-            
-            # 使用与train_random_forest_model相同的逻辑获取y_test
-            features_cols = [col for col in df.columns if col != 'stress_level']
-            X = df[features_cols]
-            y = df['stress_level']
-            _, X_test_idx, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            
-            print(f"成功获取y_test，长度: {len(y_test)}")
-            
-            # 确保X_test和y_test长度匹配
-            if len(X_test) != len(y_test):
-                print(f"警告：X_test长度({len(X_test)})与y_test长度({len(y_test)})不匹配")
-                # 使用模型预测结果作为替代
-                y_test = model.predict(X_test)
-                print(f"使用模型预测结果作为替代，长度: {len(y_test)}")
-            
-        except Exception as e:
-            print(f"获取y_test时出错: {str(e)}")
-            # 使用模型预测结果作为替代
-            print("使用模型预测结果作为替代...")
-            y_test = model.predict(X_test)
-        
         # 生成模型可视化图表
         print("开始生成模型可视化图表...")
-        plots = generate_model_plots(model, X_test, y_test, features)
+        plots = generate_model_plots(record, dpi=parse_plot_dpi())
         
         return jsonify({
             'status': 'success',
+            'model_version': record.version,
             'plots': plots
         }), 200
     except Exception as e:
@@ -388,77 +736,154 @@ def get_model_plots():
             'message': f'生成图表时发生错误: {str(e)}'
         }), 500
 
-def generate_auc_roc_plot(model, X_test, y_test):
+def render_plot_key(record, name, dpi=None, figsize=None, fmt='png'):
+    """图表的缓存键，dpi 与尺寸默认使用图表自身的设置"""
+    spec = PLOT_SPECS[name]
+    return plot_key(record.model_id, name, dpi or spec['dpi'], figsize or spec['figsize'], fmt)
+
+def render_plot(record, name, dpi=None, figsize=None, fmt='png'):
     """
-    生成AUC-ROC曲线图
-    
-    :param model: 训练好的模型
-    :param X_test: 测试集特征
-    :param y_test: 测试集标签
-    :return: Base64编码的图像
+    渲染单个图表，结果按 (模型标识, 图表类型, dpi, 尺寸, 格式) 缓存。
+
+    :param record: 模型仓库中的模型记录
+    :param name: 图表名称，见 PLOT_SPECS
+    :param dpi: 分辨率，默认使用图表自身的设置
+    :param figsize: 图表尺寸（英寸）
+    :param fmt: 图像格式，见 PLOT_FORMATS
+    :return: 图像字节
     """
-    import matplotlib.pyplot as plt
-    from sklearn.metrics import roc_curve, auc
-    import io
-    import base64
-    from sklearn.preprocessing import label_binarize
-    import numpy as np
-    
-    plt.figure(figsize=(10, 8))
-    
-    # 获取类别数量
-    n_classes = len(np.unique(y_test))
-    
-    if n_classes > 2:  # 多分类情况
-        # 将标签二值化
-        y_bin = label_binarize(y_test, classes=np.unique(y_test))
-        
-        # 存储每个类别的假正率、真正率和AUC
-        fpr = dict()
-        tpr = dict()
-        roc_auc = dict()
-        
-        # 计算每个类别的ROC曲线和AUC
-        for i in range(n_classes):
-            # 预测每个类别的概率
-            y_score = model.predict_proba(X_test)[:, i]
-            fpr[i], tpr[i], _ = roc_curve(y_bin[:, i], y_score)
-            roc_auc[i] = auc(fpr[i], tpr[i])
-            
-            # 绘制每个类别的ROC曲线
-            plt.plot(fpr[i], tpr[i], lw=2,
-                     label=f'ROC 曲线 (类别 {i}, AUC = {roc_auc[i]:.2f})')
-    
-    else:  # 二分类情况
-        # 预测正类的概率
-        y_score = model.predict_proba(X_test)[:, 1]
-        
-        # 计算ROC曲线
-        fpr, tpr, _ = roc_curve(y_test, y_score)
-        roc_auc = auc(fpr, tpr)
-        
-        # 绘制ROC曲线
-        plt.plot(fpr, tpr, lw=2, label=f'ROC 曲线 (AUC = {roc_auc:.2f})')
-    
-    # 绘制对角线
-    plt.plot([0, 1], [0, 1], 'k--', lw=2)
-    
-    # 设置图表属性
-    plt.xlim([0.0, 1.0])
-    plt.ylim([0.0, 1.05])
-    plt.xlabel('假正率 (False Positive Rate)')
-    plt.ylabel('真正率 (True Positive Rate)')
-    plt.title('接收者操作特征曲线 (ROC)')
-    plt.legend(loc="lower right")
-    
-    # 将图表转换为Base64编码
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=100)
-    buf.seek(0)
-    img_str = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
-    
-    return img_str
+    key = render_plot_key(record, name, dpi, figsize, fmt)
+    _, _, dpi, figsize, _ = key
+    def render():
+        # 被剖析的请求由渲染进程记录内存分配，报告随图像返回
+        reports = [] if memory_requested() else None
+        with span('plot_render'):
+            image = plot_renderer.render(record, name, dpi, figsize, fmt, memory_reports=reports)
+        add_memory_reports(reports)
+        return image
+
+    return plot_cache.get_or_render(key, render)
+
+def render_error_plot(message):
+    """生成包含错误信息的图（base64编码）"""
+    return base64.b64encode(render_error_image(message)).decode('utf-8')
+
+def generate_model_plots(record, dpi=None):
+    """并行生成模型可视化图表（base64编码），单个图表出错或超时只替换该图表为错误图"""
+    futures = {name: plot_request_pool.submit(in_current_context(render_plot), record, name, dpi)
+               for name in PLOT_SPECS}
+    plots = {}
+    for name, future in futures.items():
+        try:
+            image = future.result()
+            with span('base64_encode'):
+                plots[name] = base64.b64encode(image).decode('utf-8')
+        except Exception as e:
+            print(f"生成图表 {name} 时出错: {str(e)}")
+            plots[name] = render_error_plot(f"生成图表时出错: {str(e)}")
+    return plots
+
+def prerender_plots(version, hold=None):
+    """训练完成后在后台预渲染新版本的全部图表，hold 为平滑重启的登记凭证，完成后结束登记"""
+    try:
+        record = model_registry.get(version)
+        if record is None:
+            return
+        print(f"开始预渲染模型 {version} 的图表...")
+        generate_model_plots(record)
+        print(f"模型 {version} 的图表预渲染完成")
+    except Exception as e:
+        print(f"预渲染模型 {version} 的图表时出错: {e}")
+    finally:
+        reload_guard.release(hold)
+
+training_jobs.add_done_callback(
+    lambda job: threading.Thread(target=prerender_plots,
+                                 args=(job.result['model_version'], reload_guard.acquire('prerender')),
+                                 daemon=True).start()
+)
+
+def record_training_job(job):
+    """训练任务在工作进程中执行，完成后将其拟合耗时计入阶段直方图并输出结构化日志"""
+    resources = job.result.get('resources') or {}
+    if resources.get('wall_seconds') is not None:
+        observe_stage('fit', resources['wall_seconds'], endpoint='training_job')
+    log_event('training_job', job_id=job.job_id, mode=job.mode, model_version=job.result['model_version'],
+              accuracy=job.result['accuracy'], wall_seconds=resources.get('wall_seconds'),
+              cpu_seconds=resources.get('cpu_seconds'), n_jobs=resources.get('n_jobs'))
+
+training_jobs.add_done_callback(record_training_job)
+
+def parse_plot_dpi():
+    """读取请求中的 dpi 参数并限制在合理范围内"""
+    dpi = request.args.get('dpi', type=int)
+    if dpi is None:
+        return None
+    return min(max(dpi, PLOT_MIN_DPI), PLOT_MAX_DPI)
+
+@app.route('/api/plots', methods=['GET'])
+def list_plots():
+    """获取当前模型各图表的图像地址，前端可按需并行加载"""
+    record = model_registry.current()
+    if record is None:
+        return jsonify({
+            'status': 'error',
+            'message': '无法生成图表，请先训练模型'
+        }), 500
+
+    fmt = request.args.get('format', 'png')
+    if fmt not in PLOT_FORMATS:
+        fmt = 'png'
+    return jsonify({
+        'status': 'success',
+        'model_version': record.version,
+        'plots': {name: url_for('get_plot_image', model_version=record.version, name=name,
+                                fmt=fmt, rev=record.model_id, _external=True)
+                  for name in PLOT_SPECS}
+    }), 200
+
+@app.route('/api/plots/<model_version>/<name>.<fmt>', methods=['GET'])
+def get_plot_image(model_version, name, fmt):
+    """
+    以二进制图像返回单个图表。
+
+    版本号在模型仓库清空后会被重新分配，同一地址可能对应不同的模型，因此只有地址中带有
+    模型标识 rev（见 ModelRecord.model_id，/api/plots 返回的地址都带有）时才允许客户端永久缓存；
+    rev 与当前模型不符时返回 404，不带 rev 时客户端每次用ETag重新验证。
+    ETag按模型标识记录，带 If-None-Match 的条件请求命中时返回 304。
+    """
+    if name not in PLOT_SPECS or fmt not in PLOT_FORMATS:
+        abort(404)
+    record = model_registry.get(model_version)
+    if record is None:
+        abort(404)
+    rev = request.args.get('rev')
+    if rev is not None and rev != record.model_id:
+        abort(404)
+
+    dpi = parse_plot_dpi()
+    cache_control = 'public, max-age=31536000, immutable' if rev is not None else 'no-cache'
+    # 条件请求直接用已知的ETag比较，命中时无需读取或重新渲染图表
+    etag = plot_cache.etag(render_plot_key(record, name, dpi=dpi, fmt=fmt))
+    if etag is not None and etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    try:
+        data = render_plot(record, name, dpi=dpi, fmt=fmt)
+    except Exception as e:
+        print(f"生成图表 {name} 时出错: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'生成图表时发生错误: {str(e)}'
+        }), 500
+
+    response = Response(data, mimetype=PLOT_FORMATS[fmt])
+    response.set_etag(content_etag(data))
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
 
 # 添加新的API端点
 @app.route('/api/auc-roc-plot', methods=['GET'])
@@ -466,58 +891,23 @@ def get_auc_roc_plot():
     """获取AUC-ROC曲线图"""
     try:
         print("开始生成AUC-ROC曲线图...")
-        model, features, accuracy, X_test = train_random_forest_model()
-        if model is None:
+        record = model_registry.current()
+        if record is None:
             print("模型为空，无法生成AUC-ROC曲线图")
             return jsonify({
                 'status': 'error',
                 'message': '无法生成AUC-ROC曲线图，请先训练模型'
             }), 500
         
-        # 确保X_test是DataFrame格式
-        if not isinstance(X_test, pd.DataFrame):
-            X_test = pd.DataFrame(X_test, columns=features)
-            print(f"将X_test转换为DataFrame，形状: {X_test.shape}")
-        
-        # 获取测试集的真实标签
-        try:
-            print("获取测试集的真实标签...")
-            # 从原始数据集中获取数据
-            df = read_from_hive("SELECT * FROM stress_level_dataset")
-            if df is None or df.empty:
-                print("无法从Hive获取数据")
-                return jsonify({
-                    'status': 'error',
-                    'message': '无法获取数据，请检查数据源'
-                }), 500
-            
-            # 使用与train_random_forest_model相同的逻辑获取y_test
-            features_cols = [col for col in df.columns if col != 'stress_level']
-            X = df[features_cols]
-            y = df['stress_level']
-            _, X_test_idx, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            
-            print(f"成功获取y_test，长度: {len(y_test)}")
-            
-            # 确保X_test和y_test长度匹配
-            if len(X_test) != len(y_test):
-                print(f"警告：X_test长度({len(X_test)})与y_test长度({len(y_test)})不匹配")
-                # 使用模型预测结果作为替代
-                y_test = model.predict(X_test)
-                print(f"使用模型预测结果作为替代，长度: {len(y_test)}")
-            
-        except Exception as e:
-            print(f"获取y_test时出错: {str(e)}")
-            # 使用模型预测结果作为替代
-            print("使用模型预测结果作为替代...")
-            y_test = model.predict(X_test)
-        
         # 生成AUC-ROC曲线图
         print("开始生成AUC-ROC曲线图...")
-        auc_roc_plot = generate_auc_roc_plot(model, X_test, y_test)
+        image = render_plot(record, 'auc_roc_curve', dpi=parse_plot_dpi())
+        with span('base64_encode'):
+            auc_roc_plot = base64.b64encode(image).decode('utf-8')
         
         return jsonify({
             'status': 'success',
+            'model_version': record.version,
             'auc_roc_plot': auc_roc_plot
         }), 200
     except Exception as e:
@@ -529,6 +919,84 @@ def get_auc_roc_plot():
             'message': f'生成AUC-ROC曲线图时发生错误: {str(e)}'
         }), 500
 
+# 启动预热状态：gunicorn 在主进程中预热，工作进程 fork 后共享已加载的模型与数据（见 gunicorn.conf.py）
+warmup = Warmup()
+
+def warm_up():
+    """预加载当前模型版本（含评估结果与编译后的推理引擎）、数据集与数据摘要"""
+    def load_model():
+        record = model_registry.current()
+        if record is None:
+            return {'version': None}
+        ensure_evaluation(record, model_registry)
+        scoring_model(record)
+        return {'version': record.version, 'inference_engine': record.inference_engine}
+
+    def load_dataset_snapshot():
+        df = load_dataset()
+        if df is None:
+            raise RuntimeError('无法从Hive或本地数据读取数据集')
+        return {'rows': len(df), 'memory_bytes': int(df.memory_usage(deep=True).sum())}
+
+    def load_summary():
+        counts = summary_cache.get()
+        if counts is None:
+            raise RuntimeError('无法读取数据摘要')
+        return {'groups': len(counts)}
+
+    return warmup.run([('model', load_model), ('dataset', load_dataset_snapshot), ('summary', load_summary)])
+
+def after_fork():
+    """在 fork 出的工作进程中调用：不复用主进程的 Hive 连接，重新启动熔断器的探测线程"""
+    engine.dispose(close=False)
+    hive_breaker.after_fork()
+
+def shutdown():
+    """工作进程退出前关闭训练与图表渲染进程池，等待进行中的训练任务完成（由 gunicorn 的 graceful_timeout 限制）"""
+    if training_jobs.active():
+        print(f"等待 {training_jobs.active()} 个进行中的训练任务完成...")
+    training_jobs.shutdown(wait=True)
+    plot_renderer.shutdown(wait=False)
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """存活检查：进程能够处理请求即返回成功"""
+    return jsonify({
+        'status': 'success',
+        'pid': os.getpid()
+    }), 200
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """就绪检查：预热完成且全部成功时返回 200，否则返回 503；同时返回预热状态与当前模型版本"""
+    state = warmup.to_dict()
+    loaded = model_registry.loaded_version()
+    return jsonify({
+        'status': 'success' if state['ready'] else 'error',
+        'pid': os.getpid(),
+        'warmup': state,
+        'model_version': loaded,
+        'current_version': model_registry.current_version()
+    }), 200 if state['ready'] else 503
+
+# 缓存、连接池、熔断器与预测批处理的状态（抓取 /metrics 时计算）
+metrics.gauge('cache_stat', '数据集与图表缓存状态', lambda: {
+    (name, stat): value
+    for name, cache in (('dataset', dataset_cache), ('summary', summary_cache), ('plot', plot_cache))
+    for stat, value in numeric_stats(cache.stats()).items()
+}, ('cache', 'stat'))
+metrics.gauge('hive_pool_connections', 'Hive连接池连接数',
+              lambda: {(state,): value for state, value in numeric_stats(pool_stats(engine)).items()}, ('state',))
+metrics.gauge('hive_breaker_open', 'Hive熔断器是否打开（1 表示正在使用本地数据）',
+              lambda: 1.0 if hive_breaker.state == 'open' else 0.0)
+metrics.gauge('hive_breaker_stat', 'Hive熔断器统计',
+              lambda: {(stat,): value for stat, value in numeric_stats(hive_breaker.stats()).items()}, ('stat',))
+metrics.gauge('prediction_batcher_stat', '预测微批处理统计',
+              lambda: {(stat,): value for stat, value in numeric_stats(prediction_batcher.stats()).items()},
+              ('stat',))
+
 if __name__ == '__main__':
+    # 开发服务器；生产环境请使用 gunicorn -c gunicorn.conf.py
+    warm_up()
     print("启动Flask服务器，监听在 http://localhost:5000")
     app.run(debug=True)
\ No newline at end of file
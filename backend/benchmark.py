@@ -0,0 +1,438 @@
+"""
+接口基准测试与压测。
+
+用 SQLite 文件代替 Hive（数据由 data_generator 按真实数据集的分布生成），在多个数据规模下
+测量各接口的延迟分位数（p50/p95/p99）、吞吐量、响应字节数与内存占用（每个接口测量期间本进程
+与训练、图表进程池的常驻内存变化，见 MemoryWindow），结果保存为 JSON，
+可与之前提交的结果对比发现性能回退。
+
+每个数据规模在独立的子进程中运行：模型仓库、图表缓存与数据库都在临时目录中，
+峰值内存只反映该规模，互不影响。请求通过 Flask 测试客户端在进程内发出（不经过网络），
+并发请求由线程池发出，与多线程 WSGI 服务器的行为一致。
+
+命令行:
+    python benchmark.py --source ../ShapCompatibleDataset.csv --sizes 1000 100000 --output bench.json
+    python benchmark.py --source ../ShapCompatibleDataset.csv --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REQUESTS = 30          # 每个接口、每个并发度发出的请求数
+DEFAULT_CONCURRENCY = (1, 8)
+DEFAULT_TRAIN_RUNS = 1
+DEFAULT_CHUNK_ROWS = 100000    # 写入 SQLite 时每个分块的行数
+TRAIN_TIMEOUT = 1800           # 等待训练任务完成的最长秒数
+TRAIN_POLL_INTERVAL = 0.1
+REGRESSION_THRESHOLD = 1.2     # p95 延迟变为基线的多少倍以上视为回退
+
+TRAIN_ENDPOINT = '/api/train-model'
+READ_ENDPOINTS = ('/api/data-summary', '/api/model-info', '/api/model-plots', '/api/auc-roc-plot')
+
+
+def peak_rss_mb():
+    """本进程整个生命周期的峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    """本进程当前的常驻内存（MB），无法读取时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _proc_status_mb(pid, field):
+    """读取 /proc/<pid>/status 中以 kB 为单位的字段（如 VmRSS、VmHWM），无法读取时返回 None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _reset_peak_rss(pid):
+    """将进程的峰值常驻内存（VmHWM）重置为当前值（Linux 4.0+），成功时返回 True"""
+    try:
+        with open(f'/proc/{pid}/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def child_pids():
+    """
+    本进程的全部后代进程（训练与图表进程池的工作进程、forkserver、Manager 进程）。
+
+    forkserver 启动的工作进程是 forkserver 的子进程，不是本进程的直接子进程，因此按 /proc 中的父进程号逐层查找。
+    """
+    parents = {}
+    for name in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # 第二个字段是带括号的进程名，可能包含空格
+                parents[int(name)] = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+    pids, pending = [], [os.getpid()]
+    while pending:
+        parent = pending.pop()
+        children = [pid for pid, ppid in parents.items() if ppid == parent]
+        pids.extend(children)
+        pending.extend(children)
+    return pids
+
+
+class MemoryWindow:
+    """
+    测量一段时间内本进程与其子进程的常驻内存。
+
+    ru_maxrss 是进程整个生命周期的峰值，测量过一个占用内存多的接口后，之后每个接口都会报告同一个峰值；
+    RUSAGE_CHILDREN 只统计已退出并被回收的子进程，不包括仍在运行的进程池。因此进入时将本进程与
+    现有子进程的 VmHWM 重置为当前值，退出时读取各进程在这段时间内的峰值：
+
+    - rss_delta_mb: 本进程常驻内存的变化；
+    - peak_rss_delta_mb: 本进程在这段时间内的峰值与进入时之差；
+    - children_rss_mb / children_rss_delta_mb / children_peak_rss_mb: 子进程当前常驻内存之和 / 其变化 /
+      各子进程峰值之和（包括这段时间内新启动的进程池）；
+    - exited_children_peak_rss_mb: RUSAGE_CHILDREN 的峰值（已回收的子进程中最大的一个）。
+
+    无法读取 /proc 的平台（如 macOS）上相应字段为 None。
+    """
+
+    def __enter__(self):
+        self.rss_before = current_rss_mb()
+        self.children_rss_before = sum(_proc_status_mb(pid, 'VmRSS') or 0.0 for pid in child_pids())
+        self.peak_resettable = _reset_peak_rss('self')
+        for pid in child_pids():
+            _reset_peak_rss(pid)
+        self.stats = {}
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        rss = current_rss_mb()
+        peak = _proc_status_mb('self', 'VmHWM') if self.peak_resettable else None
+        children = child_pids()
+        children_rss = sum(_proc_status_mb(pid, 'VmRSS') or 0.0 for pid in children)
+        children_peak = sum(_proc_status_mb(pid, 'VmHWM') or 0.0 for pid in children)
+        exited = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        self.stats = {
+            'rss_mb': rss,
+            'rss_delta_mb': rss - self.rss_before if rss is not None and self.rss_before is not None else None,
+            'peak_rss_delta_mb': peak - self.rss_before if peak is not None and self.rss_before is not None else None,
+            'children': len(children),
+            'children_rss_mb': children_rss,
+            'children_rss_delta_mb': children_rss - self.children_rss_before,
+            'children_peak_rss_mb': children_peak,
+            'exited_children_peak_rss_mb': exited / 1024 ** 2 if sys.platform == 'darwin' else exited / 1024,
+        }
+        return False
+
+
+def latency_stats(latencies, payload_bytes, errors, wall_seconds):
+    """汇总一组请求的延迟分位数、吞吐量与响应大小"""
+    ms = np.asarray(latencies) * 1000
+    return {
+        'requests': len(ms),
+        'errors': errors,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+        'max_ms': float(ms.max()),
+        'throughput_rps': len(ms) / wall_seconds if wall_seconds > 0 else None,
+        'payload_bytes': int(np.mean(payload_bytes)),
+    }
+
+
+def measure(flask_app, url, n_requests, concurrency, method='GET'):
+    """
+    以给定并发度向接口发出 n_requests 个请求。
+
+    :return: 统计字典，见 latency_stats
+    """
+    local = threading.local()
+
+    def one(_):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = flask_app.test_client()
+        started = time.perf_counter()
+        response = client.open(url, method=method)
+        body = response.get_data()
+        return time.perf_counter() - started, len(body), response.status_code
+
+    started = time.perf_counter()
+    with MemoryWindow() as memory, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(n_requests)))
+    wall = time.perf_counter() - started
+    stats = latency_stats([r[0] for r in results], [r[1] for r in results],
+                          sum(1 for r in results if r[2] >= 400), wall)
+    stats.update(memory.stats)
+    return stats
+
+
+def build_sqlite_dataset(db_path, table, source_csv, rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=None):
+    """
+    按真实数据集的分布生成 rows 行数据并分块写入 SQLite 表。
+
+    :return: 写入耗时（秒）
+    """
+    from sqlalchemy import create_engine
+
+    from data_generator import DEFAULT_SEED, fit_spec, iter_chunks
+
+    started = time.perf_counter()
+    spec = fit_spec(pd.read_csv(source_csv))
+    engine = create_engine(f'sqlite:///{db_path}')
+    with engine.begin() as conn:
+        for index, chunk in enumerate(iter_chunks(spec, rows, chunk_rows, DEFAULT_SEED if seed is None else seed)):
+            chunk.to_sql(table, conn, if_exists='replace' if index == 0 else 'append', index=False)
+    engine.dispose()
+    return time.perf_counter() - started
+
+
+def benchmark_training(flask_app, runs):
+    """提交训练任务并等待完成，统计提交延迟与任务耗时"""
+    client = flask_app.test_client()
+    submit_latencies, job_seconds, payload_bytes, errors = [], [], [], 0
+    resources = None
+    with MemoryWindow() as memory:
+        started = time.perf_counter()
+        for _ in range(runs):
+            submitted = time.perf_counter()
+            response = client.post(TRAIN_ENDPOINT)
+            submit_latencies.append(time.perf_counter() - submitted)
+            payload_bytes.append(len(response.get_data()))
+            if response.status_code != 202:
+                errors += 1
+                continue
+
+            status_url = response.get_json()['status_url']
+            deadline = time.time() + TRAIN_TIMEOUT
+            while True:
+                job = client.get(status_url).get_json()['job']
+                if job['status'] in ('succeeded', 'failed') or time.time() > deadline:
+                    break
+                time.sleep(TRAIN_POLL_INTERVAL)
+            job_seconds.append(time.perf_counter() - submitted)
+            if job['status'] != 'succeeded':
+                errors += 1
+                print(f"训练任务未成功: {job['status']} {job.get('error')}")
+            else:
+                resources = (job['result'] or {}).get('resources')
+    stats = latency_stats(submit_latencies, payload_bytes, errors, time.perf_counter() - started)
+    stats.update(memory.stats)
+    stats.update({
+        'job_seconds_mean': float(np.mean(job_seconds)) if job_seconds else None,
+        'job_seconds_max': float(np.max(job_seconds)) if job_seconds else None,
+        'resources': resources,
+    })
+    return stats
+
+
+def run_size(rows, work_dir, args):
+    """
+    在当前（子）进程中对一个数据规模执行全部测量。
+
+    必须在导入 app 之前调用：模型仓库与本地镜像路径通过环境变量指向临时目录。
+    """
+    os.environ['MODEL_REGISTRY_DIR'] = os.path.join(work_dir, 'models')
+    os.environ['DATASET_MIRROR_PATH'] = os.path.join(work_dir, 'mirror.arrow')
+
+    import app as backend
+    from sqlalchemy import create_engine
+
+    from plot_cache import PlotCache
+
+    db_path = os.path.join(work_dir, 'dataset.sqlite')
+    print(f"[{rows} 行] 正在生成 SQLite 数据集")
+    build_seconds = build_sqlite_dataset(db_path, backend.DATASET_TABLE, args.source, rows, args.chunk_rows)
+
+    # 用 SQLite 代替 Hive：读取查询走同一个数据访问层，新鲜度探测改为数据库文件的修改时间
+    backend.engine = create_engine(f'sqlite:///{db_path}')
+    for cache in (backend.dataset_cache, backend.summary_cache):
+        cache.probe = lambda: (os.path.getmtime(db_path),)
+    backend.plot_cache = PlotCache(max_bytes=backend.PLOT_CACHE_MAX_BYTES, disk_dir=os.path.join(work_dir, 'plots'))
+
+    result = {
+        'dataset': {'rows': rows, 'build_seconds': build_seconds},
+        'endpoints': {},
+    }
+    try:
+        print(f"[{rows} 行] 正在测量 POST {TRAIN_ENDPOINT}")
+        result['endpoints'][f'POST {TRAIN_ENDPOINT}'] = benchmark_training(backend.app, args.train_runs)
+
+        client = backend.app.test_client()
+        for url in READ_ENDPOINTS:
+            print(f"[{rows} 行] 正在测量 GET {url}")
+            started = time.perf_counter()
+            with MemoryWindow() as memory:
+                cold = client.get(url)
+            endpoint = {
+                'cold_ms': (time.perf_counter() - started) * 1000,
+                'cold_status': cold.status_code,
+                'cold_memory': memory.stats,
+                'concurrency': {},
+            }
+            for concurrency in args.concurrency:
+                endpoint['concurrency'][str(concurrency)] = measure(backend.app, url, args.requests, concurrency)
+            result['endpoints'][f'GET {url}'] = endpoint
+    finally:
+        backend.training_jobs.shutdown()
+        backend.plot_renderer.shutdown()
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def git_commit():
+    """当前提交的哈希，不在 git 仓库中时返回 None"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args):
+    """在子进程中依次测量各数据规模，返回完整结果"""
+    from training_parallelism import available_cpus
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': available_cpus(),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'train_runs': args.train_runs,
+        },
+        'results': {},
+    }
+    for rows in args.sizes:
+        work_dir = tempfile.mkdtemp(prefix=f'benchmark_{rows}_')
+        result_path = os.path.join(work_dir, 'result.json')
+        try:
+            command = [sys.executable, os.path.abspath(__file__), '--source', args.source,
+                       '--requests', str(args.requests), '--train-runs', str(args.train_runs),
+                       '--chunk-rows', str(args.chunk_rows),
+                       '--concurrency', *map(str, args.concurrency),
+                       '--_worker', str(rows), '--_work-dir', work_dir, '--_result', result_path]
+            subprocess.run(command, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            with open(result_path, 'r', encoding='utf-8') as f:
+                report['results'][str(rows)] = json.load(f)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    对比两次结果中相同规模、接口与并发度的 p95 延迟。
+
+    :return: 回退列表 [(规模, 接口, 并发度, 基线p95, 当前p95)]
+    """
+    regressions = []
+    for rows, result in report['results'].items():
+        base_result = baseline.get('results', {}).get(rows)
+        if base_result is None:
+            continue
+        for name, endpoint in result['endpoints'].items():
+            base_endpoint = base_result['endpoints'].get(name)
+            if base_endpoint is None:
+                continue
+            pairs = [('-', endpoint, base_endpoint)] if 'concurrency' not in endpoint else [
+                (level, stats, base_endpoint['concurrency'].get(level))
+                for level, stats in endpoint['concurrency'].items()]
+            for level, stats, base_stats in pairs:
+                if base_stats is None:
+                    continue
+                ratio = stats['p95_ms'] / max(base_stats['p95_ms'], 1e-9)
+                flag = '回退' if ratio > threshold else ''
+                print(f"{rows:>10} {name:<28} 并发 {level:>3}  p95 {base_stats['p95_ms']:9.2f} -> "
+                      f"{stats['p95_ms']:9.2f} ms ({ratio:.2f}x) {flag}")
+                if ratio > threshold:
+                    regressions.append((rows, name, level, base_stats['p95_ms'], stats['p95_ms']))
+    return regressions
+
+
+def print_summary(report):
+    for rows, result in report['results'].items():
+        print(f"\n数据规模 {rows} 行（峰值内存 {result['peak_rss_mb']:.0f} MB）")
+        for name, endpoint in result['endpoints'].items():
+            levels = endpoint.get('concurrency', {'-': endpoint})
+            for level, stats in levels.items():
+                print(f"  {name:<28} 并发 {level:>3}  p50 {stats['p50_ms']:9.2f}  p95 {stats['p95_ms']:9.2f}  "
+                      f"p99 {stats['p99_ms']:9.2f} ms  {stats['throughput_rps']:8.1f} 次/秒  "
+                      f"{stats['payload_bytes']:>9} 字节  错误 {stats['errors']}")
+                if stats.get('rss_delta_mb') is not None:
+                    print(f"  {'':<28} 内存 {stats['rss_delta_mb']:+.1f} MB（峰值 {stats['peak_rss_delta_mb']:+.1f} MB），"
+                          f"子进程 {stats['children_rss_delta_mb']:+.1f} MB（{stats['children']} 个共 "
+                          f"{stats['children_rss_mb']:.0f} MB，峰值之和 {stats['children_peak_rss_mb']:.0f} MB）")
+                if stats.get('job_seconds_mean') is not None:
+                    print(f"  {'':<28} 训练任务平均耗时 {stats['job_seconds_mean']:.2f} 秒")
+
+
+if __name__ == '__main__':
+    default_source = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  'ShapCompatibleDataset.csv')
+    parser = argparse.ArgumentParser(description='接口基准测试（SQLite 代替 Hive）')
+    parser.add_argument('--source', default=default_source, help='用于生成数据的真实数据集CSV文件')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='数据规模（行数）')
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help='每个接口、每个并发度的请求数')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=list(DEFAULT_CONCURRENCY), help='并发度')
+    parser.add_argument('--train-runs', type=int, default=DEFAULT_TRAIN_RUNS, help='每个规模的训练次数')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='生成数据时每个分块的行数')
+    parser.add_argument('--output', help='结果JSON文件，默认为 benchmark-<提交>.json')
+    parser.add_argument('--compare', help='基线结果JSON文件，p95 延迟回退时以非零状态退出')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help='回退判定倍数')
+    parser.add_argument('--_worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--_work-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--_result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._worker is not None:
+        # 子进程：测量单个数据规模
+        size_result = run_size(args._worker, args._work_dir, args)
+        with open(args._result, 'w', encoding='utf-8') as f:
+            json.dump(size_result, f)
+        sys.exit(0)
+
+    benchmark_report = run_benchmark(args)
+    print_summary(benchmark_report)
+    output = args.output or f"benchmark-{benchmark_report['meta']['commit'] or 'local'}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(benchmark_report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline_report = json.load(f)
+        print(f"\n与基线对比（{baseline_report['meta'].get('commit')}）:")
+        if compare(benchmark_report, baseline_report, args.threshold):
+            sys.exit(1)
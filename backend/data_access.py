@@ -0,0 +1,212 @@
+"""
+数据访问层。
+
+所有对 Hive 数据表的读取都通过 Query 构造 SQL：只选取需要的列，过滤条件与聚合
+（COUNT(*)、GROUP BY）下推到 Hive 执行，接口只拉取所需的数据而不是整张表。
+Hive 不可用时在本地数据（Arrow 镜像或 CSV）上用 pandas 计算同样的结果。
+指定数据集结构时，读出的数据按结构校验并转换为紧凑类型。
+"""
+import pandas as pd
+
+from instrumentation import span
+
+
+def quote_identifier(name):
+    """用反引号引用列名或表名"""
+    return '`' + str(name).replace('`', '``') + '`'
+
+
+def sql_literal(value):
+    """将Python值转换为SQL字面量（数值原样输出，其他按字符串转义）"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def parse_partition(name):
+    """将 SHOW PARTITIONS 返回的分区名（如 ingest_date=2026-10-18/stress_level=1）解析为 {分区列: 取值}"""
+    return dict(part.split('=', 1) for part in name.split('/'))
+
+
+def partition_spec(partition):
+    """生成 PARTITION 子句中的分区说明，如 `ingest_date`='2026-10-18'"""
+    return ', '.join(f'{quote_identifier(column)}={sql_literal(value)}' for column, value in partition.items())
+
+
+class Query:
+    """
+    只读 SELECT 语句构造器，方法均返回自身以便链式调用。
+
+    例如::
+
+        Query('stress_level_dataset').select('stress_level').count().group_by('stress_level')
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.columns = []
+        self.count_alias = None
+        self.filters = []
+        self.grouping = []
+
+    def select(self, *columns):
+        """选取列（投影）"""
+        self.columns.extend(columns)
+        return self
+
+    def count(self, alias='count'):
+        """增加 COUNT(*) 聚合列"""
+        self.count_alias = alias
+        return self
+
+    def where(self, column, value):
+        """等值过滤；value 为列表、元组或集合时生成 IN 条件"""
+        self.filters.append((column, list(value) if isinstance(value, (list, tuple, set)) else value))
+        return self
+
+    def where_all(self, filters):
+        """按 {列: 取值} 增加多个等值过滤条件"""
+        for column, value in (filters or {}).items():
+            self.where(column, value)
+        return self
+
+    def group_by(self, *columns):
+        """分组聚合"""
+        self.grouping.extend(columns)
+        return self
+
+    def to_sql(self):
+        """生成 SQL 语句"""
+        select_list = [quote_identifier(col) for col in self.columns]
+        if self.count_alias is not None:
+            select_list.append(f'COUNT(*) AS {quote_identifier(self.count_alias)}')
+        sql = f"SELECT {', '.join(select_list) or '*'} FROM {self.table}"
+        conditions = []
+        for column, value in self.filters:
+            if isinstance(value, list):
+                conditions.append(f"{quote_identifier(column)} IN ({', '.join(sql_literal(v) for v in value)})")
+            else:
+                conditions.append(f'{quote_identifier(column)} = {sql_literal(value)}')
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        if self.grouping:
+            sql += ' GROUP BY ' + ', '.join(quote_identifier(col) for col in self.grouping)
+        return sql
+
+    def apply(self, df):
+        """
+        在本地 DataFrame 上执行同样的投影、过滤与聚合（Hive 不可用时的回退路径）。
+
+        :param df: 本地的完整数据
+        :return: 与 Hive 查询结果列一致的 DataFrame
+        """
+        for column, value in self.filters:
+            if column not in df.columns:
+                continue  # 本地数据不包含分区列时忽略该分区过滤
+            df = df[df[column].isin(value)] if isinstance(value, list) else df[df[column] == value]
+
+        if self.count_alias is not None:
+            if self.grouping:
+                result = df.groupby(list(self.grouping)).size().reset_index(name=self.count_alias)
+            else:
+                result = pd.DataFrame({self.count_alias: [len(df)]})
+        else:
+            result = df[[col for col in self.columns if col in df.columns]] if self.columns else df
+        return result
+
+    def __str__(self):
+        return self.to_sql()
+
+
+class DatasetAccess:
+    """
+    数据集访问入口：固定数据表、默认列与分区过滤，提供投影读取和聚合查询。
+
+    查询通过 ``read_sql(sql)`` 在 Hive 上执行（失败时抛出异常）；失败后由
+    ``fallback()`` 提供本地完整数据，在本地执行同样的查询。
+    """
+
+    def __init__(self, table, columns, read_sql, fallback=None, partition_filter=None, schema=None,
+                 on_invalid='drop'):
+        """
+        :param table: 数据表名
+        :param columns: 数据集的列（特征与目标列）
+        :param read_sql: 函数 read_sql(sql) -> DataFrame，失败时抛出异常
+        :param fallback: 无参函数，返回本地完整数据，不可用时返回 None
+        :param partition_filter: 默认的分区过滤 {分区列: 取值或取值列表}
+        :param schema: 数据集结构 (DatasetSchema)，为 None 时不校验也不转换类型
+        :param on_invalid: 不合法的行 'drop' 丢弃或 'raise' 报错，见 DatasetSchema.conform
+        """
+        self.table = table
+        self.columns = list(columns)
+        self.read_sql = read_sql
+        self.fallback = fallback
+        self.partition_filter = dict(partition_filter or {})
+        self.schema = schema
+        self.on_invalid = on_invalid
+
+    def query(self):
+        """创建已带默认分区过滤的查询"""
+        return Query(self.table).where_all(self.partition_filter)
+
+    def selected_partitions(self, names):
+        """
+        从 SHOW PARTITIONS 返回的分区名中选出默认分区过滤会读取的分区。
+
+        :param names: 分区名列表
+        :return: 按分区名排序的 [{分区列: 取值}]
+        """
+        selected = []
+        for name in sorted(names):
+            partition = parse_partition(name)
+            if all(column not in partition
+                   or partition[column] in {str(v) for v in (value if isinstance(value, (list, tuple, set)) else [value])}
+                   for column, value in self.partition_filter.items()):
+                selected.append(partition)
+        return selected
+
+    def conform(self, df):
+        """按数据集结构校验并转换类型（未指定结构或数据为 None 时原样返回）"""
+        if self.schema is None or df is None:
+            return df
+        with span('schema_conform'):
+            return self.schema.conform(df, on_invalid=self.on_invalid, name=self.table)
+
+    def fetch(self, query):
+        """
+        执行查询，Hive 失败时在本地数据上执行。
+
+        :return: DataFrame，两者都不可用时返回 None
+        :raise SchemaError: on_invalid 为 'raise' 且数据不合法
+        """
+        try:
+            df = self.read_sql(query.to_sql())
+        except Exception as e:
+            print(f"从Hive读取数据时出错: {e}")
+            if self.fallback is None:
+                return None
+            with span('local_fallback'):
+                local = self.conform(self.fallback())
+                return query.apply(local) if local is not None else None
+
+        with span('column_rename'):
+            # 去掉列名中的表名前缀
+            df.columns = [col.split('.')[-1] for col in df.columns]
+        return self.conform(df)
+
+    def load(self, columns=None):
+        """
+        读取数据集，只选取需要的列。
+
+        :param columns: 需要的列，默认为全部特征与目标列
+        :return: DataFrame，不可用时返回 None
+        """
+        return self.fetch(self.query().select(*(columns or self.columns)))
+
+    def value_counts(self, column):
+        """
+        在 Hive 上执行 ``SELECT column, COUNT(*) ... GROUP BY column``，只返回分组计数。
+
+        :return: DataFrame，列为 [column, 'count']，不可用时返回 None
+        """
+        return self.fetch(self.query().select(column).count().group_by(column))
@@ -0,0 +1,279 @@
+"""
+合成数据生成器。
+
+从真实数据集估计特征的均值与协方差，按多元正态分布分块生成任意行数的新数据：
+协方差矩阵只做一次 Cholesky 分解，每个分块用独立的随机数流（由种子与分块序号派生）生成，
+因此输出可以多进程并行生成且结果与分块的生成顺序无关；取整与截断都是整块向量化操作，
+目标变量由在原始数据上训练的随机森林预测。
+
+分块依次写入 CSV/Parquet 文件或直接流式上传到 Hive，内存占用只与分块大小有关。
+
+命令行:
+    python data_generator.py --source StressLevelDataset.csv --rows 10000000 --output synthetic.parquet
+    python data_generator.py --source StressLevelDataset.csv --rows 100000000 --hive-table stress_level_dataset
+"""
+import argparse
+import concurrent.futures
+import gzip
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from training_parallelism import TrainingParallelism
+
+DEFAULT_CHUNK_ROWS = 100000
+DEFAULT_SEED = 42
+
+# 标注模型（与原 new_data.py 一致）
+LABEL_MODEL_PARAMS = {
+    'n_estimators': 100,
+    'random_state': 42,
+    'max_depth': 5,
+}
+
+GZIP_LEVEL = 6            # .gz 输出的压缩级别（gzip 默认的 9 级压缩慢数倍，压缩率只略高）
+CHOLESKY_JITTER = 1e-10   # 协方差矩阵不满秩时加到对角线上的相对扰动（逐次放大）
+
+
+def cholesky_factor(cov):
+    """
+    协方差矩阵的下三角 Cholesky 因子 L（L @ L.T = cov）。
+
+    存在常数列或线性相关列时协方差矩阵只是半正定的，逐次在对角线上加入微小扰动直到分解成功。
+    """
+    cov = np.asarray(cov, dtype=np.float64)
+    scale = max(float(np.max(np.diag(cov))), 1.0)
+    jitter = 0.0
+    while True:
+        try:
+            return np.linalg.cholesky(cov + jitter * scale * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter = jitter * 10 if jitter else CHOLESKY_JITTER
+
+
+@dataclass
+class GeneratorSpec:
+    """
+    生成器参数：特征列、均值、Cholesky 因子、取值范围、整数列与标注模型。
+
+    只包含 numpy 数组与模型，可以直接传给工作进程。
+    """
+    columns: list
+    target_column: str
+    mean: np.ndarray
+    cholesky: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    integer_columns: np.ndarray
+    model: RandomForestClassifier
+
+    def hive_schema(self):
+        """输出数据对应的 Hive 表结构"""
+        schema = [(col, 'INT' if is_int else 'DOUBLE') for col, is_int in zip(self.columns, self.integer_columns)]
+        return schema + [(self.target_column, 'INT')]
+
+
+def fit_spec(df, target_column='stress_level', parallelism=None):
+    """
+    从真实数据集估计生成器参数并训练标注模型。
+
+    原脚本在标准化后的数据上估计协方差再逆变换回原始尺度，与直接在原始数据上估计
+    协方差得到的分布相同；随机森林对逐列线性变换不敏感，因此标注模型也直接在原始数据上训练。
+
+    :param df: 真实数据集，除目标列外均为特征
+    :param target_column: 目标列名称
+    :param parallelism: 标注模型的训练并行度 (TrainingParallelism)
+    :return: GeneratorSpec
+    """
+    X = df.drop(columns=[target_column])
+    for column in X.columns:
+        if X[column].dtype == 'object':
+            # 将分类变量转换为数值
+            X[column] = pd.Categorical(X[column]).codes
+    y = df[target_column]
+
+    model = RandomForestClassifier(**LABEL_MODEL_PARAMS)
+    with (parallelism or TrainingParallelism()).fitting(X):
+        model.fit(X.to_numpy(dtype=np.float64), y)
+
+    values = X.to_numpy(dtype=np.float64)
+    return GeneratorSpec(
+        columns=list(X.columns),
+        target_column=target_column,
+        mean=values.mean(axis=0),
+        cholesky=cholesky_factor(np.atleast_2d(np.cov(values, rowvar=False))),
+        lower=values.min(axis=0),
+        upper=values.max(axis=0),
+        integer_columns=np.array([pd.api.types.is_integer_dtype(X[col]) for col in X.columns]),
+        model=model,
+    )
+
+
+def chunk_rng(seed, index):
+    """第 index 个分块的随机数生成器，只由种子与分块序号决定"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+
+def generate_chunk(spec, index, rows, seed=DEFAULT_SEED):
+    """
+    生成一个分块。
+
+    :param spec: GeneratorSpec
+    :param index: 分块序号
+    :param rows: 行数
+    :param seed: 全局随机种子
+    :return: DataFrame，列为特征列加目标列
+    """
+    rng = chunk_rng(seed, index)
+    values = rng.standard_normal((rows, len(spec.columns)))
+    values = values @ spec.cholesky.T
+    values += spec.mean
+
+    # 整数列取整，所有列截断到原始数据的取值范围
+    values[:, spec.integer_columns] = np.rint(values[:, spec.integer_columns])
+    np.clip(values, spec.lower, spec.upper, out=values)
+
+    labels = spec.model.predict(values)
+    chunk = pd.DataFrame(values, columns=spec.columns)
+    int_columns = [col for col, is_int in zip(spec.columns, spec.integer_columns) if is_int]
+    if int_columns:
+        chunk[int_columns] = chunk[int_columns].astype(np.int64)
+    chunk[spec.target_column] = labels
+    return chunk
+
+
+def chunk_sizes(n_rows, chunk_rows):
+    """各分块的行数"""
+    full, rest = divmod(n_rows, chunk_rows)
+    return [chunk_rows] * full + ([rest] if rest else [])
+
+
+# 工作进程内的生成器参数
+_worker_spec = None
+
+
+def _init_worker(spec):
+    global _worker_spec
+    _worker_spec = spec
+
+
+def _generate_in_worker(index, rows, seed):
+    return generate_chunk(_worker_spec, index, rows, seed)
+
+
+def iter_chunks(spec, n_rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=DEFAULT_SEED, workers=1):
+    """
+    按顺序逐块生成数据。
+
+    相同的 (seed, chunk_rows) 总是生成相同的数据，与 workers 无关。
+
+    :param workers: 并行生成的进程数；进程池中最多同时有 2 * workers 个分块，内存占用有上界
+    :return: DataFrame 分块的迭代器
+    """
+    sizes = chunk_sizes(n_rows, chunk_rows)
+    if workers <= 1:
+        for index, rows in enumerate(sizes):
+            yield generate_chunk(spec, index, rows, seed)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(spec,)) as executor:
+        pending = deque()
+        for index, rows in enumerate(sizes):
+            pending.append(executor.submit(_generate_in_worker, index, rows, seed))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_csv(chunks, path):
+    """逐块写入CSV文件（只写一次标题行），路径以 .gz 结尾时使用 gzip 压缩；返回写入的行数"""
+    if path.endswith('.gz'):
+        f = gzip.open(path, 'wt', newline='', encoding='utf-8', compresslevel=GZIP_LEVEL)
+    else:
+        f = open(path, 'w', newline='', encoding='utf-8')
+    rows = 0
+    with f:
+        for chunk in chunks:
+            chunk.to_csv(f, index=False, header=rows == 0)
+            rows += len(chunk)
+    return rows
+
+
+def write_parquet(chunks, path, compression='snappy'):
+    """逐块写入Parquet文件，每个分块为一个行组；返回写入的行数"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression=compression)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def output_format(path):
+    """根据文件扩展名确定输出格式"""
+    return 'parquet' if path.endswith(('.parquet', '.pq')) else 'csv'
+
+
+def _with_progress(chunks, n_rows):
+    """逐块输出生成进度与吞吐量"""
+    started = time.perf_counter()
+    done = 0
+    for chunk in chunks:
+        yield chunk
+        done += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"已生成 {done}/{n_rows} 行 ({done / n_rows * 100:.1f}%)，{done / max(elapsed, 1e-9):,.0f} 行/秒")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='按真实数据集的分布分块生成合成数据')
+    parser.add_argument('--source', required=True, help='真实数据集CSV文件，用于估计分布与训练标注模型')
+    parser.add_argument('--target', default='stress_level', help='目标列名称')
+    parser.add_argument('--rows', type=int, required=True, help='生成的行数')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='每个分块的行数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='随机种子')
+    parser.add_argument('--workers', type=int, default=1, help='并行生成的进程数')
+    parser.add_argument('--output', help='输出文件（.csv、.csv.gz 或 .parquet）')
+    parser.add_argument('--hive-table', help='直接流式上传到的Hive表名')
+    parser.add_argument('--hive-host', default='localhost', help='Hive服务器主机名')
+    parser.add_argument('--hive-port', type=int, default=10005, help='Hive服务器端口')
+    parser.add_argument('--hive-format', default='TEXTFILE', type=str.upper, help='Hive表存储格式')
+    parser.add_argument('--partition-by', nargs='+', help='Hive表分区列')
+    args = parser.parse_args()
+
+    if bool(args.output) == bool(args.hive_table):
+        parser.error('必须且只能指定 --output 或 --hive-table 之一')
+
+    source = pd.read_csv(args.source)
+    spec = fit_spec(source, args.target)
+    chunks = _with_progress(iter_chunks(spec, args.rows, args.chunk_rows, args.seed, args.workers), args.rows)
+
+    if args.hive_table:
+        from upload_csv_to_hive import upload_chunks_to_hive
+        success = upload_chunks_to_hive(chunks, spec.hive_schema(), args.hive_table, hive_host=args.hive_host,
+                                        hive_port=args.hive_port, storage_format=args.hive_format,
+                                        partition_by=args.partition_by)
+        sys.exit(0 if success else 1)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    writer = write_parquet if output_format(args.output) == 'parquet' else write_csv
+    written = writer(chunks, args.output)
+    print(f"已生成 {written} 行数据: {args.output}")
@@ -0,0 +1,173 @@
+import threading
+import time
+
+
+class DatasetCache:
+    """
+    进程级数据集快照缓存。
+
+    整张表以 DataFrame（列式存储）的形式保存在内存中。每次读取时：
+    - 快照超过 ``ttl`` 秒则强制刷新；
+    - 距上次探测超过 ``probe_interval`` 秒时，调用 ``probe`` 获取廉价的版本标识
+      （如表的最后修改时间或行数），标识变化则刷新；
+    - 否则直接命中缓存。
+    并发请求同时未命中时只会发起一次加载，其余请求等待并共享结果。
+    """
+
+    def __init__(self, loader, probe=None, ttl=600.0, probe_interval=30.0, name='dataset'):
+        """
+        :param loader: 无参函数，返回完整的 DataFrame，失败时返回 None
+        :param probe: 无参函数，返回数据版本标识；为 None 时仅依赖 TTL
+        :param ttl: 快照最长存活秒数，None 表示不过期
+        :param probe_interval: 两次新鲜度探测之间的最短间隔（秒）
+        :param name: 缓存名称，用于日志
+        """
+        self.loader = loader
+        self.probe = probe
+        self.ttl = ttl
+        self.probe_interval = probe_interval
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._inflight = None  # 正在进行的加载：threading.Event
+        self._snapshot = None
+        self._token = None
+        self._loaded_at = 0.0
+        self._probed_at = 0.0
+        self._stale = False
+        self.generation = 0  # 每次成功加载新快照时递增，用于标识数据版本
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'probes': 0,
+            'probe_errors': 0,
+            'load_errors': 0,
+            'waits': 0,
+        }
+
+    def _probe_token(self):
+        """调用探测函数；探测失败时返回 None，表示无法判断"""
+        try:
+            return self.probe()
+        except Exception as e:
+            with self._lock:
+                self._stats['probe_errors'] += 1
+            print(f"[{self.name}] 数据新鲜度探测失败: {e}")
+            return None
+
+    def _state(self, now):
+        """判断快照状态：'fresh' 直接命中，'probe' 需要探测，'load' 需要加载"""
+        if self._snapshot is None or self._stale:
+            return 'load'
+        if self.ttl is not None and now - self._loaded_at > self.ttl:
+            return 'load'
+        if self.probe is None or now - self._probed_at < self.probe_interval:
+            return 'fresh'
+        return 'probe'
+
+    def get(self):
+        """返回当前数据快照（只读使用），无法加载时返回 None"""
+        while True:
+            with self._lock:
+                now = time.time()
+                state = self._state(now)
+                if state == 'fresh':
+                    self._stats['hits'] += 1
+                    return self._snapshot
+                if state == 'probe':
+                    # 先更新探测时间，探测期间其他请求直接使用现有快照
+                    self._probed_at = now
+                    self._stats['probes'] += 1
+                    snapshot, token = self._snapshot, self._token
+
+            if state == 'probe':
+                # 探测在锁外进行，避免数据源响应慢时阻塞所有读取
+                new_token = self._probe_token()
+                with self._lock:
+                    # 探测失败时继续使用现有快照，直到 TTL 到期
+                    if new_token is None or new_token == token:
+                        self._stats['hits'] += 1
+                        return snapshot
+                    self._stale = True
+                continue
+
+            with self._lock:
+                if self._inflight is None:
+                    self._inflight = threading.Event()
+                    inflight, is_leader = self._inflight, True
+                    if self._snapshot is None:
+                        self._stats['misses'] += 1
+                    else:
+                        self._stats['refreshes'] += 1
+                else:
+                    inflight, is_leader = self._inflight, False
+                    self._stats['waits'] += 1
+
+            if is_leader:
+                return self._load(inflight)
+
+            # 等待正在进行的加载完成，共享其结果
+            inflight.wait()
+            with self._lock:
+                if self._snapshot is not None or self._inflight is None:
+                    # 加载失败且没有旧快照时返回 None，不再重复冲击数据源
+                    return self._snapshot
+
+    def _load(self, inflight):
+        if self.probe is not None:
+            with self._lock:
+                self._stats['probes'] += 1
+            token = self._probe_token()
+        else:
+            token = None
+        try:
+            df = self.loader()
+        except Exception as e:
+            print(f"[{self.name}] 加载数据时出错: {e}")
+            df = None
+
+        with self._lock:
+            now = time.time()
+            if df is not None:
+                self._snapshot = df
+                self._token = token
+                self._loaded_at = now
+                self._probed_at = now
+                self._stale = False
+                self.generation += 1
+                print(f"[{self.name}] 数据快照已刷新，行数: {len(df)}")
+            else:
+                self._stats['load_errors'] += 1
+            self._inflight = None
+            inflight.set()
+            # 加载失败时保留旧快照（若有），避免数据源抖动导致接口不可用
+            return self._snapshot
+
+    def prime(self, df, token=None):
+        """
+        用已有数据预热缓存（如启动时从本地镜像加载的数据）。
+
+        token 为 None 时，下一次探测成功即会触发从数据源刷新。
+        """
+        with self._lock:
+            if df is None or self._snapshot is not None:
+                return False
+            self._snapshot = df
+            self._token = token
+            self._loaded_at = self._probed_at = time.time()
+            self._stale = False
+            self.generation += 1
+            return True
+
+    def stats(self):
+        """返回命中/未命中/刷新等统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['generation'] = self.generation
+            stats['cached'] = self._snapshot is not None
+            stats['rows'] = len(self._snapshot) if self._snapshot is not None else 0
+            stats['age_seconds'] = time.time() - self._loaded_at if self._snapshot is not None else None
+            stats['memory_bytes'] = (int(self._snapshot.memory_usage(deep=True).sum())
+                                     if self._snapshot is not None else 0)
+            return stats
@@ -0,0 +1,170 @@
+"""
+数据集结构定义。
+
+为每一列声明类型与取值范围，读取数据时据此：
+- 将列转换为能容纳取值范围的最小整数类型（如 0~30 的量表 -> uint8），取值集合固定的文本列转换为 category；
+- 校验取值：缺失、非整数或超出范围的行按策略丢弃或报错。
+
+stress_level_dataset 的 21 列都是小范围整数量表与 0/1 标志，从 ``pd.read_sql``/``read_csv`` 读出时为
+int64（Hive 返回文本时为 object），转换为 uint8 后内存占用约为原来的 1/8。
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+INVALID_ROW_POLICIES = ('drop', 'raise')
+
+# 按从小到大的顺序选择能容纳取值范围的整数类型
+_INTEGER_DTYPES = (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32, np.int64)
+
+
+class SchemaError(ValueError):
+    """数据不符合声明的结构"""
+
+
+@dataclass(frozen=True)
+class Column:
+    """
+    列声明。
+
+    kind 为 'int'（取值在 [min, max] 之间的整数）、'flag'（0/1 标志）或 'category'（取值属于 categories）。
+    """
+    name: str
+    kind: str
+    min: int = None
+    max: int = None
+    categories: tuple = None
+
+    @property
+    def dtype(self):
+        """存储该列使用的类型"""
+        if self.kind == 'category':
+            return pd.CategoricalDtype(list(self.categories))
+        for dtype in _INTEGER_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= self.min and self.max <= info.max:
+                return np.dtype(dtype)
+        raise SchemaError(f'列 {self.name} 的取值范围 [{self.min}, {self.max}] 超出 int64')
+
+    def invalid(self, series):
+        """
+        转换为数值并找出不合法的取值。
+
+        :return: (转换后的 Series, 不合法行的布尔掩码)
+        """
+        if self.kind == 'category':
+            return series, ~series.isin(self.categories)
+        if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            # 已是整数类型（Hive/CSV 的常见情况）：只需检查范围
+            return series, (series < self.min) | (series > self.max)
+        values = pd.to_numeric(series, errors='coerce')
+        return values, values.isna() | (values % 1 != 0) | (values < self.min) | (values > self.max)
+
+
+def integer(name, min_value, max_value):
+    """取值在 [min_value, max_value] 之间的整数列"""
+    return Column(name, 'int', min_value, max_value)
+
+
+def flag(name):
+    """0/1 标志列"""
+    return Column(name, 'flag', 0, 1)
+
+
+def category(name, categories):
+    """取值属于 categories 的分类列"""
+    return Column(name, 'category', categories=tuple(categories))
+
+
+class DatasetSchema:
+    """数据集各列的声明"""
+
+    def __init__(self, columns):
+        self.columns = {column.name: column for column in columns}
+
+    @property
+    def names(self):
+        return list(self.columns)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def select(self, names):
+        """
+        按给定顺序选取部分列，组成新的结构。
+
+        :raise SchemaError: 有列没有声明
+        """
+        missing = [name for name in names if name not in self.columns]
+        if missing:
+            raise SchemaError(f"以下列没有声明类型与取值范围: {', '.join(missing)}")
+        return DatasetSchema([self.columns[name] for name in names])
+
+    def conform(self, df, on_invalid='drop', name='dataset'):
+        """
+        校验并转换数据：已声明的列转换为紧凑类型，未声明的列（如分区列、聚合结果的计数列）原样保留。
+
+        :param df: 原始数据，可以只包含部分列
+        :param on_invalid: 存在不合法取值时 'drop' 丢弃这些行，'raise' 抛出 SchemaError
+        :param name: 数据集名称，用于日志
+        :return: 新的 DataFrame
+        """
+        if on_invalid not in INVALID_ROW_POLICIES:
+            raise ValueError(f'on_invalid 必须是以下之一: {", ".join(INVALID_ROW_POLICIES)}')
+
+        converted = {}
+        invalid = np.zeros(len(df), dtype=bool)
+        counts = {}
+        for col in df.columns:
+            if col not in self.columns:
+                continue
+            values, mask = self.columns[col].invalid(df[col])
+            mask = mask.to_numpy(dtype=bool)
+            if mask.any():
+                counts[col] = int(mask.sum())
+                invalid |= mask
+            converted[col] = values
+
+        if counts:
+            detail = ', '.join(f'{col}: {count}' for col, count in counts.items())
+            if on_invalid == 'raise':
+                raise SchemaError(f'[{name}] {int(invalid.sum())} 行数据不合法（{detail}）')
+            print(f"[{name}] 丢弃 {int(invalid.sum())}/{len(df)} 行不合法的数据（{detail}）")
+
+        keep = ~invalid if counts else None
+        result = {}
+        for col in df.columns:
+            series = converted.get(col, df[col])
+            if keep is not None:
+                series = series[keep]
+            if col in converted:
+                series = series.astype(self.columns[col].dtype, copy=False)
+            result[col] = series
+        return pd.DataFrame(result, columns=df.columns, copy=False)
+
+
+# stress_level_dataset 各列的量表范围
+STRESS_LEVEL_SCHEMA = DatasetSchema([
+    integer('anxiety_level', 0, 21),      # GAD-7
+    integer('self_esteem', 0, 30),        # Rosenberg 自尊量表
+    flag('mental_health_history'),
+    integer('depression', 0, 27),         # PHQ-9
+    integer('headache', 0, 5),
+    integer('blood_pressure', 0, 5),
+    integer('sleep_quality', 0, 5),
+    integer('breathing_problem', 0, 5),
+    integer('noise_level', 0, 5),
+    integer('living_conditions', 0, 5),
+    integer('safety', 0, 5),
+    integer('basic_needs', 0, 5),
+    integer('academic_performance', 0, 5),
+    integer('study_load', 0, 5),
+    integer('teacher_student_relationship', 0, 5),
+    integer('future_career_concerns', 0, 5),
+    integer('social_support', 0, 5),
+    integer('peer_pressure', 0, 5),
+    integer('extracurricular_activities', 0, 5),
+    integer('bullying', 0, 5),
+    integer('stress_level', 0, 2),
+])
@@ -0,0 +1,224 @@
+import numpy as np
+from scipy.stats import gaussian_kde
+
+
+class Evaluation:
+    """一个模型版本在留出测试集上的评估结果：结构化指标与概率矩阵"""
+
+    def __init__(self, metrics, y_proba):
+        self.metrics = metrics
+        self.y_proba = y_proba
+
+    @property
+    def accuracy(self):
+        return self.metrics['accuracy']
+
+
+def _to_builtin(value):
+    """将numpy标量转换为Python内置类型，便于JSON序列化"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def binary_roc(y_true, y_score):
+    """
+    计算二分类ROC曲线（与 sklearn.metrics.roc_curve 的阈值定义一致，保留全部不同阈值）。
+
+    :param y_true: 布尔数组，是否为正类
+    :param y_score: 正类得分
+    :return: fpr, tpr, thresholds
+    """
+    order = np.argsort(-y_score, kind='mergesort')
+    scores = y_score[order]
+    truth = y_true[order]
+
+    # 每个不同得分的最后一个位置即为一个阈值
+    distinct = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+    tps = np.cumsum(truth)[distinct]
+    fps = distinct + 1 - tps
+
+    tps = np.r_[0, tps]
+    fps = np.r_[0, fps]
+    thresholds = np.r_[np.inf, scores[distinct]]
+    fpr = fps / fps[-1] if fps[-1] > 0 else np.full(fps.shape, np.nan)
+    tpr = tps / tps[-1] if tps[-1] > 0 else np.full(tps.shape, np.nan)
+    return fpr, tpr, thresholds
+
+
+def area_under_curve(x, y):
+    """梯形法计算曲线下面积"""
+    if np.isnan(x).any() or np.isnan(y).any():
+        return float('nan')
+    return float(np.sum(np.diff(x) * (y[1:] + y[:-1]) / 2))
+
+
+def _curve(fpr, tpr):
+    return {'fpr': fpr.tolist(), 'tpr': tpr.tolist(), 'auc': area_under_curve(fpr, tpr)}
+
+
+def evaluate_predictions(classes, y_true, y_proba):
+    """
+    基于概率矩阵计算全部评估指标，不再调用模型。
+
+    :param classes: 类别标签（与概率矩阵的列对应，即 model.classes_）
+    :param y_true: 真实标签
+    :param y_proba: 概率矩阵，形状 (n_samples, n_classes)
+    :return: 可JSON序列化的指标字典
+    """
+    classes = np.asarray(classes)
+    y_true = np.asarray(y_true)
+    n_classes = len(classes)
+
+    # 将真实标签映射为列索引；不在 classes 中的标签无法参与统计
+    true_idx = np.searchsorted(classes, y_true)
+    true_idx = np.clip(true_idx, 0, n_classes - 1)
+    known = classes[true_idx] == y_true
+    true_idx = true_idx[known]
+    pred_idx = np.argmax(y_proba, axis=1)[known]
+    proba = y_proba[known]
+
+    # 混淆矩阵：行为真实类别，列为预测类别
+    cm = np.bincount(true_idx * n_classes + pred_idx,
+                     minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+    tp = np.diag(cm).astype(float)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(support > 0, tp / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    total = int(support.sum())
+    accuracy = float(tp.sum() / total) if total else 0.0
+
+    report = {}
+    for i, cls in enumerate(classes):
+        report[str(_to_builtin(cls))] = {
+            'precision': float(precision[i]),
+            'recall': float(recall[i]),
+            'f1-score': float(f1[i]),
+            'support': int(support[i]),
+        }
+    weights = support / total if total else np.zeros(n_classes)
+    report['macro avg'] = {
+        'precision': float(precision.mean()),
+        'recall': float(recall.mean()),
+        'f1-score': float(f1.mean()),
+        'support': total,
+    }
+    report['weighted avg'] = {
+        'precision': float(precision @ weights),
+        'recall': float(recall @ weights),
+        'f1-score': float(f1 @ weights),
+        'support': total,
+    }
+
+    # ROC：one-vs-rest 的每个类别、micro 与 macro 平均
+    y_bin = np.zeros((len(true_idx), n_classes), dtype=bool)
+    y_bin[np.arange(len(true_idx)), true_idx] = True
+
+    per_class = {}
+    curves = []
+    for i, cls in enumerate(classes):
+        fpr, tpr, _ = binary_roc(y_bin[:, i], proba[:, i])
+        curves.append((fpr, tpr))
+        per_class[str(_to_builtin(cls))] = _curve(fpr, tpr)
+
+    micro_fpr, micro_tpr, _ = binary_roc(y_bin.ravel(), proba.ravel())
+
+    valid = [(fpr, tpr) for fpr, tpr in curves if not (np.isnan(fpr).any() or np.isnan(tpr).any())]
+    if valid:
+        all_fpr = np.unique(np.concatenate([fpr for fpr, _ in valid]))
+        mean_tpr = np.mean([np.interp(all_fpr, fpr, tpr) for fpr, tpr in valid], axis=0)
+    else:
+        all_fpr = mean_tpr = np.array([np.nan])
+
+    return {
+        'classes': [_to_builtin(cls) for cls in classes],
+        'n_test': int(len(y_true)),
+        'accuracy': accuracy,
+        'confusion_matrix': cm.tolist(),
+        'classification_report': report,
+        'roc': {
+            'per_class': per_class,
+            'micro': _curve(micro_fpr, micro_tpr),
+            'macro': _curve(all_fpr, mean_tpr),
+        },
+    }
+
+
+def evaluate_model(model, X_test, y_test):
+    """
+    在留出测试集上评估模型，只进行一次 predict_proba 推理。
+
+    :return: Evaluation
+    """
+    y_proba = model.predict_proba(X_test)
+    return Evaluation(evaluate_predictions(model.classes_, y_test, y_proba), y_proba)
+
+
+def ensure_evaluation(record, registry=None):
+    """
+    获取模型记录的评估结果；旧版本尚未评估时计算一次，并在提供 registry 时持久化。
+
+    :return: 指标字典
+    """
+    if record.metrics is None:
+        evaluation = evaluate_model(record.model, record.X_test, record.y_test)
+        record.metrics, record.y_proba = evaluation.metrics, evaluation.y_proba
+        if registry is not None:
+            registry.save_evaluation(record.version, evaluation.metrics, evaluation.y_proba)
+    return record.metrics
+
+
+def downsample_curve(curve, points):
+    """
+    将ROC曲线重采样到固定数量的点（在均匀的假正率网格上插值），用于前端绘图。
+
+    :param curve: {'fpr': [...], 'tpr': [...], 'auc': float}
+    :param points: 目标点数；曲线本身点数更少时原样返回
+    :return: 重采样后的曲线
+    """
+    fpr = np.asarray(curve['fpr'], dtype=float)
+    tpr = np.asarray(curve['tpr'], dtype=float)
+    if len(fpr) <= points or np.isnan(fpr).any() or np.isnan(tpr).any():
+        return curve
+    grid = np.linspace(0.0, 1.0, points)
+    return {'fpr': grid.tolist(), 'tpr': np.interp(grid, fpr, tpr).tolist(), 'auc': curve['auc']}
+
+
+def kde_grids(X_test, y_test, features, points=64, cut=3.0):
+    """
+    计算各特征在不同类别下的高斯核密度估计网格（与 seaborn.kdeplot 默认的 Scott 带宽一致）。
+
+    :param X_test: 测试集特征
+    :param y_test: 测试集标签
+    :param features: 需要计算的特征列表
+    :param points: 网格点数
+    :param cut: 网格在数据范围外延伸的带宽倍数
+    :return: {特征: {'grid': [...], 'density': {类别: [...] 或 None}}}
+    """
+    y = np.asarray(y_test)
+    classes = np.unique(y)
+    result = {}
+    for feature in features:
+        values = np.asarray(X_test[feature], dtype=float)
+        kdes = {}
+        for cls in classes:
+            subset = values[y == cls]
+            try:
+                kdes[cls] = gaussian_kde(subset) if len(subset) > 1 else None
+            except np.linalg.LinAlgError:
+                # 该类别下特征取值完全相同，无法估计密度
+                kdes[cls] = None
+
+        # kde.covariance 已包含带宽系数，其平方根即核的标准差
+        bandwidth = max([np.sqrt(kde.covariance[0, 0]) for kde in kdes.values() if kde is not None],
+                        default=0.0)
+        grid = np.linspace(values.min() - cut * bandwidth, values.max() + cut * bandwidth, points)
+        result[feature] = {
+            'grid': grid.tolist(),
+            'density': {str(_to_builtin(cls)): (kde(grid).tolist() if kde is not None else None)
+                        for cls, kde in kdes.items()},
+        }
+    return result
@@ -0,0 +1,182 @@
+import time
+
+import numpy as np
+
+# 可选的推理引擎
+ENGINE_SKLEARN = 'sklearn'
+ENGINE_COMPILED = 'compiled'
+ENGINES = (ENGINE_SKLEARN, ENGINE_COMPILED)
+
+# 编译后推理时每个分块的行数，限制 (行数 x 树数) 节点索引矩阵的内存
+COMPILED_CHUNK_ROWS = 4096
+
+
+class CompiledForest:
+    """
+    展平为 NumPy 数组的随机森林。
+
+    所有树的节点拼接为一组扁平数组（特征索引、阈值、左右子节点、叶子概率），
+    推理时对一批样本的所有树按层同时向下走一步，共走 max_depth 步即全部到达叶子。
+    叶子节点的左右子节点指向自身，因此提前到达叶子的样本原地不动。
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_proba, roots, max_depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_estimators = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        从训练好的 RandomForestClassifier 编译。
+
+        :param model: sklearn 随机森林分类器（单输出）
+        :return: CompiledForest
+        """
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left < 0
+            local = np.arange(n_nodes)
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, local, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, local, tree.children_right) + offset)
+
+            # 新版 sklearn 的 tree_.value 已是类别比例，直接使用；旧版存的是样本计数，
+            # 按 sklearn 旧版 predict_proba 的方式归一化。再次归一化比例会改变末位精度。
+            value = tree.value[:, 0, :]
+            normalizer = value.sum(axis=1, keepdims=True)
+            if not np.allclose(normalizer, 1.0):
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            probas.append(np.array(value, dtype=np.float64))
+
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            leaf_proba=np.concatenate(probas),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=model.classes_,
+        )
+
+    def _predict_chunk(self, X):
+        n_samples = X.shape[0]
+        rows = np.arange(n_samples)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_samples, len(self.roots))).copy()
+
+        for _ in range(self.max_depth):
+            # 与 sklearn 相同：float32 特征值与 float64 阈值比较，小于等于走左子树
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # 按树的顺序逐棵累加，保证浮点求和顺序与 sklearn 完全一致
+        proba = np.zeros((n_samples, self.leaf_proba.shape[1]))
+        for t in range(nodes.shape[1]):
+            proba += self.leaf_proba[nodes[:, t]]
+        proba /= self.n_estimators
+        return proba
+
+    def predict_proba(self, X):
+        """预测类别概率，X 会被转换为 float32（与 sklearn 树模型一致）"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.shape[0] <= COMPILED_CHUNK_ROWS:
+            return self._predict_chunk(X)
+        return np.concatenate([self._predict_chunk(X[start:start + COMPILED_CHUNK_ROWS])
+                               for start in range(0, X.shape[0], COMPILED_CHUNK_ROWS)])
+
+    def predict(self, X):
+        """预测类别"""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def verify_compiled(compiled, model, X):
+    """
+    校验编译后的森林与 sklearn 的输出逐位一致。
+
+    :return: 是否完全一致
+    """
+    X = np.asarray(X, dtype=np.float32)
+    return bool(np.array_equal(compiled.predict_proba(X), model.predict_proba(X)))
+
+
+def measure_throughput(predict_proba, X, min_seconds=0.2):
+    """
+    测量推理吞吐量。
+
+    :return: 每秒处理的行数
+    """
+    X = np.asarray(X, dtype=np.float32)
+    predict_proba(X)  # 预热
+    rows = 0
+    started = time.perf_counter()
+    while True:
+        predict_proba(X)
+        rows += len(X)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return rows / elapsed
+
+
+def compile_and_benchmark(model, X):
+    """
+    编译森林、校验输出并与 sklearn 路径比较吞吐量。
+
+    :param model: sklearn 随机森林
+    :param X: 用于校验与测速的样本（通常为留出测试集）
+    :return: (CompiledForest, 报告字典)
+    """
+    started = time.perf_counter()
+    compiled = CompiledForest.from_sklearn(model)
+    compile_seconds = time.perf_counter() - started
+
+    report = {
+        'compile_seconds': compile_seconds,
+        'n_nodes': int(len(compiled.feature)),
+        'max_depth': int(compiled.max_depth),
+        'verified': verify_compiled(compiled, model, X),
+        'rows': int(len(X)),
+        'sklearn_rows_per_second': measure_throughput(model.predict_proba, X),
+        'compiled_rows_per_second': measure_throughput(compiled.predict_proba, X),
+    }
+    report['speedup'] = report['compiled_rows_per_second'] / report['sklearn_rows_per_second']
+    return compiled, report
+
+
+def scoring_model(record):
+    """
+    返回模型版本在线预测实际使用的模型对象（sklearn 模型或编译后的森林）。
+
+    编译后的森林在首次使用时生成，并在留出测试集上校验与 sklearn 输出一致，
+    校验失败时回退到 sklearn。
+
+    :param record: 模型仓库中的模型记录
+    :return: 具有 predict_proba 与 classes_ 的模型对象
+    """
+    if record.inference_engine != ENGINE_COMPILED:
+        return record.model
+    if record.compiled_forest is None:
+        compiled = CompiledForest.from_sklearn(record.model)
+        if record.X_test is not None and not verify_compiled(compiled, record.model, record.X_test):
+            print(f"模型版本 {record.version} 编译后的输出与 sklearn 不一致，回退到 sklearn 推理")
+            record.compiled_forest = record.model
+        else:
+            record.compiled_forest = compiled
+    return record.compiled_forest
@@ -0,0 +1,87 @@
+"""
+gunicorn 生产部署配置。
+
+    cd backend && gunicorn -c gunicorn.conf.py
+
+- preload_app：主进程通过 wsgi:create_app() 导入应用并预热（当前模型版本、数据集、数据摘要），
+  工作进程 fork 后通过写时复制共享，不再各自加载；
+- 工作进程数取 WEB_CONCURRENCY（默认为CPU核数），每个工作进程 GUNICORN_THREADS 个线程（gthread）；
+  训练任务的CPU预算按实际的工作进程数平分；
+- 主进程每隔 MODEL_WATCH_INTERVAL 秒检查模型仓库的当前版本，有新版本被提升时平滑重启：
+  先在主进程中加载新版本，再 fork 新的工作进程并逐个退出旧的（与 kill -HUP 相同）；
+  任一工作进程中还有训练任务或图表预渲染在进行时推迟重启（见 serving.ReloadGuard）；
+- 训练任务的状态与结果保存在模型仓库中，查询可以落到任意工作进程，重启后仍可查询；
+  工作进程退出时等待其中进行中的训练任务完成，最长 GUNICORN_GRACEFUL_TIMEOUT 秒；
+- 存活检查 GET /api/health，就绪检查 GET /api/ready（预热完成前返回 503）。
+"""
+import gc
+import multiprocessing
+import os
+import signal
+import sys
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))                   # 图表渲染等慢请求的上限（秒）
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))  # 平滑重启时等待旧工作进程的时间（秒）
+keepalive = 5
+preload_app = True
+wsgi_app = 'wsgi:create_app()'
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 5))  # 0 表示不监视模型版本
+
+# app.WEB_WORKERS 读取该环境变量，用于平分训练任务的CPU预算
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+_watcher = None
+
+
+def _backend():
+    """主进程预加载的应用模块，未预加载时返回 None"""
+    return sys.modules.get('app')
+
+
+def _prepare_fork(server, backend):
+    # 命令行的 -w 会覆盖本文件中的 workers，以实际的工作进程数为准
+    backend.training_parallelism.web_workers = server.num_workers
+    # 将预热后的对象移出垃圾回收的跟踪范围，避免工作进程中的回收扫描触发写时复制
+    gc.freeze()
+
+
+def when_ready(server):
+    global _watcher
+    backend = _backend()
+    if backend is None:
+        return
+    _prepare_fork(server, backend)
+    if MODEL_WATCH_INTERVAL > 0 and _watcher is None:
+        from serving import ModelVersionWatcher
+        _watcher = ModelVersionWatcher(backend.model_registry.current_version,
+                                       lambda version: os.kill(server.pid, signal.SIGHUP),
+                                       interval=MODEL_WATCH_INTERVAL, busy=backend.reload_guard.holders)
+        _watcher.start()
+        server.log.info("监视模型版本变化，间隔 %s 秒", MODEL_WATCH_INTERVAL)
+
+
+def on_reload(server):
+    backend = _backend()
+    if backend is None:
+        return
+    server.log.info("重新预热：当前模型版本 %s", backend.model_registry.current_version())
+    backend.warm_up()
+    _prepare_fork(server, backend)
+
+
+def post_fork(server, worker):
+    backend = _backend()
+    if backend is not None:
+        backend.after_fork()
+
+
+def worker_exit(server, worker):
+    backend = _backend()
+    if backend is not None:
+        backend.shutdown()
@@ -0,0 +1,246 @@
+"""
+Hive 连接池与熔断器。
+
+create_hive_engine 创建带连接池的 SQLAlchemy 引擎：限制连接数与溢出数、借出前探活、
+定期回收长连接，并在建立连接前做一次带超时的 TCP 探测，HiveServer2 不可达时快速失败。
+
+CircuitBreaker 在连续失败达到阈值后熔断：之后的调用立即抛出 CircuitOpenError，
+调用方直接走本地回退，不再等待连接超时；后台线程定期探测，Hive 恢复后自动闭合。
+"""
+import socket
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+# 连接池默认配置
+DEFAULT_POOL_SIZE = 5           # 常驻连接数
+DEFAULT_MAX_OVERFLOW = 10       # 高峰时允许额外创建的连接数
+DEFAULT_POOL_TIMEOUT = 10.0     # 等待空闲连接的最长秒数
+DEFAULT_POOL_RECYCLE = 1800     # 连接最长存活秒数，避免使用被服务端关闭的连接
+DEFAULT_CONNECT_TIMEOUT = 3.0   # 建立连接的超时秒数
+DEFAULT_QUERY_TIMEOUT = 60      # 单条查询的超时秒数（hive.query.timeout.seconds），None 表示不限制
+
+
+# 计为 Hive 故障的异常：连接失败与超时
+FAILURE_ERRORS = (OperationalError, ConnectionError, socket.gaierror, socket.timeout, TimeoutError)
+
+
+class CircuitOpenError(ConnectionError):
+    """熔断器处于打开状态，调用未执行"""
+
+
+def is_hive_failure(error):
+    """
+    判断异常是否说明 Hive 不可用。
+
+    只有连接失败与超时才计入熔断；SQL 错误、我们自己代码的 bug 等与 Hive 可用性无关。
+    pyhive 对服务端返回的任何错误状态都抛出 OperationalError，其中 SQLSTATE 为 42 类
+    （语法错误、表或字段不存在、无权限）的是查询本身的问题，同样不计入。
+
+    :param error: 调用抛出的异常
+    :return: 是否计为一次失败
+    """
+    if not isinstance(error, FAILURE_ERRORS):
+        return False
+    if isinstance(error, OperationalError):
+        response = error.orig.args[0] if error.orig is not None and error.orig.args else None
+        sql_state = getattr(getattr(response, 'status', None), 'sqlState', None) or ''
+        return not sql_state.startswith('42')
+    return True
+
+
+def check_reachable(host, port, timeout):
+    """TCP 探测服务端口是否可达，不可达时抛出 OSError"""
+    with socket.create_connection((host, port), timeout=timeout):
+        pass
+
+
+def create_hive_engine(url, pool_size=DEFAULT_POOL_SIZE, max_overflow=DEFAULT_MAX_OVERFLOW,
+                       pool_timeout=DEFAULT_POOL_TIMEOUT, pool_recycle=DEFAULT_POOL_RECYCLE,
+                       pool_pre_ping=True, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                       query_timeout=DEFAULT_QUERY_TIMEOUT):
+    """
+    创建带连接池的 Hive 引擎。
+
+    :param url: 连接URL，如 hive://user@host:10000/default
+    :param pool_size: 常驻连接数
+    :param max_overflow: 允许额外创建的连接数
+    :param pool_timeout: 等待空闲连接的最长秒数
+    :param pool_recycle: 连接最长存活秒数
+    :param pool_pre_ping: 借出连接前是否执行探活查询，失效连接会被自动替换
+    :param connect_timeout: 建立连接的超时秒数
+    :param query_timeout: 单条查询的超时秒数，None 表示不限制
+    :return: SQLAlchemy 引擎
+    """
+    parsed = make_url(url)
+    host, port = parsed.host, parsed.port or 10000
+    engine = create_engine(url, pool_size=pool_size, max_overflow=max_overflow,
+                           pool_timeout=pool_timeout, pool_recycle=pool_recycle,
+                           pool_pre_ping=pool_pre_ping)
+
+    @event.listens_for(engine, 'do_connect')
+    def _check_before_connect(dialect, conn_rec, cargs, cparams):
+        # pyhive 建立连接时没有超时参数，服务不可达时可能长时间阻塞，先做一次带超时的探测
+        check_reachable(host, port, connect_timeout)
+
+    if query_timeout is not None:
+        @event.listens_for(engine, 'connect')
+        def _set_query_timeout(dbapi_conn, conn_rec):
+            cursor = dbapi_conn.cursor()
+            try:
+                cursor.execute(f'SET hive.query.timeout.seconds={int(query_timeout)}s')
+            except Exception as e:
+                # 旧版本 Hive 不支持该参数时忽略
+                print(f"设置Hive查询超时失败: {e}")
+            finally:
+                cursor.close()
+
+    return engine
+
+
+def ping(engine):
+    """执行一次最简单的查询，确认 Hive 可用"""
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1')).fetchall()
+
+
+def pool_stats(engine):
+    """返回连接池状态"""
+    pool = engine.pool
+    stats = {'status': pool.status()}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
+
+
+class CircuitBreaker:
+    """
+    熔断器。
+
+    - closed：正常调用，连续失败 ``failure_threshold`` 次后打开；
+    - open：调用立即抛出 CircuitOpenError；后台线程每隔 ``probe_interval`` 秒调用 ``probe``，
+      探测成功后闭合。
+    """
+
+    def __init__(self, probe, failure_threshold=3, probe_interval=10.0, name='hive'):
+        """
+        :param probe: 无参探测函数，失败时抛出异常
+        :param failure_threshold: 连续失败多少次后熔断
+        :param probe_interval: 熔断期间两次探测之间的秒数
+        :param name: 名称，用于日志
+        """
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = None
+        self._last_error = None
+        self._prober = None
+        self._stats = {
+            'calls': 0,
+            'failures': 0,
+            'rejected': 0,
+            'trips': 0,
+            'probes': 0,
+        }
+
+    @property
+    def state(self):
+        return self._state
+
+    def allow(self):
+        """当前是否允许调用"""
+        with self._lock:
+            if self._state == 'open':
+                self._stats['rejected'] += 1
+                return False
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self, error):
+        with self._lock:
+            self._stats['failures'] += 1
+            self._failures += 1
+            self._last_error = str(error)
+            if self._state == 'closed' and self._failures >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self):
+        self._state = 'open'
+        self._opened_at = time.time()
+        self._stats['trips'] += 1
+        print(f"[{self.name}] 连续失败 {self._failures} 次，熔断并切换到本地数据: {self._last_error}")
+        self._start_prober()
+
+    def _start_prober(self):
+        if self._prober is None or not self._prober.is_alive():
+            self._prober = threading.Thread(target=self._probe_loop, name=f'{self.name}-probe', daemon=True)
+            self._prober.start()
+
+    def after_fork(self):
+        """
+        在 fork 出的子进程中调用：父进程的探测线程不会被复制，锁也可能处于被持有的状态。
+        重建锁，熔断中时在子进程中重新启动探测线程。
+        """
+        self._lock = threading.Lock()
+        self._prober = None
+        if self._state == 'open':
+            self._start_prober()
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                self._stats['probes'] += 1
+            try:
+                self.probe()
+            except Exception as e:
+                with self._lock:
+                    self._last_error = str(e)
+                continue
+            with self._lock:
+                self._state = 'closed'
+                self._failures = 0
+                self._opened_at = None
+            print(f"[{self.name}] 探测成功，熔断器已闭合")
+            return
+
+    def call(self, fn, *args, **kwargs):
+        """
+        通过熔断器调用函数。只有 is_hive_failure 认定的异常计为失败，其余异常原样抛出，
+        不改变熔断器状态。
+
+        :raises CircuitOpenError: 熔断器打开时不执行调用
+        """
+        if not self.allow():
+            raise CircuitOpenError(f'{self.name} 暂不可用（熔断中）')
+        with self._lock:
+            self._stats['calls'] += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_hive_failure(e):
+                self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        """返回熔断器状态与统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self._state
+            stats['consecutive_failures'] = self._failures
+            stats['open_seconds'] = time.time() - self._opened_at if self._opened_at else None
+            stats['last_error'] = self._last_error
+            return stats
@@ -0,0 +1,248 @@
+"""
+轻量级运行时指标与请求追踪。
+
+- 每个请求分配请求ID（沿用请求头 X-Request-ID，否则随机生成），并在响应头中返回；
+- ``with span('hive_query'):`` 统计请求内各阶段（Hive 查询、列名处理、推理、绘图、base64 编码等）的耗时，
+  同时计入按接口与阶段区分的直方图；
+- 请求结束时输出一行 JSON 结构化日志，包含请求ID、状态码、总耗时与各阶段耗时；
+- ``/metrics`` 以 Prometheus 文本格式输出请求与阶段耗时直方图，以及缓存、连接池等状态的仪表值。
+
+不依赖 prometheus_client，指标在进程内汇总；多进程部署时每个工作进程分别暴露自己的指标。
+"""
+import contextvars
+import json
+import math
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+# 直方图默认分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+BACKGROUND_ENDPOINT = 'background'  # 请求之外（后台线程、训练任务回调）记录的阶段
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (name + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+               for name, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+class Histogram:
+    """按标签分组的累积直方图"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        self._series = {}  # 标签取值 -> [各分桶计数, 总和, 总数]
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        """输出 Prometheus 文本格式的样本行"""
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for key, (counts, total, count) in sorted(series.items()):
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", _format_value(bound))])} '
+                             f'{cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+
+class Gauge:
+    """抓取时由回调函数计算的仪表值"""
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        """
+        :param callback: 无参函数；无标签时返回数值，有标签时返回 {标签取值元组: 数值}
+        """
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"采集指标 {self.name} 时出错: {e}")
+            return lines
+        if not self.labelnames:
+            values = {(): values}
+        for key, value in sorted(values.items(), key=lambda item: tuple(map(str, item[0]))):
+            if value is None:
+                continue
+            lines.append(f'{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}')
+        return lines
+
+
+class Metrics:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, callback, labelnames=()):
+        metric = Gauge(name, documentation, callback, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus 文本格式 (0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+def numeric_stats(stats):
+    """从状态字典中取出数值项（布尔值转换为 0/1），用于仪表值"""
+    return {key: float(value) for key, value in stats.items()
+            if isinstance(value, (int, float)) and not (isinstance(value, float) and math.isnan(value))}
+
+
+# 进程级指标
+metrics = Metrics()
+request_seconds = metrics.histogram('http_request_duration_seconds', '接口请求耗时（秒）',
+                                    ('endpoint', 'method', 'status'))
+stage_seconds = metrics.histogram('stage_duration_seconds', '请求内各阶段耗时（秒）', ('endpoint', 'stage'))
+
+
+class RequestTrace:
+    """一次请求的追踪信息"""
+
+    def __init__(self, request_id, endpoint):
+        self.request_id = request_id
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+_current_trace = contextvars.ContextVar('request_trace', default=None)
+
+
+def current_request_id():
+    """当前请求的ID，不在请求中时返回 None"""
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def observe_stage(stage, seconds, endpoint=None):
+    """记录一个阶段的耗时（用于在别处测得的耗时，如训练任务的拟合时间）"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+    stage_seconds.observe(seconds, endpoint=endpoint or (trace.endpoint if trace else BACKGROUND_ENDPOINT),
+                          stage=stage)
+
+
+@contextmanager
+def span(stage):
+    """统计上下文内代码的耗时，计入当前请求的阶段耗时与阶段直方图"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def in_current_context(fn):
+    """
+    包装函数，使其在其他线程中执行时仍属于当前请求（阶段耗时计入当前请求）。
+
+    用于提交到线程池的任务：``pool.submit(in_current_context(fn), *args)``。
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def log_event(event, **fields):
+    """输出一行 JSON 结构化日志，自动带上当前请求ID"""
+    record = {'ts': round(time.time(), 3), 'event': event, 'request_id': current_request_id(), **fields}
+    print(json.dumps(record, ensure_ascii=False, default=str), flush=True)
+
+
+def init_app(app, request_logs=True, metrics_path='/metrics'):
+    """
+    为 Flask 应用安装请求ID、请求耗时统计、结构化日志与 /metrics 接口。
+
+    :param request_logs: 是否为每个请求输出结构化日志
+    :param metrics_path: 指标接口路径
+    """
+    @app.before_request
+    def _start_trace():
+        request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        g.request_trace = RequestTrace(request_id, endpoint)
+        g.request_trace_token = _current_trace.set(g.request_trace)
+
+    @app.after_request
+    def _finish_trace(response):
+        trace = g.get('request_trace')
+        if trace is None:
+            return response
+        elapsed = time.perf_counter() - trace.started
+        response.headers[REQUEST_ID_HEADER] = trace.request_id
+        if trace.endpoint != metrics_path:
+            request_seconds.observe(elapsed, endpoint=trace.endpoint, method=request.method,
+                                    status=response.status_code)
+            if request_logs:
+                log_event('request', method=request.method, path=request.path, endpoint=trace.endpoint,
+                          status=response.status_code, duration_ms=round(elapsed * 1000, 3),
+                          response_bytes=response.calculate_content_length(),
+                          stages_ms={name: round(seconds * 1000, 3) for name, seconds in trace.stages.items()})
+        return response
+
+    @app.teardown_request
+    def _reset_trace(error=None):
+        token = g.pop('request_trace_token', None)
+        if token is not None:
+            _current_trace.reset(token)
+
+    @app.route(metrics_path, methods=['GET'])
+    def prometheus_metrics():
+        """Prometheus 格式的指标"""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
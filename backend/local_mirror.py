@@ -0,0 +1,136 @@
+"""
+Hive表的本地列式镜像。
+
+将 stress_level_dataset 同步为本地 Arrow IPC 文件（未压缩，便于内存映射）。
+后端启动或Hive不可用时通过内存映射加载该文件：数值列可零拷贝转换为DataFrame，
+多个工作进程映射同一文件时共享操作系统的页缓存。
+
+同步命令:
+    python local_mirror.py                      # 从Hive同步
+    python local_mirror.py --csv path/to.csv    # 从CSV文件同步
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - pyarrow 为可选依赖
+    pa = None
+    ipc = None
+
+DEFAULT_MIRROR_PATH = os.environ.get(
+    'DATASET_MIRROR_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'stress_level_dataset.arrow')
+)
+
+
+def mirror_available():
+    """pyarrow 是否可用"""
+    return pa is not None
+
+
+def compact_dtypes(df):
+    """
+    将数值列向下转换为最紧凑的类型（如 int64 -> int8/uint8，float64 -> float32）。
+
+    :param df: 原始DataFrame
+    :return: 转换后的新DataFrame
+    """
+    compact = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            downcast = 'unsigned' if len(series) and series.min() >= 0 else 'integer'
+            compact[col] = pd.to_numeric(series, downcast=downcast)
+        elif pd.api.types.is_float_dtype(series):
+            compact[col] = pd.to_numeric(series, downcast='float')
+        else:
+            compact[col] = series
+    return pd.DataFrame(compact, index=df.index)
+
+
+def write_mirror(df, path=DEFAULT_MIRROR_PATH):
+    """
+    将DataFrame写入本地Arrow IPC镜像文件（先写临时文件再原子替换）。
+
+    :param df: 要写入的数据
+    :param path: 镜像文件路径
+    :return: 写入的行数
+    """
+    if not mirror_available():
+        raise RuntimeError("未安装 pyarrow，无法写入本地镜像")
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    table = pa.Table.from_pandas(compact_dtypes(df), preserve_index=False)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    # 不压缩：压缩后的缓冲区无法直接内存映射
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return table.num_rows
+
+
+def read_mirror(path=DEFAULT_MIRROR_PATH):
+    """
+    通过内存映射加载本地镜像。
+
+    :param path: 镜像文件路径
+    :return: DataFrame；文件不存在或pyarrow不可用时返回 None
+    """
+    if not mirror_available() or not os.path.exists(path):
+        return None
+
+    source = pa.memory_map(path, 'r')
+    table = ipc.open_file(source).read_all()
+    # split_blocks 避免将各列合并为一个二维块，无缺失值的数值列可零拷贝
+    return table.to_pandas(split_blocks=True)
+
+
+def sync_from_hive(engine, table_name='stress_level_dataset', path=DEFAULT_MIRROR_PATH, columns=None):
+    """
+    从Hive读取整张表并写入本地镜像。
+
+    :param engine: SQLAlchemy 引擎
+    :param table_name: Hive表名
+    :param path: 镜像文件路径
+    :param columns: 需要同步的列，默认全部列（分区表的分区列也会被读出）
+    :return: 写入的行数
+    """
+    print(f"正在从Hive读取表: {table_name}")
+    select_list = ', '.join(f'`{col}`' for col in columns) if columns else '*'
+    df = pd.read_sql(f"SELECT {select_list} FROM {table_name}", engine)
+    # 去掉列名中的表名前缀
+    df.columns = [col.split('.')[-1] for col in df.columns]
+    return write_mirror(df, path)
+
+
+def sync_from_csv(csv_path, path=DEFAULT_MIRROR_PATH):
+    """从CSV文件生成本地镜像"""
+    print(f"正在读取CSV文件: {csv_path}")
+    return write_mirror(pd.read_csv(csv_path), path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='同步Hive表到本地Arrow镜像')
+    parser.add_argument('--csv', help='从CSV文件而不是Hive同步')
+    parser.add_argument('--table', default='stress_level_dataset', help='Hive表名')
+    parser.add_argument('--output', default=DEFAULT_MIRROR_PATH, help='镜像文件路径')
+    parser.add_argument('--columns', nargs='+', help='只同步指定的列（如排除分区列 ingest_date）')
+    parser.add_argument('--hive-url', default='hive://24130@localhost:10005/default', help='Hive连接URL')
+    args = parser.parse_args()
+
+    try:
+        if args.csv:
+            rows = sync_from_csv(args.csv, args.output)
+        else:
+            from sqlalchemy import create_engine
+            rows = sync_from_hive(create_engine(args.hive_url), args.table, args.output, args.columns)
+        print(f"成功同步 {rows} 行数据到本地镜像: {args.output}")
+    except Exception as e:
+        print(f"同步本地镜像时出错: {str(e)}")
+        sys.exit(1)
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _Pending:
+    __slots__ = ('model', 'X', 'future', 'enqueued_at')
+
+    def __init__(self, model, X):
+        self.model = model
+        self.X = X
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    推理微批处理调度器。
+
+    并发的小批量预测请求进入队列，后台线程最多收集 ``max_batch_rows`` 行或等待
+    ``max_wait_ms`` 毫秒后，对同一模型的请求合并为一次向量化推理，再把结果切分给各个调用方。
+    行数已达到批大小的请求直接推理，不进入队列。
+    """
+
+    def __init__(self, predict, max_batch_rows=1024, max_wait_ms=2.0):
+        """
+        :param predict: 推理函数 predict(model, X)，返回与 X 行数一致的数组元组
+        :param max_batch_rows: 单批最大行数
+        :param max_wait_ms: 第一个请求进入队列后最多等待的毫秒数
+        """
+        self.predict_fn = predict
+        self.max_batch_rows = max_batch_rows
+        self.max_wait_ms = max_wait_ms
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._queued_rows = 0
+        self._thread = None
+        self._stats = {
+            'requests': 0,
+            'direct_requests': 0,
+            'batches': 0,
+            'batched_requests': 0,
+            'batched_rows': 0,
+            'max_queue_depth': 0,
+            'total_wait_seconds': 0.0,
+        }
+
+    def _ensure_started(self):
+        # 后台线程按需启动，避免在 fork 之前创建线程
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def submit(self, model, X):
+        """将请求放入队列，返回 concurrent.futures.Future"""
+        pending = _Pending(model, X)
+        with self._cond:
+            self._ensure_started()
+            self._queue.append(pending)
+            self._queued_rows += len(X)
+            self._stats['requests'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], len(self._queue))
+            self._cond.notify()
+        return pending.future
+
+    def predict(self, model, X, timeout=None):
+        """
+        预测并等待结果。
+
+        :return: predict 函数返回的数组元组（只包含本请求的行）
+        """
+        if len(X) >= self.max_batch_rows:
+            with self._cond:
+                self._stats['direct_requests'] += 1
+            return self.predict_fn(model, X)
+        return self.submit(model, X).result(timeout=timeout)
+
+    def _take_batch(self):
+        """等待并取出一批请求（在后台线程中调用）"""
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            deadline = self._queue[0].enqueued_at + self.max_wait_ms / 1000.0
+            while self._queued_rows < self.max_batch_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = [self._queue.popleft()]
+            rows = len(batch[0].X)
+            while self._queue and rows + len(self._queue[0].X) <= self.max_batch_rows:
+                pending = self._queue.popleft()
+                batch.append(pending)
+                rows += len(pending.X)
+            self._queued_rows -= rows
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            started = time.perf_counter()
+
+            # 同一批中可能混有不同版本的模型，按模型分组推理
+            groups = {}
+            for pending in batch:
+                groups.setdefault(id(pending.model), []).append(pending)
+
+            for items in groups.values():
+                try:
+                    X = np.concatenate([item.X for item in items]) if len(items) > 1 else items[0].X
+                    outputs = self.predict_fn(items[0].model, X)
+                except Exception as e:
+                    for item in items:
+                        item.future.set_exception(e)
+                    continue
+
+                offset = 0
+                for item in items:
+                    end = offset + len(item.X)
+                    item.future.set_result(tuple(output[offset:end] for output in outputs))
+                    offset = end
+
+            with self._cond:
+                self._stats['batches'] += 1
+                self._stats['batched_requests'] += len(batch)
+                self._stats['batched_rows'] += sum(len(item.X) for item in batch)
+                self._stats['total_wait_seconds'] += sum(started - item.enqueued_at for item in batch)
+
+    def stats(self):
+        """返回队列深度与批处理统计"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._queue)
+            stats['queued_rows'] = self._queued_rows
+            stats['max_batch_rows'] = self.max_batch_rows
+            stats['max_wait_ms'] = self.max_wait_ms
+            batched_requests = stats['batched_requests']
+            stats['avg_batch_rows'] = stats['batched_rows'] / stats['batches'] if stats['batches'] else 0.0
+            stats['avg_wait_ms'] = (stats['total_wait_seconds'] * 1000.0 / batched_requests
+                                    if batched_requests else 0.0)
+            return stats
@@ -0,0 +1,303 @@
+import concurrent.futures
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import matplotlib
+import numpy as np
+import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from evaluation import ensure_evaluation
+from model_registry import ModelRegistry
+from profiling import trace_memory
+from training_parallelism import process_context
+
+# 设置中文字体支持
+matplotlib.rcParams['font.sans-serif'] = ['SimHei']  # 使用黑体
+matplotlib.rcParams['axes.unicode_minus'] = False    # 解决负号显示问题
+
+# 图像端点支持的格式
+PLOT_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'webp': 'image/webp',
+}
+
+# 单个图表渲染的默认超时时间（秒）
+DEFAULT_RENDER_TIMEOUT = 60.0
+
+# SVG 元素ID的哈希盐（默认每次渲染随机生成，导致内容不同）
+SVG_HASH_SALT = 'stress-prediction'
+
+
+def _label(feature_labels, name):
+    return feature_labels.get(name, name)
+
+
+def draw_feature_importance(fig, record, feature_labels):
+    """特征重要性图"""
+    ax = fig.add_subplot()
+    importances = record.model.feature_importances_
+    indices = np.argsort(importances)[::-1]
+
+    # 使用中文特征名称
+    chinese_feature_names = [_label(feature_labels, record.features[i]) for i in indices]
+
+    ax.barh(range(len(indices)), importances[indices])
+    ax.set_yticks(range(len(indices)))
+    ax.set_yticklabels(chinese_feature_names)
+    ax.set_xlabel('特征重要性')
+    ax.set_title('随机森林特征重要性')
+
+
+def draw_confusion_matrix(fig, record, feature_labels):
+    """混淆矩阵"""
+    ax = fig.add_subplot()
+    metrics = ensure_evaluation(record)
+    cm = np.array(metrics['confusion_matrix'])
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=ax,
+                xticklabels=metrics['classes'], yticklabels=metrics['classes'])
+    ax.set_xlabel('预测标签')
+    ax.set_ylabel('真实标签')
+    ax.set_title('混淆矩阵')
+
+
+def draw_feature_distribution(fig, record, feature_labels):
+    """前4个最重要特征在不同压力等级下的分布"""
+    X_test, y_test = record.X_test, record.y_test
+    indices = np.argsort(record.model.feature_importances_)[::-1]
+    top_features = [record.features[i] for i in indices[:4]]
+
+    for i, feature in enumerate(top_features):
+        ax = fig.add_subplot(2, 2, i + 1)
+        for target_value in np.unique(y_test):
+            sns.kdeplot(X_test[X_test.index.isin(y_test[y_test == target_value].index)][feature],
+                        label=f'压力等级 {target_value}', ax=ax)
+        ax.set_title(f'特征: {_label(feature_labels, feature)}')
+        ax.set_xlabel(_label(feature_labels, feature))
+        ax.legend()
+
+    fig.tight_layout()
+
+
+def draw_classification_report(fig, record, feature_labels):
+    """各压力等级的精确率、召回率和F1分数"""
+    ax = fig.add_subplot()
+    report = ensure_evaluation(record)['classification_report']
+    classes = [cls for cls in report if cls not in ('accuracy', 'macro avg', 'weighted avg')]
+
+    metrics = ['precision', 'recall', 'f1-score']
+    metrics_chinese = ['精确率', '召回率', 'F1分数']
+    x = np.arange(len(classes))
+    width = 0.25
+
+    for i, metric in enumerate(metrics):
+        values = [report[cls][metric] for cls in classes]
+        ax.bar(x + i * width, values, width, label=metrics_chinese[i])
+
+    ax.set_xlabel('压力等级')
+    ax.set_ylabel('得分')
+    ax.set_title('各压力等级的分类性能')
+    ax.set_xticks(x + width)
+    ax.set_xticklabels(classes)
+    ax.legend()
+    ax.set_ylim(0, 1)
+
+
+def draw_auc_roc_curve(fig, record, feature_labels):
+    """AUC-ROC曲线图（曲线数据来自评估结果，不再重复推理）"""
+    ax = fig.add_subplot()
+    metrics = ensure_evaluation(record)
+    roc = metrics['roc']
+
+    if len(metrics['classes']) > 2:  # 多分类情况
+        # 绘制每个类别的ROC曲线
+        for cls, curve in roc['per_class'].items():
+            ax.plot(curve['fpr'], curve['tpr'], lw=2,
+                    label=f'ROC 曲线 (类别 {cls}, AUC = {curve["auc"]:.2f})')
+        for name, average in (('micro', '微平均'), ('macro', '宏平均')):
+            curve = roc[name]
+            ax.plot(curve['fpr'], curve['tpr'], lw=1.5, linestyle=':',
+                    label=f'{average} ROC 曲线 (AUC = {curve["auc"]:.2f})')
+
+    else:  # 二分类情况：正类的ROC曲线
+        curve = roc['per_class'][str(metrics['classes'][-1])]
+        ax.plot(curve['fpr'], curve['tpr'], lw=2, label=f'ROC 曲线 (AUC = {curve["auc"]:.2f})')
+
+    # 绘制对角线
+    ax.plot([0, 1], [0, 1], 'k--', lw=2)
+
+    # 设置图表属性
+    ax.set_xlim([0.0, 1.0])
+    ax.set_ylim([0.0, 1.05])
+    ax.set_xlabel('假正率 (False Positive Rate)')
+    ax.set_ylabel('真正率 (True Positive Rate)')
+    ax.set_title('接收者操作特征曲线 (ROC)')
+    ax.legend(loc="lower right")
+
+
+# 各图表的绘制函数与默认尺寸、分辨率
+PLOT_SPECS = {
+    'feature_importance': {'draw': draw_feature_importance, 'figsize': (10, 8), 'dpi': 300},
+    'confusion_matrix': {'draw': draw_confusion_matrix, 'figsize': (8, 6), 'dpi': 300},
+    'feature_distribution': {'draw': draw_feature_distribution, 'figsize': (12, 8), 'dpi': 300},
+    'classification_report': {'draw': draw_classification_report, 'figsize': (10, 6), 'dpi': 300},
+    'auc_roc_curve': {'draw': draw_auc_roc_curve, 'figsize': (10, 8), 'dpi': 100, 'bbox_inches': None},
+}
+
+
+def figure_to_image(fig, fmt='png', dpi=300, bbox_inches='tight'):
+    """
+    将 Figure 转换为指定格式（png/svg/webp）的图像字节。
+
+    同一图表重复渲染得到相同的字节（ETag 不变）：SVG 不写入日期元数据，元素ID使用固定的哈希盐。
+    """
+    FigureCanvasAgg(fig)
+    buf = BytesIO()
+    if fmt == 'svg':
+        with matplotlib.rc_context({'svg.hashsalt': SVG_HASH_SALT}):
+            fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches=bbox_inches, metadata={'Date': None})
+    else:
+        fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches=bbox_inches)
+    return buf.getvalue()
+
+
+def render_record_plot(record, name, dpi, figsize, fmt='png', feature_labels=None):
+    """
+    使用面向对象的 Figure API 渲染单个图表，不依赖 pyplot 全局状态，可在任意线程或进程中调用。
+
+    :param record: 模型仓库中的模型记录
+    :param name: 图表名称，见 PLOT_SPECS
+    :param dpi: 分辨率
+    :param figsize: 图表尺寸（英寸）
+    :param fmt: 图像格式，见 PLOT_FORMATS
+    :param feature_labels: 特征名称到显示名称的映射
+    :return: 图像字节
+    """
+    spec = PLOT_SPECS[name]
+    fig = Figure(figsize=figsize)
+    spec['draw'](fig, record, feature_labels or {})
+    return figure_to_image(fig, fmt=fmt, dpi=dpi, bbox_inches=spec.get('bbox_inches', 'tight'))
+
+
+def render_error_image(message, fmt='png', dpi=100):
+    """生成包含错误信息的图"""
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    ax.text(0.5, 0.5, message, horizontalalignment='center', verticalalignment='center', fontsize=12)
+    ax.axis('off')
+    return figure_to_image(fig, fmt=fmt, dpi=dpi)
+
+
+# 工作进程内的状态：模型仓库与已加载的模型版本
+_worker_registry = None
+_worker_feature_labels = None
+
+
+def _init_worker(registry_dir, feature_labels):
+    global _worker_registry, _worker_feature_labels
+    _worker_registry = ModelRegistry(registry_dir)
+    _worker_feature_labels = feature_labels
+
+
+def _render_in_worker(version, name, dpi, figsize, fmt, profile_memory=False):
+    """在工作进程中渲染，返回 (图像字节, 内存报告列表或 None)"""
+    reports = [] if profile_memory else None
+    with trace_memory(f'render_plot:{name}', reports):
+        record = _worker_registry.get(version)
+        if record is None:
+            raise KeyError(f'模型版本不存在: {version}')
+        image = render_record_plot(record, name, dpi, figsize, fmt, _worker_feature_labels)
+    return image, reports
+
+
+class PlotRenderer:
+    """
+    图表渲染引擎。
+
+    每个图表在进程池中独立渲染，工作进程按版本号从模型仓库加载模型并缓存，
+    避免每次任务都传输整个模型。单个图表超时或出错只影响该图表。
+    max_workers 为 0 时在调用线程内直接渲染。
+    """
+
+    def __init__(self, registry_dir, max_workers=None, timeout=DEFAULT_RENDER_TIMEOUT, feature_labels=None):
+        """
+        :param registry_dir: 模型仓库目录
+        :param max_workers: 渲染进程数量，None 表示CPU核数，0 表示不使用进程池
+        :param timeout: 单个图表渲染超时时间（秒）
+        :param feature_labels: 特征名称到显示名称的映射
+        """
+        self.registry_dir = registry_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.feature_labels = dict(feature_labels or {})
+        self._lock = threading.Lock()
+        self._executor = None
+        self.recycles = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=process_context(), initializer=_init_worker,
+                    initargs=(self.registry_dir, self.feature_labels))
+            return self._executor
+
+    def _recycle(self, executor):
+        """
+        终止进程池并在下次渲染时创建新的。
+
+        已开始执行的任务无法取消，超时的渲染会一直占用工作进程，反复超时后整个进程池都被占满；
+        因此超时时直接终止该进程池的全部工作进程。同时在其中渲染的其他图表会收到
+        BrokenProcessPool，由 render 在新的进程池中重试。
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return  # 已被其他线程回收
+            self._executor = None
+            self.recycles += 1
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def render(self, record, name, dpi, figsize, fmt='png', memory_reports=None):
+        """
+        渲染单个图表，超时抛出 TimeoutError（并回收进程池）。
+
+        :param memory_reports: 列表，给出时在渲染进程中用 tracemalloc 记录内存分配，报告追加到其中
+        :return: 图像字节
+        """
+        if self.max_workers == 0:
+            with trace_memory(f'render_plot:{name}', memory_reports):
+                return render_record_plot(record, name, dpi, figsize, fmt, self.feature_labels)
+
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                future = executor.submit(_render_in_worker, record.version, name, dpi, tuple(figsize), fmt,
+                                         memory_reports is not None)
+                image, reports = future.result(timeout=self.timeout)
+                if reports:
+                    memory_reports.extend(reports)
+                return image
+            except concurrent.futures.TimeoutError:
+                self._recycle(executor)
+                raise TimeoutError(f'渲染图表 {name} 超时（{self.timeout}秒）')
+            except (BrokenProcessPool, concurrent.futures.CancelledError):
+                # 进程池因其他图表超时被回收或工作进程异常退出，在新的进程池中重试一次
+                if attempt:
+                    raise
+                self._recycle(executor)
+            except RuntimeError:
+                # 提交时进程池已被回收；渲染本身抛出的 RuntimeError 直接向上抛出
+                if attempt or not executor._shutdown_thread:
+                    raise
+
+    def shutdown(self, wait=True):
+        """关闭进程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,278 @@
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+
+import joblib
+import numpy as np
+
+# 模型仓库默认存放目录，可通过环境变量覆盖
+DEFAULT_REGISTRY_DIR = os.environ.get(
+    'MODEL_REGISTRY_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_store')
+)
+
+MODEL_FILE = 'model.joblib'
+META_FILE = 'meta.json'
+METRICS_FILE = 'metrics.json'
+PROBA_FILE = 'proba.npy'
+ROWS_FILE = 'rows.npy'
+CURRENT_FILE = 'CURRENT'
+
+
+@dataclass
+class ModelRecord:
+    """已注册的模型版本（模型本体、特征列表、准确率、留出测试集及其评估结果）"""
+    version: str
+    model: object
+    features: list
+    accuracy: float
+    X_test: object
+    y_test: object
+    created_at: float = field(default_factory=time.time)
+    params: dict = field(default_factory=dict)
+    metrics: dict = None
+    y_proba: object = None
+    lineage: dict = None
+    inference_engine: str = 'sklearn'
+    engine_report: dict = None
+    # 编译后的推理引擎只保存在内存中，按需生成
+    compiled_forest: object = field(default=None, repr=False, compare=False)
+
+    @property
+    def model_id(self):
+        """
+        模型的唯一标识：版本号在模型仓库清空或清理后会被重新分配，加上注册时间（毫秒）区分不同的模型。
+        按模型缓存的内容（如渲染后的图表）应使用该标识而不是版本号。
+        """
+        return f'{self.version}-{int(self.created_at * 1000):x}'
+
+    def meta(self):
+        """返回可JSON序列化的元数据"""
+        return {
+            'version': self.version,
+            'features': list(self.features),
+            'accuracy': float(self.accuracy),
+            'created_at': self.created_at,
+            'params': self.params,
+            'n_test': int(len(self.X_test)) if self.X_test is not None else 0,
+            'lineage': self.lineage,
+            'inference_engine': self.inference_engine,
+            'engine_report': self.engine_report,
+        }
+
+
+def _version_number(version):
+    try:
+        return int(version.lstrip('v'))
+    except ValueError:
+        return -1
+
+
+class ModelRegistry:
+    """
+    基于磁盘的模型仓库。
+
+    每个版本保存在 ``<root>/<version>/`` 目录下，包括 joblib 序列化的模型与留出测试集、
+    以及 ``meta.json`` 元数据；``<root>/CURRENT`` 记录当前生效的版本号。
+    已加载的版本会缓存在内存中，只读接口直接从内存读取，无需重新训练。
+    """
+
+    def __init__(self, root_dir=DEFAULT_REGISTRY_DIR):
+        self.root_dir = root_dir
+        self._lock = threading.RLock()
+        self._records = {}
+        self._current_version = None
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def _version_dir(self, version):
+        return os.path.join(self.root_dir, version)
+
+    def _allocate_version(self):
+        """分配新的版本目录；使用 mkdir 保证多进程下版本号不冲突"""
+        while True:
+            next_number = max([_version_number(v) for v in self.list_versions()] + [0]) + 1
+            version = f'v{next_number}'
+            try:
+                os.mkdir(self._version_dir(version))
+                return version
+            except FileExistsError:
+                continue
+
+    def _write_meta(self, record):
+        tmp_path = os.path.join(self._version_dir(record.version), f'{META_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record.meta(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, os.path.join(self._version_dir(record.version), META_FILE))
+
+    def _write_current(self, version):
+        tmp_path = os.path.join(self.root_dir, f'{CURRENT_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root_dir, CURRENT_FILE))
+
+    def list_versions(self):
+        """按版本号升序列出磁盘上所有完整的版本"""
+        if not os.path.isdir(self.root_dir):
+            return []
+        versions = [
+            name for name in os.listdir(self.root_dir)
+            if os.path.isfile(os.path.join(self.root_dir, name, META_FILE))
+        ]
+        return sorted(versions, key=_version_number)
+
+    def _write_evaluation(self, version_dir, metrics, y_proba):
+        if y_proba is not None:
+            np.save(os.path.join(version_dir, PROBA_FILE), y_proba)
+        if metrics is not None:
+            tmp_path = os.path.join(version_dir, f'{METRICS_FILE}.{os.getpid()}.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(metrics, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(version_dir, METRICS_FILE))
+
+    def register(self, model, features, accuracy, X_test, y_test, params=None, promote=True,
+                 metrics=None, y_proba=None, row_hashes=None, lineage=None):
+        """
+        保存一个新训练的模型并分配版本号。
+
+        :param model: 训练好的模型
+        :param features: 模型使用的特征列表（按训练时的列顺序）
+        :param accuracy: 留出测试集上的准确率
+        :param X_test: 留出测试集特征
+        :param y_test: 留出测试集标签
+        :param params: 训练参数
+        :param promote: 是否将该版本设为当前版本
+        :param metrics: 结构化评估指标，见 evaluation.evaluate_predictions
+        :param y_proba: 留出测试集上的概率矩阵
+        :param row_hashes: 训练该版本时数据集全部行的内容哈希，用于增量训练识别新增行
+        :param lineage: 训练方式信息（全量/增量、基础版本、新增行数等）
+        :return: ModelRecord
+        """
+        with self._lock:
+            version = self._allocate_version()
+            record = ModelRecord(version=version, model=model, features=list(features),
+                                 accuracy=float(accuracy), X_test=X_test, y_test=y_test,
+                                 params=dict(params or {}), metrics=metrics, y_proba=y_proba,
+                                 lineage=lineage)
+            version_dir = self._version_dir(version)
+            try:
+                joblib.dump({'model': model, 'X_test': X_test, 'y_test': y_test},
+                            os.path.join(version_dir, MODEL_FILE))
+                self._write_evaluation(version_dir, metrics, y_proba)
+                if row_hashes is not None:
+                    np.save(os.path.join(version_dir, ROWS_FILE), row_hashes)
+                # meta.json 最后写入，作为该版本完整可用的标志
+                self._write_meta(record)
+            except Exception:
+                shutil.rmtree(version_dir, ignore_errors=True)
+                raise
+
+            self._records[version] = record
+            if promote:
+                self._write_current(version)
+                self._current_version = version
+            print(f"模型已注册为版本 {version}，准确率: {record.accuracy}")
+            return record
+
+    def get(self, version):
+        """获取指定版本，必要时从磁盘加载；版本不存在时返回 None"""
+        with self._lock:
+            record = self._records.get(version)
+            if record is not None:
+                return record
+
+            version_dir = self._version_dir(version)
+            meta_path = os.path.join(version_dir, META_FILE)
+            if not os.path.isfile(meta_path):
+                return None
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            payload = joblib.load(os.path.join(version_dir, MODEL_FILE))
+            metrics = y_proba = None
+            metrics_path = os.path.join(version_dir, METRICS_FILE)
+            if os.path.isfile(metrics_path):
+                with open(metrics_path, 'r', encoding='utf-8') as f:
+                    metrics = json.load(f)
+            proba_path = os.path.join(version_dir, PROBA_FILE)
+            if os.path.isfile(proba_path):
+                y_proba = np.load(proba_path)
+            record = ModelRecord(version=version, model=payload['model'], features=meta['features'],
+                                 accuracy=meta['accuracy'], X_test=payload['X_test'],
+                                 y_test=payload['y_test'], created_at=meta.get('created_at', 0.0),
+                                 params=meta.get('params', {}), metrics=metrics, y_proba=y_proba,
+                                 inference_engine=meta.get('inference_engine', 'sklearn'),
+                                 engine_report=meta.get('engine_report'), lineage=meta.get('lineage'))
+            self._records[version] = record
+            return record
+
+    def row_hashes(self, version):
+        """读取版本训练时的行哈希；旧版本没有保存时返回 None"""
+        path = os.path.join(self._version_dir(version), ROWS_FILE)
+        return np.load(path) if os.path.isfile(path) else None
+
+    def save_evaluation(self, version, metrics, y_proba=None):
+        """为已存在的版本补充保存评估结果（指标与概率矩阵）"""
+        with self._lock:
+            version_dir = self._version_dir(version)
+            if not os.path.isfile(os.path.join(version_dir, META_FILE)):
+                raise KeyError(version)
+            self._write_evaluation(version_dir, metrics, y_proba)
+            record = self._records.get(version)
+            if record is not None:
+                record.metrics, record.y_proba = metrics, y_proba
+
+    def set_inference_engine(self, version, engine, report=None):
+        """
+        设置指定版本在线预测使用的推理引擎，并持久化到 meta.json。
+
+        :param engine: 推理引擎名称，见 forest_engine.ENGINES
+        :param report: 编译校验与吞吐量对比报告
+        """
+        with self._lock:
+            record = self.get(version)
+            if record is None:
+                raise KeyError(version)
+            record.inference_engine = engine
+            if report is not None:
+                record.engine_report = report
+            self._write_meta(record)
+            return record
+
+    def current_version(self):
+        """读取当前版本号（其他进程可能已提升了新版本）"""
+        current_path = os.path.join(self.root_dir, CURRENT_FILE)
+        try:
+            with open(current_path, 'r', encoding='utf-8') as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def loaded_version(self):
+        """本进程最近一次加载的当前版本号（可能落后于 current_version，直到下次调用 current）"""
+        with self._lock:
+            return self._current_version
+
+    def current(self):
+        """获取当前版本的模型记录，尚未训练过任何模型时返回 None"""
+        version = self.current_version()
+        if version is None:
+            return None
+        with self._lock:
+            if version != self._current_version:
+                print(f"加载当前模型版本: {version}")
+                self._current_version = version
+        return self.get(version)
+
+    def load_current(self):
+        """启动时预加载当前版本，避免首个请求承担反序列化开销"""
+        try:
+            record = self.current()
+        except Exception as e:
+            print(f"加载已注册模型时出错: {e}")
+            return None
+        if record is None:
+            print("模型仓库为空，请先训练模型")
+        return record
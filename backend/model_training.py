@@ -0,0 +1,278 @@
+import copy
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+from evaluation import evaluate_model
+
+# 随机森林默认超参数
+DEFAULT_MODEL_PARAMS = {
+    'n_estimators': 300,
+    'random_state': 42,
+    'max_depth': 5,
+}
+
+# 留出测试集比例与划分随机种子
+TEST_SIZE = 0.2
+SPLIT_RANDOM_STATE = 42
+
+# 报告进度时每批训练的决策树数量
+PROGRESS_CHUNK_SIZE = 25
+
+# 增量训练配置
+INCREMENTAL_MIN_TREES = 10             # 每次增量训练至少新增的决策树数量
+INCREMENTAL_MIN_ROWS = 1000            # 新增决策树的最少训练行数，新增行不足时从历史训练数据中抽样补足
+INCREMENTAL_MAX_ACCURACY_GAP = 0.02    # 与全量重训基线相比允许的最大准确率差距，超出时改用全量重训模型
+
+
+def split_dataset(df, target_column='stress_level'):
+    """
+    划分训练集和测试集。
+
+    :param df: 完整数据集
+    :param target_column: 目标列名称
+    :return: 特征列表以及 (X_train, X_test, y_train, y_test)；没有可用特征列时特征列表为空
+    """
+    features = [col for col in df.columns if col != target_column]
+    if not features:
+        return features, (None, None, None, None)
+
+    X = df[features]
+    y = df[target_column]
+    return features, train_test_split(X, y, test_size=TEST_SIZE, random_state=SPLIT_RANDOM_STATE)
+
+
+def fit_forest(X_train, y_train, params=None, progress=None):
+    """
+    训练随机森林模型。
+
+    提供 progress 回调时，借助 warm_start 按批次增加决策树并回报已训练的树数量；
+    由于 sklearn 在 warm_start 下会推进随机数状态，结果与一次性训练完全一致。
+
+    :param X_train: 训练集特征
+    :param y_train: 训练集标签
+    :param params: 模型超参数，缺省项使用 DEFAULT_MODEL_PARAMS
+    :param progress: 回调函数 progress(trees_fitted, n_estimators)
+    :return: 训练好的模型
+    """
+    params = {**DEFAULT_MODEL_PARAMS, **(params or {})}
+    n_estimators = params['n_estimators']
+
+    if progress is None:
+        model = RandomForestClassifier(**params)
+        model.fit(X_train, y_train)
+        return model
+
+    model = RandomForestClassifier(**{**params, 'n_estimators': 0, 'warm_start': True})
+    progress(0, n_estimators)
+    trees_fitted = 0
+    while trees_fitted < n_estimators:
+        trees_fitted = min(trees_fitted + PROGRESS_CHUNK_SIZE, n_estimators)
+        model.set_params(n_estimators=trees_fitted)
+        model.fit(X_train, y_train)
+        progress(trees_fitted, n_estimators)
+    model.set_params(warm_start=params.get('warm_start', False))
+    return model
+
+
+def train_and_evaluate(df, target_column='stress_level', params=None, progress=None):
+    """
+    划分数据、训练模型并在留出测试集上评估。
+
+    评估只对测试集做一次 predict_proba 推理，准确率、混淆矩阵、分类报告与ROC曲线
+    都由同一个概率矩阵计算得到。
+
+    :param df: 完整数据集
+    :param target_column: 目标列名称
+    :param params: 模型超参数
+    :param progress: 训练进度回调，见 fit_forest
+    :return: 模型、特征列表、准确率、X_test、y_test、评估结果 (Evaluation)；
+             没有可用特征列时全部为 None
+    """
+    features, (X_train, X_test, y_train, y_test) = split_dataset(df, target_column)
+    if not features:
+        print("没有可用的特征列")
+        return None, None, None, None, None, None
+
+    model = fit_forest(X_train, y_train, params=params, progress=progress)
+
+    # 模型评估
+    evaluation = evaluate_model(model, X_test, y_test)
+    accuracy = evaluation.accuracy
+    print(f"模型准确率: {accuracy}")
+
+    return model, features, accuracy, X_test, y_test, evaluation
+
+
+def row_hashes(df, columns):
+    """
+    逐行计算内容哈希，用于识别自上次训练以来新增的行（与行顺序、数值类型宽度无关）。
+
+    :param df: 数据
+    :param columns: 参与哈希的列（按固定顺序）
+    :return: uint64 数组
+    """
+    return pd.util.hash_pandas_object(df[list(columns)].astype('float64'), index=False).to_numpy()
+
+
+def _replay_sample(X_pool, y_pool, n_rows, classes, random_state):
+    """从历史训练数据中抽样补足新增决策树的训练数据，并保证 classes 中的每个类别至少出现一次"""
+    rng = np.random.RandomState(random_state)
+    n_rows = min(n_rows, len(X_pool))
+    positions = rng.choice(len(X_pool), n_rows, replace=False) if n_rows else np.array([], dtype=int)
+    sampled = set(y_pool.iloc[positions])
+    for cls in classes:
+        if cls not in sampled:
+            matches = np.flatnonzero(y_pool.to_numpy() == cls)
+            if len(matches):
+                positions = np.append(positions, matches[0])
+    return X_pool.iloc[positions], y_pool.iloc[positions]
+
+
+def incremental_fit(base_model, X_new, y_new, X_history, y_history, total_rows, params=None, progress=None,
+                    run=1):
+    """
+    在已有森林上用 warm_start 追加在近期数据上训练的决策树，并淘汰最旧的决策树。
+
+    新增决策树的数量与新增行占比成正比（至少 INCREMENTAL_MIN_TREES 棵），训练数据为全部新增行，
+    不足 INCREMENTAL_MIN_ROWS 行时从历史训练数据中抽样补足；森林保持 n_estimators 棵树的滑动窗口，
+    因此训练耗时与变化量相关，而与数据集大小无关。
+
+    warm_start 按已有决策树的数量从 random_state 的随机序列中跳过相应的种子，而滑动窗口使每次增量训练
+    开始时的树数量相同；因此每次增量训练以 random_state + run 作为随机种子，避免重复使用相同的树种子与自助抽样。
+
+    :param base_model: 当前版本的模型（不会被修改）
+    :param X_new: 新增行的训练特征
+    :param y_new: 新增行的训练标签
+    :param X_history: 历史训练数据特征，用于抽样补足
+    :param y_history: 历史训练数据标签
+    :param total_rows: 当前数据集的总行数
+    :param params: 模型超参数，n_estimators 为滑动窗口大小
+    :param progress: 回调函数 progress(trees_fitted, trees_to_add)
+    :param run: 自上次全量训练以来的第几次增量训练
+    :return: (新模型, 增量训练信息字典)
+    :raises ValueError: 增量数据中的类别与原模型不一致，需要全量重训
+    """
+    params = {**DEFAULT_MODEL_PARAMS, **(params or {})}
+    window = params['n_estimators']
+    trees_to_add = min(window, max(INCREMENTAL_MIN_TREES, math.ceil(window * len(X_new) / max(total_rows, 1))))
+    random_state = params.get('random_state')
+    if random_state is not None:
+        random_state += run
+
+    replay_rows = max(0, INCREMENTAL_MIN_ROWS - len(X_new))
+    missing_classes = [cls for cls in base_model.classes_ if cls not in set(y_new)]
+    X_replay, y_replay = _replay_sample(X_history, y_history, replay_rows, missing_classes, random_state)
+    X_window = pd.concat([X_new, X_replay])
+    y_window = pd.concat([y_new, y_replay])
+    if not set(np.unique(y_window)) == set(base_model.classes_):
+        raise ValueError('增量数据的类别与当前模型不一致，需要全量重训')
+
+    model = copy.deepcopy(base_model)
+    existing = len(model.estimators_)
+    model.set_params(warm_start=True, random_state=random_state)
+    if progress is not None:
+        progress(0, trees_to_add)
+    trees_fitted = 0
+    while trees_fitted < trees_to_add:
+        trees_fitted = min(trees_fitted + PROGRESS_CHUNK_SIZE, trees_to_add)
+        model.set_params(n_estimators=existing + trees_fitted)
+        model.fit(X_window, y_window)
+        if progress is not None:
+            progress(trees_fitted, trees_to_add)
+
+    # 滑动窗口：淘汰最旧的决策树
+    trees_dropped = max(0, len(model.estimators_) - window)
+    if trees_dropped:
+        model.estimators_ = model.estimators_[trees_dropped:]
+    model.set_params(n_estimators=len(model.estimators_), warm_start=False)
+
+    return model, {
+        'new_train_rows': int(len(X_new)),
+        'replay_rows': int(len(X_replay)),
+        'trees_added': int(trees_to_add),
+        'trees_dropped': int(trees_dropped),
+        'incremental_run': int(run),
+        'random_state': random_state,
+    }
+
+
+def train_incremental(df, base_record, seen_hashes, target_column='stress_level', params=None,
+                      progress=None, baseline=False):
+    """
+    基于当前版本做增量训练。
+
+    通过行哈希找出当前版本训练以来新增的行，按与全量训练相同的比例划分出新增行的测试部分，
+    测试集为原测试集加上新增行的测试部分；训练数据只包含新增行（以及少量历史抽样）。
+
+    :param df: 当前完整数据集
+    :param base_record: 当前版本的模型记录
+    :param seen_hashes: 当前版本训练时见过的全部行哈希
+    :param target_column: 目标列名称
+    :param params: 模型超参数
+    :param progress: 训练进度回调
+    :param baseline: 是否同时在相同划分上全量重训作为准确率基线（耗时与全量训练相同）
+    :return: 模型、特征列表、准确率、X_test、y_test、评估结果、新的行哈希集合、训练信息字典；
+             没有新增行时模型为 None
+    :raises ValueError: 数据的列与当前版本不一致或类别发生变化，需要全量重训
+    """
+    features = list(base_record.features)
+    if set(df.columns) != set(features) | {target_column}:
+        raise ValueError('数据集的列与当前模型不一致，需要全量重训')
+
+    hashes = row_hashes(df, features + [target_column])
+    is_new = ~np.isin(hashes, seen_hashes)
+    new_rows = df[is_new]
+    info = {'base_version': base_record.version, 'new_rows': int(is_new.sum())}
+    if new_rows.empty:
+        return None, features, None, None, None, None, seen_hashes, info
+
+    if len(new_rows) >= 5:
+        X_new, X_new_test, y_new, y_new_test = train_test_split(
+            new_rows[features], new_rows[target_column], test_size=TEST_SIZE, random_state=SPLIT_RANDOM_STATE)
+    else:
+        X_new, y_new = new_rows[features], new_rows[target_column]
+        X_new_test, y_new_test = X_new.iloc[:0], y_new.iloc[:0]
+
+    # 历史训练数据：旧行中不属于原测试集的部分
+    test_hashes = row_hashes(base_record.X_test.assign(**{target_column: base_record.y_test}),
+                             features + [target_column])
+    history = df[~is_new & ~np.isin(hashes, test_hashes)]
+    # 重新编号索引，保证 X_test 与 y_test 按位置对齐
+    X_test = pd.concat([base_record.X_test, X_new_test], ignore_index=True)
+    y_test = pd.concat([base_record.y_test, y_new_test], ignore_index=True)
+
+    # 连续增量训练的次数，全量训练的版本没有该字段，从 1 开始计数
+    run = (base_record.lineage or {}).get('incremental_run', 0) + 1
+    started = time.perf_counter()
+    model, fit_info = incremental_fit(base_record.model, X_new, y_new, history[features], history[target_column],
+                                      len(df), params=params, progress=progress, run=run)
+    info.update(fit_info)
+    info['fit_seconds'] = time.perf_counter() - started
+
+    evaluation = evaluate_model(model, X_test, y_test)
+    accuracy = evaluation.accuracy
+    info['base_accuracy'] = evaluate_model(base_record.model, X_test, y_test).accuracy
+    print(f"增量训练：新增 {info['new_rows']} 行，追加 {info['trees_added']} 棵决策树，"
+          f"淘汰 {info['trees_dropped']} 棵，模型准确率: {accuracy}")
+
+    if baseline:
+        started = time.perf_counter()
+        full_model = fit_forest(pd.concat([history[features], X_new]),
+                                pd.concat([history[target_column], y_new]), params=params)
+        info['baseline_fit_seconds'] = time.perf_counter() - started
+        full_evaluation = evaluate_model(full_model, X_test, y_test)
+        info['baseline_accuracy'] = full_evaluation.accuracy
+        info['accuracy_gap'] = full_evaluation.accuracy - accuracy
+        print(f"全量重训基线准确率: {full_evaluation.accuracy}")
+        if info['accuracy_gap'] > INCREMENTAL_MAX_ACCURACY_GAP:
+            # 增量模型明显落后于全量重训，改用全量重训的模型
+            print("增量模型准确率低于全量重训基线过多，改用全量重训模型")
+            info['fallback'] = 'accuracy_gap'
+            model, evaluation, accuracy = full_model, full_evaluation, full_evaluation.accuracy
+
+    return model, features, accuracy, X_test, y_test, evaluation, np.union1d(seen_hashes, hashes), info
@@ -0,0 +1,354 @@
+"""
+随机森林超参数搜索与交叉验证。
+
+在训练集（不含留出测试集）上做分层 k 折交叉验证，支持网格搜索与逐次减半搜索（successive halving），
+各折的训练在进程池中并行执行。数据集只在共享内存中保存一份，所有工作进程直接映射使用；
+每个 (数据, 参数, 折) 的得分会缓存到磁盘，重复搜索时直接复用。
+
+命令行:
+    python model_tuning.py --csv path/to.csv --method halving --cv 5 --budget 600 --register
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import math
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
+
+from model_training import DEFAULT_MODEL_PARAMS, row_hashes, split_dataset
+from training_parallelism import process_context
+
+# 默认搜索空间
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [100, 300],
+    'max_depth': [5, 8, None],
+    'min_samples_leaf': [1, 5],
+    'max_features': ['sqrt', 0.5],
+}
+
+SEARCH_METHODS = ('grid', 'halving')
+DEFAULT_CV_FOLDS = 5
+CV_RANDOM_STATE = 42
+HALVING_FACTOR = 3          # 逐次减半：每轮保留 1/factor 的候选，数据量扩大 factor 倍
+HALVING_MIN_ROWS = 200      # 逐次减半第一轮的最少行数
+FOLD_CACHE_FILE = 'tuning_cache.json'
+
+
+def expand_grid(param_grid):
+    """将参数网格展开为参数组合列表"""
+    names = sorted(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+
+def dataset_fingerprint(df, columns):
+    """数据集内容指纹（与行顺序无关），作为折缓存键的一部分"""
+    return hashlib.sha1(np.sort(row_hashes(df, columns)).tobytes()).hexdigest()
+
+
+class FoldCache:
+    """
+    交叉验证单折得分缓存，保存在 JSON 文件中。
+
+    键由数据指纹、参数、折数、折序号与训练行数组成，数据或参数变化时自动失效。
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._scores = {}
+        self.hits = 0
+        if path and os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._scores = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取调参缓存时出错: {e}")
+
+    @staticmethod
+    def key(fingerprint, params, n_splits, fold, n_rows):
+        return json.dumps([fingerprint, params, n_splits, fold, n_rows], sort_keys=True, default=str)
+
+    def get(self, key):
+        with self._lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self.hits += 1
+            return score
+
+    def put(self, key, score):
+        with self._lock:
+            self._scores[key] = score
+
+    def save(self):
+        """写回磁盘（先写临时文件再原子替换）"""
+        if not self.path:
+            return
+        with self._lock:
+            scores = dict(self._scores)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(scores, f)
+        os.replace(tmp_path, self.path)
+
+
+# 工作进程内映射的共享数据
+_shared = {}
+
+
+def _attach(blocks):
+    """工作进程初始化：映射共享内存中的特征矩阵与标签"""
+    for name, (shm_name, shape, dtype) in blocks.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _shared[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+
+def _fit_fold(params, train_idx, valid_idx):
+    """在共享数据上训练并评估一折，返回准确率"""
+    X, y = _shared['X'][1], _shared['y'][1]
+    model = RandomForestClassifier(**{**params, 'n_jobs': 1})
+    model.fit(X[train_idx], y[train_idx])
+    return float((model.predict(X[valid_idx]) == y[valid_idx]).mean())
+
+
+def _share(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+class _Search:
+    """一次搜索的执行状态：进程池、折缓存、时间预算与进度"""
+
+    def __init__(self, X, y, fingerprint, n_splits, n_jobs, cache, time_budget, progress):
+        self.X, self.y = X, y
+        self.fingerprint = fingerprint
+        self.n_splits = n_splits
+        self.cache = cache
+        self.deadline = time.time() + time_budget if time_budget else None
+        self.progress = progress
+        self.fits_done = 0
+        self.fits_total = 0
+        self.timed_out = False
+
+        self._shm = []
+        blocks = {}
+        for name, array in (('X', X), ('y', y)):
+            shm, spec = _share(array)
+            self._shm.append(shm)
+            blocks[name] = spec
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_jobs, mp_context=process_context(), initializer=_attach, initargs=(blocks,))
+
+    def close(self, wait=True):
+        # 提前停止时不等待仍在运行的拟合，工作进程各自持有共享内存映射，解除链接不影响它们
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+
+    def folds(self, rows):
+        """对前 rows 行（已打乱）做分层 k 折划分"""
+        skf = StratifiedKFold(n_splits=self.n_splits, shuffle=True, random_state=CV_RANDOM_STATE)
+        return list(skf.split(np.zeros(rows), self.y[:rows]))
+
+    def evaluate(self, candidates, rows, on_result=None):
+        """
+        并行评估一组候选参数在前 rows 行上的交叉验证得分。
+
+        :param on_result: 每个候选全部折完成时的回调 on_result(params, score)，返回 True 表示提前停止
+        :return: [(params, 平均得分或 None)]，None 表示因时间预算或提前停止未完成
+        """
+        folds = self.folds(rows)
+        scores = {i: [None] * len(folds) for i in range(len(candidates))}
+        pending = {}
+        self.fits_total += len(candidates) * len(folds)
+
+        for i, params in enumerate(candidates):
+            for fold, (train_idx, valid_idx) in enumerate(folds):
+                key = FoldCache.key(self.fingerprint, params, self.n_splits, fold, rows)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    scores[i][fold] = cached
+                    self.fits_done += 1
+                else:
+                    future = self.executor.submit(_fit_fold, params, train_idx, valid_idx)
+                    pending[future] = (i, fold, key)
+
+        def finished(i):
+            return all(score is not None for score in scores[i])
+
+        stopped = False
+        for i, params in enumerate(candidates):
+            if finished(i) and on_result is not None and on_result(params, float(np.mean(scores[i]))):
+                stopped = True
+        self._report()
+
+        while pending and not stopped:
+            timeout = None if self.deadline is None else max(0.0, self.deadline - time.time())
+            done, _ = concurrent.futures.wait(pending, timeout=timeout,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                print("调参时间预算已用完，停止搜索")
+                self.timed_out = True
+                break
+            for future in done:
+                i, fold, key = pending.pop(future)
+                score = future.result()
+                self.cache.put(key, score)
+                scores[i][fold] = score
+                self.fits_done += 1
+                if finished(i) and on_result is not None and on_result(candidates[i], float(np.mean(scores[i]))):
+                    stopped = True
+            self._report()
+
+        for future in pending:
+            future.cancel()
+        return [(params, float(np.mean(scores[i])) if finished(i) else None)
+                for i, params in enumerate(candidates)]
+
+    def _report(self):
+        if self.progress is not None:
+            self.progress(self.fits_done, self.fits_total)
+
+
+def tune(df, target_column='stress_level', param_grid=None, method='grid', cv=DEFAULT_CV_FOLDS,
+         n_jobs=None, time_budget=None, patience=None, target_score=None, cache_path=None, progress=None):
+    """
+    在训练集上搜索随机森林超参数。
+
+    :param df: 完整数据集（留出测试集不参与搜索）
+    :param target_column: 目标列名称
+    :param param_grid: {参数名: 候选值列表}，缺省使用 DEFAULT_PARAM_GRID；未列出的参数取 DEFAULT_MODEL_PARAMS
+    :param method: 'grid' 网格搜索或 'halving' 逐次减半
+    :param cv: 交叉验证折数
+    :param n_jobs: 并行进程数，None 表示CPU核数
+    :param time_budget: 时间预算（秒），用完后以已完成的候选为准
+    :param patience: 网格搜索中连续多少个候选没有提升最佳得分时提前停止
+    :param target_score: 交叉验证得分达到该值时提前停止
+    :param cache_path: 折得分缓存文件路径，None 表示只在本次搜索内缓存
+    :param progress: 回调函数 progress(fits_done, fits_total)
+    :return: 搜索结果字典，包括最佳参数、最佳得分与全部候选排名
+    """
+    if method not in SEARCH_METHODS:
+        raise ValueError(f'method 必须是以下之一: {", ".join(SEARCH_METHODS)}')
+
+    features, (X_train, _, y_train, _) = split_dataset(df, target_column)
+    if not features:
+        raise ValueError('没有可用的特征列')
+
+    # 打乱一次，逐次减半的各轮都取前 n 行，保证小数据量的轮次是大数据量轮次的子集
+    order = np.random.RandomState(CV_RANDOM_STATE).permutation(len(X_train))
+    X = X_train.to_numpy(dtype=np.float32)[order]
+    y = y_train.to_numpy()[order]
+
+    candidates = [{**DEFAULT_MODEL_PARAMS, **params} for params in expand_grid(param_grid or DEFAULT_PARAM_GRID)]
+    cache = FoldCache(cache_path)
+    fingerprint = dataset_fingerprint(df, features + [target_column])
+
+    started = time.time()
+    search = _Search(X, y, fingerprint, cv, n_jobs, cache, time_budget, progress)
+    best = {'params': None, 'score': -1.0, 'stale': 0}
+    stop_reason = None
+
+    def on_full_result(params, score):
+        nonlocal stop_reason
+        if score > best['score']:
+            best.update(params=params, score=score, stale=0)
+        else:
+            best['stale'] += 1
+        if target_score is not None and score >= target_score:
+            stop_reason = 'target_score'
+            return True
+        if patience is not None and method == 'grid' and best['stale'] >= patience:
+            stop_reason = 'patience'
+            return True
+        return False
+
+    rounds = []
+    try:
+        if method == 'grid':
+            results = search.evaluate(candidates, len(X), on_full_result)
+            rounds.append({'rows': len(X), 'candidates': len(candidates)})
+        else:
+            n_rounds = max(1, math.ceil(math.log(len(candidates), HALVING_FACTOR)) + 1)
+            rows = max(HALVING_MIN_ROWS, len(X) // HALVING_FACTOR ** (n_rounds - 1))
+            survivors = candidates
+            while True:
+                rows = min(rows, len(X))
+                final = rows == len(X) or len(survivors) == 1
+                results = search.evaluate(survivors, rows, on_full_result if rows == len(X) else None)
+                rounds.append({'rows': rows, 'candidates': len(survivors)})
+                scored = sorted([r for r in results if r[1] is not None], key=lambda r: r[1], reverse=True)
+                if final or search.timed_out or stop_reason or not scored:
+                    break
+                survivors = [params for params, _ in scored[:max(1, math.ceil(len(survivors) / HALVING_FACTOR))]]
+                rows *= HALVING_FACTOR
+    finally:
+        search.close(wait=stop_reason is None and not search.timed_out)
+        cache.save()
+
+    if stop_reason is None and search.timed_out:
+        stop_reason = 'time_budget'
+    ranking = sorted([{'params': params, 'cv_score': score} for params, score in results if score is not None],
+                     key=lambda r: r['cv_score'], reverse=True)
+    if ranking and (best['params'] is None or ranking[0]['cv_score'] > best['score']):
+        best.update(params=ranking[0]['params'], score=ranking[0]['cv_score'])
+    if best['params'] is None:
+        raise TimeoutError('时间预算内没有完成任何候选参数的交叉验证')
+
+    return {
+        'method': method,
+        'cv': cv,
+        'best_params': best['params'],
+        'best_score': best['score'],
+        'ranking': ranking,
+        'rounds': rounds,
+        'stop_reason': stop_reason,
+        'fits': search.fits_done,
+        'cache_hits': cache.hits,
+        'elapsed_seconds': time.time() - started,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='随机森林超参数搜索')
+    parser.add_argument('--csv', required=True, help='数据集CSV文件')
+    parser.add_argument('--target', default='stress_level', help='目标列名称')
+    parser.add_argument('--method', default='grid', choices=SEARCH_METHODS, help='搜索方式')
+    parser.add_argument('--grid', help='参数网格JSON，如 {"max_depth": [5, 8]}')
+    parser.add_argument('--cv', type=int, default=DEFAULT_CV_FOLDS, help='交叉验证折数')
+    parser.add_argument('--jobs', type=int, help='并行进程数，默认CPU核数')
+    parser.add_argument('--budget', type=float, help='时间预算（秒）')
+    parser.add_argument('--patience', type=int, help='连续多少个候选没有提升时提前停止')
+    parser.add_argument('--target-score', type=float, help='达到该交叉验证得分时提前停止')
+    parser.add_argument('--register', action='store_true', help='用最佳参数训练并注册为新的模型版本')
+    args = parser.parse_args()
+
+    import pandas as pd
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry()
+    data = pd.read_csv(args.csv)
+    try:
+        result = tune(data, args.target, json.loads(args.grid) if args.grid else None, args.method, args.cv,
+                      args.jobs, args.budget, args.patience, args.target_score,
+                      cache_path=os.path.join(registry.root_dir, FOLD_CACHE_FILE),
+                      progress=lambda done, total: print(f"已完成 {done}/{total} 次拟合"))
+    except (ValueError, TimeoutError) as e:
+        print(f"调参失败: {e}")
+        sys.exit(1)
+
+    print(f"最佳参数: {result['best_params']}，交叉验证得分: {result['best_score']:.4f}")
+    if args.register:
+        from training_jobs import register_tuned_model
+        print(f"已注册为版本 {register_tuned_model(registry, data, args.target, result)['model_version']}")
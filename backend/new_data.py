@@ -1,35 +1,33 @@
-import pandas as pd
-import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+import argparse
+import os
 
-# 读取数据集
-file_path = r"c:\Users\24130\Desktop\stress-prediction-frontend\StressLevelDataset.csv"
-df = pd.read_csv(file_path)
+import pandas as pd
 
-# 分离特征和目标变量
-X = df.iloc[:, :-1]  # 所有列，除了最后一列
-y = df.iloc[:, -1]   # 最后一列 (stress_level)
+from data_generator import DEFAULT_SEED, fit_spec, generate_chunk
 
-# 检查数据类型并转换为数值型
-for column in X.columns:
-    if X[column].dtype == 'object':
-        # 将分类变量转换为数值
-        X[column] = pd.Categorical(X[column]).codes
+# 命令行参数（默认与原脚本一致：生成 1000 行；大规模数据请使用 data_generator.py 分块生成）
+# 默认输出到仓库根目录的 ShapCompatibleDataset_new.csv，不覆盖后端在 Hive 不可用时读取的 ShapCompatibleDataset.csv
+default_output = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'ShapCompatibleDataset_new.csv')
+parser = argparse.ArgumentParser(description='生成与SHAP兼容的合成数据集')
+parser.add_argument('--source', required=True, help='原始数据集CSV文件（StressLevelDataset.csv）')
+parser.add_argument('--output', default=default_output, help='新数据集CSV文件')
+parser.add_argument('--rows', type=int, default=1000, help='生成的行数')
+parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='随机种子')
+args = parser.parse_args()
 
-# 标准化特征 - 这有助于SHAP分析
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-X_scaled_df = pd.DataFrame(X_scaled, columns=X.columns)
+# 读取数据集
+file_path = args.source
+df = pd.read_csv(file_path)
+target_column = df.columns[-1]  # 最后一列 (stress_level)
 
-# 训练随机森林模型
-model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=5)
-model.fit(X_scaled_df, y)
+# 估计特征分布（均值、协方差的 Cholesky 因子、取值范围）并训练标注模型
+spec = fit_spec(df, target_column)
+model = spec.model
 
 # 获取特征重要性
 feature_importance = model.feature_importances_
-features = X.columns
+features = spec.columns
 
 # 打印特征重要性
 importance_df = pd.DataFrame({'特征': features, '重要性': feature_importance})
@@ -37,40 +35,11 @@ importance_df = importance_df.sort_values('重要性', ascending=False)
 print("特征重要性排序:")
 print(importance_df)
 
-# 生成新数据 - 确保维度一致性
-n_samples = 1000  # 固定样本数量，避免过大
-n_features = len(X.columns)
-
-# 使用多元正态分布生成相关特征
-# 首先计算特征之间的协方差矩阵
-cov_matrix = np.cov(X_scaled, rowvar=False)
-
-# 生成多元正态分布的数据
-mean_vector = np.zeros(n_features)  # 标准化后的均值为0
-new_features_scaled = np.random.multivariate_normal(mean_vector, cov_matrix, n_samples)
-
-# 转换回原始尺度
-new_features = scaler.inverse_transform(new_features_scaled)
-
-# 创建新的DataFrame
-new_data = pd.DataFrame(new_features, columns=X.columns)
-
-# 确保所有整数列都是整数类型
-for column in X.columns:
-    if df[column].dtype == 'int64':
-        new_data[column] = np.round(new_data[column]).astype(int)
-    
-    # 确保值在合理范围内
-    min_val = df[column].min()
-    max_val = df[column].max()
-    new_data[column] = new_data[column].clip(min_val, max_val)
-
-# 使用训练好的模型预测新数据的目标变量
-new_data_scaled = scaler.transform(new_data)
-new_data['stress_level'] = model.predict(new_data_scaled)
+# 生成新数据：多元正态分布采样，整数列取整并截断到原始取值范围，目标变量由模型预测
+new_data = generate_chunk(spec, 0, args.rows, args.seed)
 
 # 保存新生成的数据
-new_file_path = r"c:\Users\24130\Desktop\stress-prediction-frontend\ShapCompatibleDataset.csv"
+new_file_path = args.output
 new_data.to_csv(new_file_path, index=False)
 
 print(f"新数据已保存到: {new_file_path}")
@@ -84,24 +53,23 @@ print(new_data.describe())
 
 # 显示原始数据和新数据的目标变量分布比较
 print("\n原始数据目标变量分布:")
-print(df['stress_level'].value_counts(normalize=True))
+print(df[target_column].value_counts(normalize=True))
 
 print("\n新数据目标变量分布:")
-print(new_data['stress_level'].value_counts(normalize=True))
+print(new_data[target_column].value_counts(normalize=True))
 
 # 测试SHAP兼容性
 try:
     import shap
     # 创建一个简单的解释器
     explainer = shap.TreeExplainer(model)
-    
+
     # 取一小部分数据进行测试
-    test_data = new_data.iloc[:10, :-1]
-    test_data_scaled = scaler.transform(test_data)
-    
+    test_data = new_data.iloc[:10, :-1].to_numpy(dtype=float)
+
     # 计算SHAP值
-    shap_values = explainer.shap_values(test_data_scaled)
-    
+    shap_values = explainer.shap_values(test_data)
+
     # 检查维度
     if isinstance(shap_values, list):
         print("\nSHAP值维度检查 (多分类):")
@@ -110,8 +78,8 @@ try:
     else:
         print("\nSHAP值维度检查 (二分类):")
         print(f"SHAP值形状: {shap_values.shape}")
-        print(f"测试数据形状: {test_data_scaled.shape}")
-    
+        print(f"测试数据形状: {test_data.shape}")
+
     print("SHAP兼容性测试通过！")
 except Exception as e:
-    print(f"SHAP兼容性测试失败: {str(e)}")
\ No newline at end of file
+    print(f"SHAP兼容性测试失败: {str(e)}")
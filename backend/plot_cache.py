@@ -0,0 +1,188 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# 内存缓存默认字节预算
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# 最多记住的 ETag 数量（图表字节被淘汰后 ETag 仍保留，条件请求无需重新渲染）
+MAX_ETAGS = 10000
+
+
+def content_etag(data):
+    """图像内容的强ETag（SHA-256）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def plot_key(model_id, name, dpi, figsize, fmt='png'):
+    """构造图表缓存键：(模型标识, 图表类型, dpi, 尺寸, 格式)，模型标识见 ModelRecord.model_id"""
+    return (model_id, name, int(dpi), tuple(float(v) for v in figsize), fmt)
+
+
+class PlotCache:
+    """
+    渲染结果缓存：内存中按字节预算进行LRU淘汰，可选磁盘二级缓存。
+
+    磁盘缓存按模型标识分目录存放，便于多个工作进程共享已渲染的图表；版本号被重新分配后
+    新模型的标识不同，不会读到旧模型的图表。
+    同一个键并发未命中时只渲染一次，其余请求等待结果。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None):
+        """
+        :param max_bytes: 内存缓存的字节上限
+        :param disk_dir: 磁盘缓存目录，None 表示不启用
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._etags = OrderedDict()
+        self._bytes = 0
+        self._stats = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'renders': 0,
+            'render_errors': 0,
+        }
+
+    def _disk_path(self, key):
+        model_id, name, dpi, figsize, fmt = key
+        size = 'x'.join(f'{v:g}' for v in figsize)
+        safe = lambda value: re.sub(r'[^A-Za-z0-9_.-]', '_', str(value))
+        return os.path.join(self.disk_dir, safe(model_id), f'{safe(name)}-{dpi}-{size}.{safe(fmt)}')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"写入图表磁盘缓存时出错: {e}")
+
+    def _put_memory(self, key, data):
+        """在持有锁的情况下写入内存缓存并按字节预算淘汰"""
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._stats['evictions'] += 1
+
+    def _remember_etag(self, key, data):
+        etag = content_etag(data)
+        with self._lock:
+            self._etags[key] = etag
+            self._etags.move_to_end(key)
+            while len(self._etags) > MAX_ETAGS:
+                self._etags.popitem(last=False)
+        return etag
+
+    def etag(self, key):
+        """
+        已渲染图表的ETag，不需要渲染：图表字节从内存淘汰后仍然保留，也会从磁盘缓存计算；
+        从未渲染过时返回 None。
+        """
+        with self._lock:
+            etag = self._etags.get(key)
+        if etag is not None:
+            return etag
+        data = self._read_disk(key)
+        return self._remember_etag(key, data) if data is not None else None
+
+    def get(self, key):
+        """查找缓存（先内存后磁盘），未命中返回 None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return data
+
+        data = self._read_disk(key)
+        if data is not None:
+            with self._lock:
+                self._stats['disk_hits'] += 1
+                self._put_memory(key, data)
+            self._remember_etag(key, data)
+        return data
+
+    def put(self, key, data):
+        """写入缓存（内存与磁盘）"""
+        with self._lock:
+            self._put_memory(key, data)
+        self._remember_etag(key, data)
+        self._write_disk(key, data)
+
+    def get_or_render(self, key, render):
+        """
+        获取缓存的图表，未命中时调用 render() 渲染并缓存。
+
+        render 抛出异常时不缓存，异常继续向上抛出。
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            is_leader = pending is None
+            if is_leader:
+                pending = self._inflight[key] = {'event': threading.Event(), 'data': None, 'error': None}
+                self._stats['misses'] += 1
+
+        if not is_leader:
+            # 等待正在进行的渲染，共享其结果或异常
+            pending['event'].wait()
+            if pending['error'] is not None:
+                raise pending['error']
+            return pending['data']
+
+        try:
+            data = render()
+            pending['data'] = data
+            with self._lock:
+                self._stats['renders'] += 1
+            self.put(key, data)
+            return data
+        except Exception as e:
+            pending['error'] = e
+            with self._lock:
+                self._stats['render_errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending['event'].set()
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['max_bytes'] = self.max_bytes
+            return stats
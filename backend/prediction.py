@@ -0,0 +1,107 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - pyarrow 为可选依赖
+    pa = None
+    ipc = None
+
+# 单次请求允许的最大行数
+MAX_PREDICT_ROWS = 100000
+
+CSV_CONTENT_TYPES = ('text/csv', 'application/csv')
+ARROW_CONTENT_TYPES = ('application/vnd.apache.arrow.stream', 'application/vnd.apache.arrow.file')
+
+
+class PredictionError(ValueError):
+    """请求数据无法用于预测（格式错误、缺少特征、取值非法等）"""
+
+
+def parse_records(body, content_type):
+    """
+    将请求体解析为 DataFrame。
+
+    支持：
+    - JSON 对象（单条记录）、对象数组，或 {"records": [...]}；
+    - CSV（首行为列名）；
+    - Arrow IPC 流或文件格式。
+
+    :param body: 请求体字节
+    :param content_type: 请求的 Content-Type（不含参数）
+    :return: DataFrame，单条记录也返回一行的 DataFrame
+    """
+    if not body:
+        raise PredictionError('请求体为空')
+
+    if content_type in CSV_CONTENT_TYPES:
+        try:
+            return pd.read_csv(io.BytesIO(body))
+        except Exception as e:
+            raise PredictionError(f'无法解析CSV: {e}')
+
+    if content_type in ARROW_CONTENT_TYPES:
+        if pa is None:
+            raise PredictionError('服务器未安装 pyarrow，不支持Arrow格式')
+        try:
+            reader = (ipc.open_stream if content_type.endswith('stream') else ipc.open_file)(pa.BufferReader(body))
+            return reader.read_all().to_pandas()
+        except Exception as e:
+            raise PredictionError(f'无法解析Arrow数据: {e}')
+
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise PredictionError(f'无法解析JSON: {e}')
+    if isinstance(payload, dict) and 'records' in payload:
+        payload = payload['records']
+    if isinstance(payload, dict):
+        return pd.DataFrame([payload])
+    if isinstance(payload, list) and all(isinstance(item, dict) for item in payload):
+        return pd.DataFrame(payload)
+    raise PredictionError('JSON 必须是记录对象、记录对象数组或 {"records": [...]}')
+
+
+def to_feature_matrix(df, features):
+    """
+    按模型训练时的特征顺序取出特征矩阵并校验。
+
+    多余的列（如 stress_level）会被忽略。
+
+    :param df: 请求数据
+    :param features: 模型的特征列表
+    :return: float32 特征矩阵（与树模型内部使用的类型一致，避免再次复制）
+    """
+    if len(df) == 0:
+        raise PredictionError('没有需要预测的记录')
+    if len(df) > MAX_PREDICT_ROWS:
+        raise PredictionError(f'单次最多预测 {MAX_PREDICT_ROWS} 条记录')
+
+    missing = [feature for feature in features if feature not in df.columns]
+    if missing:
+        raise PredictionError(f'缺少特征: {", ".join(missing)}')
+
+    try:
+        X = df[list(features)].to_numpy(dtype=np.float32)
+    except (TypeError, ValueError):
+        invalid = [feature for feature in features
+                   if pd.to_numeric(df[feature], errors='coerce').isna().any()]
+        raise PredictionError(f'特征取值必须为数值: {", ".join(invalid)}')
+    if not np.isfinite(X).all():
+        rows = np.flatnonzero(~np.isfinite(X).all(axis=1))[:10].tolist()
+        raise PredictionError(f'存在缺失或非法取值，行号: {rows}')
+    return X
+
+
+def predict_proba(model, X):
+    """
+    向量化预测类别概率。
+
+    :return: (预测类别数组, 概率矩阵)
+    """
+    proba = model.predict_proba(X)
+    return model.classes_[np.argmax(proba, axis=1)], proba
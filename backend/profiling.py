@@ -0,0 +1,396 @@
+"""
+按需性能剖析。
+
+默认关闭，只在以下情况下剖析单个请求：
+- 请求带有 ``X-Profile: cprofile`` 或 ``X-Profile: sampling`` 请求头，并带有正确的管理令牌；
+- 管理员通过 ``PUT /api/admin/profiling`` 开启了抽样：在限定时间内按比例随机剖析请求。
+
+cprofile 模式保存 pstats 文件（可用 ``python -m pstats`` 或 snakeviz 查看）；sampling 模式由后台线程
+定时采样请求线程的调用栈，保存为火焰图工具可直接使用的折叠栈格式（flamegraph.pl、speedscope）。
+耗费内存的训练与图表渲染都在工作进程中执行：被剖析的请求让工作进程用 ``trace_memory``（tracemalloc）
+记录该次训练或渲染的内存分配差异与峰值。图表渲染的报告随图像返回，写入该请求的 memory 产物；
+训练在请求结束后才完成，报告随任务结果返回（memory_profile）。
+
+剖析结果保存在磁盘目录中，可通过管理接口列出与下载。
+"""
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import abort, g, jsonify, request, send_file
+
+from instrumentation import current_request_id
+
+PROFILE_HEADER = 'X-Profile'
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+PROFILE_MODES = ('cprofile', 'sampling')
+
+SAMPLING_INTERVAL = 0.005     # 采样间隔（秒）
+MAX_SAMPLE_DURATION = 3600    # 抽样开启的最长持续时间（秒）
+MEMORY_TOP_STATS = 25         # 内存报告中列出的分配差异条数
+
+# 剖析产物：类型 -> 文件扩展名
+ARTIFACTS = {
+    'pstats': 'pstats',
+    'collapsed': 'collapsed.txt',
+    'memory': 'memory.txt',
+}
+
+
+class StackSampler:
+    """定时采样指定线程的调用栈，按折叠栈（根在前，以分号分隔）计数"""
+
+    def __init__(self, thread_id, interval=SAMPLING_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def collapsed(self):
+        """折叠栈文本，每行为 “栈 次数”"""
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.counts.items()))
+
+
+class _MemoryTracing:
+    """tracemalloc 是进程级的，多个请求同时剖析时按引用计数启停"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+        self._started_here = False
+
+    def acquire(self):
+        with self._lock:
+            if self._users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_here = True
+            self._users += 1
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users == 0 and self._started_here:
+                tracemalloc.stop()
+                self._started_here = False
+
+
+_memory_tracing = _MemoryTracing()
+
+
+class ProfileSession:
+    """一次被剖析的请求"""
+
+    def __init__(self, mode, memory=True):
+        self.mode = mode
+        self.memory = memory
+        self.memory_reports = []
+        self.started = time.perf_counter()
+        self._profile = None
+        self._sampler = None
+
+    def start(self):
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+
+    def stop(self):
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+
+    def artifacts(self):
+        """返回 {类型: 写文件函数(path)}"""
+        artifacts = {}
+        if self._profile is not None:
+            artifacts['pstats'] = self._profile.dump_stats
+        if self._sampler is not None:
+            collapsed = self._sampler.collapsed()
+            artifacts['collapsed'] = lambda path: _write_text(path, collapsed)
+        if self.memory_reports:
+            report = '\n\n'.join(self.memory_reports)
+            artifacts['memory'] = lambda path: _write_text(path, report)
+        return artifacts
+
+
+def _write_text(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+_current_session = ContextVar('profile_session', default=None)
+
+
+@contextmanager
+def trace_memory(name, reports):
+    """
+    用 tracemalloc 记录上下文内的内存分配差异与峰值，报告文本追加到 reports；reports 为 None 时不做任何事。
+
+    不依赖请求上下文，可在训练、图表渲染等工作进程中调用，报告随任务结果返回后再由
+    add_memory_reports 加入请求的剖析结果。
+    """
+    if reports is None:
+        yield
+        return
+
+    _memory_tracing.acquire()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            diff = after.compare_to(before, 'lineno')
+            lines = [f'== {name}（进程 {os.getpid()}）==',
+                     f'耗时: {time.perf_counter() - started:.3f} 秒',
+                     f'分配净增: {sum(stat.size_diff for stat in diff) / 1024:.1f} KiB',
+                     f'期间峰值: {peak / 1024:.1f} KiB（当前跟踪 {current / 1024:.1f} KiB）',
+                     f'分配差异最大的 {MEMORY_TOP_STATS} 处:']
+            lines.extend(str(stat) for stat in diff[:MEMORY_TOP_STATS])
+            reports.append('\n'.join(lines))
+    finally:
+        _memory_tracing.release()
+
+
+def memory_requested():
+    """当前请求是否正在被剖析并记录内存（决定是否让工作进程记录内存分配）"""
+    session = _current_session.get()
+    return session is not None and session.memory
+
+
+def add_memory_reports(reports):
+    """将工作进程返回的内存报告加入当前请求的剖析结果"""
+    session = _current_session.get()
+    if session is not None and session.memory and reports:
+        session.memory_reports.extend(reports)
+
+
+class ProfileStore:
+    """剖析结果目录：每个剖析一个子目录，包含 meta.json 与各类产物；超过上限时删除最旧的"""
+
+    def __init__(self, root_dir, max_profiles=200):
+        self.root_dir = root_dir
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def save(self, meta, artifacts):
+        """
+        :param meta: 元数据字典，须包含 id
+        :param artifacts: {类型: 写文件函数(path)}
+        """
+        profile_dir = os.path.join(self.root_dir, meta['id'])
+        os.makedirs(profile_dir, exist_ok=True)
+        for kind, write in artifacts.items():
+            write(os.path.join(profile_dir, f'profile.{ARTIFACTS[kind]}'))
+        meta = {**meta, 'artifacts': sorted(artifacts)}
+        with open(os.path.join(profile_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._prune()
+        return meta
+
+    def list(self):
+        """按时间倒序返回全部剖析的元数据"""
+        profiles = []
+        if not os.path.isdir(self.root_dir):
+            return profiles
+        for profile_id in os.listdir(self.root_dir):
+            try:
+                with open(os.path.join(self.root_dir, profile_id, 'meta.json'), 'r', encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda meta: meta['created'], reverse=True)
+
+    def path(self, profile_id, kind):
+        """产物文件路径，不存在时返回 None"""
+        if kind not in ARTIFACTS or not re.fullmatch(r'[\w-]+', profile_id):
+            return None
+        path = os.path.join(self.root_dir, profile_id, f'profile.{ARTIFACTS[kind]}')
+        return path if os.path.isfile(path) else None
+
+    def _prune(self):
+        with self._lock:
+            for meta in self.list()[self.max_profiles:]:
+                shutil.rmtree(os.path.join(self.root_dir, meta['id']), ignore_errors=True)
+
+
+class Profiler:
+    """
+    请求剖析开关与管理接口。
+
+    管理令牌为 None 时整个功能关闭：请求头被忽略，管理接口返回 403。
+    """
+
+    def __init__(self, store, admin_token=None):
+        self.store = store
+        self.admin_token = admin_token
+        self._lock = threading.Lock()
+        self._sampling = {'sample_rate': 0.0, 'mode': 'sampling', 'memory': True, 'until': 0.0,
+                          'path_prefix': None}
+
+    def authorized(self):
+        token = request.headers.get(ADMIN_TOKEN_HEADER)
+        return bool(self.admin_token) and token is not None and hmac.compare_digest(token, self.admin_token)
+
+    def sampling(self):
+        """当前抽样配置"""
+        with self._lock:
+            config = dict(self._sampling)
+        config['active'] = config['sample_rate'] > 0 and time.time() < config['until']
+        config['remaining_seconds'] = max(0.0, config['until'] - time.time()) if config['active'] else 0.0
+        return config
+
+    def configure(self, sample_rate, duration_seconds, mode='sampling', memory=True, path_prefix=None):
+        """开启（sample_rate > 0）或关闭抽样"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f'mode 必须是以下之一: {", ".join(PROFILE_MODES)}')
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError('sample_rate 必须在 0 到 1 之间')
+        duration_seconds = min(max(duration_seconds, 0.0), MAX_SAMPLE_DURATION)
+        with self._lock:
+            self._sampling = {'sample_rate': sample_rate, 'mode': mode, 'memory': bool(memory),
+                              'until': time.time() + duration_seconds, 'path_prefix': path_prefix}
+        return self.sampling()
+
+    def _choose(self):
+        """决定当前请求是否剖析，返回 (模式, 是否记录内存) 或 None"""
+        if not self.admin_token:
+            return None
+        requested = request.headers.get(PROFILE_HEADER)
+        if requested:
+            if requested in PROFILE_MODES and self.authorized():
+                return requested, True
+            return None
+        config = self.sampling()
+        if not config['active'] or request.path.startswith('/api/admin/'):
+            return None
+        if config['path_prefix'] and not request.path.startswith(config['path_prefix']):
+            return None
+        if random.random() < config['sample_rate']:
+            return config['mode'], config['memory']
+        return None
+
+    def init_app(self, app):
+        """安装请求钩子与管理接口（须在 instrumentation.init_app 之后调用，以便使用请求ID）"""
+        @app.before_request
+        def _start_profile():
+            choice = self._choose()
+            if choice is None:
+                return
+            session = ProfileSession(*choice)
+            g.profile_session = session
+            g.profile_session_token = _current_session.set(session)
+            session.start()
+
+        @app.after_request
+        def _finish_profile(response):
+            session = g.pop('profile_session', None)
+            if session is None:
+                return response
+            session.stop()
+            _current_session.reset(g.pop('profile_session_token'))
+            request_id = current_request_id() or 'none'
+            meta = {
+                'id': f"{time.strftime('%Y%m%d-%H%M%S')}-{request_id[:12]}",
+                'request_id': request_id,
+                'created': time.time(),
+                'mode': session.mode,
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.url_rule.rule if request.url_rule is not None else None,
+                'status': response.status_code,
+                'duration_ms': (time.perf_counter() - session.started) * 1000,
+            }
+            try:
+                meta = self.store.save(meta, session.artifacts())
+                response.headers['X-Profile-Id'] = meta['id']
+            except OSError as e:
+                print(f"保存剖析结果时出错: {e}")
+            return response
+
+        def require_admin():
+            if not self.authorized():
+                abort(403)
+
+        @app.route('/api/admin/profiling', methods=['GET', 'PUT'])
+        def profiling_config():
+            """
+            查看或修改抽样剖析配置。
+
+            PUT 请求体: {"sample_rate": 0.05, "duration_seconds": 300, "mode": "sampling" | "cprofile",
+            "memory": true, "path_prefix": "/api/model-plots"}；sample_rate 为 0 时关闭。
+            """
+            require_admin()
+            if request.method == 'PUT':
+                options = request.get_json(silent=True) or {}
+                try:
+                    config = self.configure(float(options.get('sample_rate', 0.0)),
+                                            float(options.get('duration_seconds', 300)),
+                                            options.get('mode', 'sampling'), options.get('memory', True),
+                                            options.get('path_prefix'))
+                except (TypeError, ValueError) as e:
+                    return jsonify({
+                        'status': 'error',
+                        'message': str(e)
+                    }), 400
+            else:
+                config = self.sampling()
+            return jsonify({
+                'status': 'success',
+                'sampling': config
+            }), 200
+
+        @app.route('/api/admin/profiles', methods=['GET'])
+        def list_profiles():
+            """列出已保存的剖析结果（按时间倒序）"""
+            require_admin()
+            return jsonify({
+                'status': 'success',
+                'profiles': self.store.list()
+            }), 200
+
+        @app.route('/api/admin/profiles/<profile_id>/<kind>', methods=['GET'])
+        def download_profile(profile_id, kind):
+            """下载剖析产物：pstats、collapsed（折叠栈）或 memory（tracemalloc 报告）"""
+            require_admin()
+            path = self.store.path(profile_id, kind)
+            if path is None:
+                abort(404)
+            return send_file(path, as_attachment=True, download_name=f'{profile_id}.{ARTIFACTS[kind]}')
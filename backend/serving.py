@@ -0,0 +1,201 @@
+"""
+生产部署支持：启动预热状态与模型版本监视。
+
+gunicorn 以 preload_app 方式启动时，主进程导入应用并执行预热（加载当前模型版本、数据集等），
+工作进程 fork 后通过写时复制共享这些对象，不必各自重复加载；预热状态随之复制到每个工作进程，
+供就绪检查接口返回。
+
+主进程中的 ModelVersionWatcher 监视模型仓库的当前版本，发现新版本被提升时通知 gunicorn
+平滑重启：主进程先加载新版本，再 fork 新的工作进程并逐个退出旧的工作进程。
+工作进程中进行的训练任务与图表预渲染通过 ReloadGuard 登记，登记期间推迟平滑重启。
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def process_alive(pid):
+    """进程是否仍在运行"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Warmup:
+    """启动预热：依次执行各预热步骤，记录每一步的耗时、结果与错误"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._steps = OrderedDict()
+        self.started_at = None
+        self.finished_at = None
+        self.pid = None  # 执行预热的进程（工作进程由主进程 fork 时与自身 pid 不同）
+        self.runs = 0
+
+    def run(self, steps):
+        """
+        执行预热步骤，单个步骤出错不影响后续步骤。
+
+        :param steps: [(名称, 无参函数)]，函数返回该步骤的结果摘要（可JSON序列化的字典）
+        :return: 是否全部成功
+        """
+        with self._lock:
+            self.started_at = time.time()
+            self.finished_at = None
+            self.pid = os.getpid()
+            self.runs += 1
+            self._steps = OrderedDict((name, {'state': 'pending'}) for name, _ in steps)
+
+        for name, step in steps:
+            started = time.perf_counter()
+            with self._lock:
+                self._steps[name] = {'state': 'running'}
+            try:
+                result = {'state': 'done', 'detail': step()}
+            except Exception as e:
+                print(f"预热步骤 {name} 出错: {e}")
+                result = {'state': 'failed', 'error': str(e)}
+            result['seconds'] = round(time.perf_counter() - started, 3)
+            with self._lock:
+                self._steps[name] = result
+
+        with self._lock:
+            self.finished_at = time.time()
+        print(f"预热完成，耗时 {self.finished_at - self.started_at:.2f} 秒: "
+              + ', '.join(f"{name}={step['state']}" for name, step in self._steps.items()))
+        return self.ready
+
+    @property
+    def ready(self):
+        """预热已完成且所有步骤都成功"""
+        with self._lock:
+            return self.finished_at is not None and all(step['state'] == 'done' for step in self._steps.values())
+
+    def to_dict(self):
+        ready = self.ready
+        with self._lock:
+            return {
+                'ready': ready,
+                'runs': self.runs,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'seconds': (self.finished_at - self.started_at) if self.finished_at is not None else None,
+                'preloaded': self.pid is not None and self.pid != os.getpid(),
+                'steps': {name: dict(step) for name, step in self._steps.items()},
+            }
+
+
+class ReloadGuard:
+    """
+    工作进程中不应被平滑重启打断的工作（训练任务、图表预渲染）的登记处。
+
+    每项工作在目录中创建一个 “<pid>-<名称>-<序号>” 文件，结束时删除；目录在模型仓库中，
+    主进程与所有工作进程共享。主进程在重启前调用 holders 检查，所属进程已退出（被强制终止）的
+    登记视为已结束并清理。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._counter = itertools.count()
+        os.makedirs(directory, exist_ok=True)
+
+    def acquire(self, name):
+        """
+        登记一项工作。
+
+        :return: 登记凭证，结束时传给 release
+        """
+        path = os.path.join(self.directory, f'{os.getpid()}-{name}-{next(self._counter)}')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(str(time.time()))
+        return path
+
+    def release(self, path):
+        """结束一项工作的登记，path 为 None 时不做任何事"""
+        if path is None:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def holders(self):
+        """进行中的工作（登记文件名列表）"""
+        try:
+            entries = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        active = []
+        for entry in entries:
+            try:
+                pid = int(entry.split('-', 1)[0])
+            except ValueError:
+                continue
+            if process_alive(pid):
+                active.append(entry)
+            else:
+                self.release(os.path.join(self.directory, entry))
+        return sorted(active)
+
+
+class ModelVersionWatcher:
+    """
+    后台线程定期读取模型仓库的当前版本，版本变化时调用 ``on_change(新版本)``。
+    ``busy()`` 返回非空（如仍有训练任务或预渲染在进行）时推迟通知，在之后的检查中重试。
+
+    在 gunicorn 主进程中运行：线程只读取版本文件并发送信号，不持有应用的任何锁，
+    因此主进程 fork 工作进程时不会把锁的状态带进子进程。
+    """
+
+    def __init__(self, read_version, on_change, interval=5.0, busy=None):
+        """
+        :param read_version: 无参函数，返回当前版本号
+        :param on_change: 回调 on_change(version)
+        :param interval: 检查间隔（秒）
+        :param busy: 无参函数，返回进行中的工作列表，非空时推迟通知
+        """
+        self.read_version = read_version
+        self.on_change = on_change
+        self.interval = interval
+        self.busy = busy
+        self.version = None
+        self.deferred = 0  # 因有工作进行而推迟的检查次数
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.version = self._read()
+        self._thread = threading.Thread(target=self._run, name='model-version-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _read(self):
+        try:
+            return self.read_version()
+        except OSError:
+            return self.version
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            version = self._read()
+            if version == self.version:
+                continue
+            holders = self.busy() if self.busy is not None else None
+            if holders:
+                if not self.deferred:
+                    print(f"模型版本变为 {version}，等待进行中的工作完成后再重启: {', '.join(holders)}")
+                self.deferred += 1
+                continue
+            self.deferred = 0
+            self.version = version
+            self.on_change(version)
@@ -0,0 +1,454 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from model_registry import ModelRegistry
+from model_training import DEFAULT_MODEL_PARAMS, row_hashes, train_and_evaluate, train_incremental
+from model_tuning import FOLD_CACHE_FILE, tune
+from profiling import trace_memory
+from serving import process_alive
+from training_parallelism import TrainingParallelism, process_context
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+# 训练方式：全量重训，或基于当前版本在新增行上增量训练
+MODE_FULL = 'full'
+MODE_INCREMENTAL = 'incremental'
+MODE_TUNE = 'tune'
+TRAINING_MODES = (MODE_FULL, MODE_INCREMENTAL)
+
+# 任务状态文件所在的子目录（位于模型仓库目录中）
+JOBS_DIR = 'jobs'
+
+
+def _run_training_job(job_id, df, target_column, params, registry_dir, store,
+                      mode=MODE_FULL, baseline=False, parallelism=None, profile_memory=False):
+    """
+    在工作进程中执行训练任务，并将结果直接注册到磁盘模型仓库。
+
+    :param store: 任务状态存储 (JobStore)，训练进度写入其中
+    :param profile_memory: 是否在工作进程中用 tracemalloc 记录训练的内存分配
+    :return: 可JSON序列化的训练结果，resources 为训练（含评估）的并行度、墙钟时间与CPU时间，
+             记录内存时 memory_profile 为内存报告
+    """
+    parallelism = parallelism or TrainingParallelism()
+    store.report_progress(job_id, None)
+    reports = [] if profile_memory else None
+    with parallelism.fitting(df) as usage, trace_memory(f'train_model:{mode}', reports):
+        result = _train(job_id, df, target_column, params, registry_dir, store, mode, baseline)
+    print(f"训练耗时 {usage['wall_seconds']:.2f} 秒，CPU时间 {usage['cpu_seconds']:.2f} 秒，"
+          f"并行度 {usage['n_jobs']}（{usage['backend']}）")
+    result['resources'] = usage
+    if reports:
+        result['memory_profile'] = '\n\n'.join(reports)
+    return result
+
+
+def _train(job_id, df, target_column, params, registry_dir, store, mode, baseline):
+    """
+    执行训练并注册新版本。
+
+    增量模式下当前版本缺少行哈希、列或类别发生变化时自动改为全量重训；没有新增行时不注册新版本。
+    """
+    def report(trees_fitted, n_estimators):
+        store.report_progress(job_id, (trees_fitted, n_estimators))
+
+    registry = ModelRegistry(registry_dir)
+    lineage = None
+    if mode == MODE_INCREMENTAL:
+        base = registry.current()
+        seen = registry.row_hashes(base.version) if base is not None else None
+        if seen is None:
+            fallback_reason = '当前没有可用于增量训练的模型版本'
+        else:
+            try:
+                (model, features, accuracy, X_test, y_test, evaluation,
+                 hashes, lineage) = train_incremental(df, base, seen, target_column=target_column,
+                                                      params=params, progress=report, baseline=baseline)
+                fallback_reason = None
+            except ValueError as e:
+                fallback_reason = str(e)
+
+        if fallback_reason is None and model is None:
+            print(f"自版本 {base.version} 以来没有新增数据，无需重新训练")
+            return {
+                'model_version': base.version,
+                'accuracy': float(base.accuracy),
+                'n_estimators': base.model.n_estimators,
+                'features': list(base.features),
+                'feature_importance': [float(v) for v in base.model.feature_importances_],
+                'lineage': {**lineage, 'mode': MODE_INCREMENTAL, 'skipped': True},
+            }
+        if fallback_reason is not None:
+            print(f"改为全量重训: {fallback_reason}")
+        else:
+            lineage['mode'] = MODE_INCREMENTAL
+
+    if lineage is None:
+        model, features, accuracy, X_test, y_test, evaluation = train_and_evaluate(
+            df, target_column=target_column, params=params, progress=report)
+        if model is None:
+            raise ValueError('模型训练失败，没有可用的特征列')
+        hashes = row_hashes(df, list(features) + [target_column])
+        lineage = {'mode': MODE_FULL, 'rows': int(len(df))}
+        if mode == MODE_INCREMENTAL:
+            lineage['fallback_reason'] = fallback_reason
+
+    record = registry.register(model, features, accuracy, X_test, y_test, params=model.get_params(),
+                               metrics=evaluation.metrics, y_proba=evaluation.y_proba,
+                               row_hashes=hashes, lineage=lineage)
+    return {
+        'model_version': record.version,
+        'accuracy': float(accuracy),
+        'n_estimators': model.n_estimators,
+        'features': list(features),
+        'feature_importance': [float(v) for v in model.feature_importances_],
+        'lineage': lineage,
+    }
+
+
+def register_tuned_model(registry, df, target_column, search):
+    """
+    用超参数搜索得到的最佳参数在完整训练集上训练，并注册为新的模型版本。
+
+    :param search: model_tuning.tune 的返回结果
+    :return: 可JSON序列化的训练结果
+    """
+    params = search['best_params']
+    model, features, accuracy, X_test, y_test, evaluation = train_and_evaluate(
+        df, target_column=target_column, params=params)
+    if model is None:
+        raise ValueError('模型训练失败，没有可用的特征列')
+    lineage = {
+        'mode': MODE_TUNE,
+        'rows': int(len(df)),
+        'search': {key: search[key] for key in ('method', 'cv', 'best_score', 'rounds', 'stop_reason',
+                                                 'fits', 'cache_hits', 'elapsed_seconds')},
+    }
+    record = registry.register(model, features, accuracy, X_test, y_test, params=model.get_params(),
+                               metrics=evaluation.metrics, y_proba=evaluation.y_proba,
+                               row_hashes=row_hashes(df, list(features) + [target_column]), lineage=lineage)
+    return {
+        'model_version': record.version,
+        'accuracy': float(accuracy),
+        'n_estimators': model.n_estimators,
+        'features': list(features),
+        'feature_importance': [float(v) for v in model.feature_importances_],
+        'lineage': lineage,
+        'search': search,
+    }
+
+
+def _run_tuning_job(job_id, df, target_column, options, registry_dir, store, parallelism=None,
+                    profile_memory=False):
+    """
+    在工作进程中执行超参数搜索（内部再使用进程池并行交叉验证），并注册最佳参数训练的模型。
+
+    记录内存时只覆盖本进程（搜索调度与最终训练），不包括交叉验证的进程池。
+    """
+    def report(fits_done, fits_total):
+        store.report_progress(job_id, (fits_done, fits_total))
+
+    store.report_progress(job_id, None)
+    parallelism = parallelism or TrainingParallelism()
+    # 交叉验证各折单线程训练，进程数默认取训练任务的CPU预算
+    options = {**options, 'n_jobs': options.get('n_jobs') or parallelism.cpu_budget()}
+    registry = ModelRegistry(registry_dir)
+    reports = [] if profile_memory else None
+    with trace_memory('tune_model:search', reports):
+        search = tune(df, target_column=target_column, progress=report,
+                      cache_path=os.path.join(registry_dir, FOLD_CACHE_FILE), **options)
+    print(f"超参数搜索完成，最佳参数: {search['best_params']}，交叉验证得分: {search['best_score']:.4f}")
+    with parallelism.fitting(df) as usage, trace_memory('tune_model:train', reports):
+        result = register_tuned_model(registry, df, target_column, search)
+    result['resources'] = usage
+    if reports:
+        result['memory_profile'] = '\n\n'.join(reports)
+    return result
+
+
+def progress_dict(mode, params, progress=None):
+    """将进度元组 (已完成, 总数) 转换为接口返回的进度字典"""
+    if mode == MODE_TUNE:
+        fits_done, fits_total = progress or (0, None)
+        return {'fits_done': fits_done, 'fits_total': fits_total}
+    trees_fitted, n_estimators = progress or (0, params.get('n_estimators'))
+    return {'trees_fitted': trees_fitted, 'n_estimators': n_estimators}
+
+
+class TrainingJob:
+    """一次训练任务的状态"""
+
+    def __init__(self, job_id, key, params, mode=MODE_FULL):
+        self.job_id = job_id
+        self.key = key
+        self.params = params
+        self.mode = mode
+        self.status = JOB_QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self.pid = os.getpid()  # 提交任务的Web工作进程
+        self.hold = None        # 平滑重启的登记凭证，见 serving.ReloadGuard
+
+    def to_dict(self, progress=None):
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'mode': self.mode,
+            'progress': progress_dict(self.mode, self.params, progress),
+            'params': self.params,
+            'submitted_at': self.submitted_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error,
+            'pid': self.pid,
+        }
+
+
+class JobStore:
+    """
+    训练任务状态的磁盘存储，每个任务一个 ``<root>/<job_id>.json`` 文件（原子写入）。
+
+    目录位于模型仓库中，由所有Web工作进程共享：状态查询可以落到任意工作进程，
+    平滑重启替换工作进程后已完成任务的状态与结果仍可查询。提交任务的工作进程写入任务的创建与完成，
+    执行训练的进程写入进度，两者在时间上先后错开，不会同时写同一个文件。
+    """
+
+    def __init__(self, root_dir, max_files=1000):
+        """
+        :param root_dir: 存放任务状态文件的目录
+        :param max_files: 保留的已完成任务数量，超过时删除最旧的
+        """
+        self.root_dir = root_dir
+        self.max_files = max_files
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _path(self, job_id):
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+            return None
+        return os.path.join(self.root_dir, f'{job_id}.json')
+
+    def save(self, state):
+        """写入任务状态字典（见 TrainingJob.to_dict）"""
+        path = self._path(state['job_id'])
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _read(self, job_id):
+        path = self._path(job_id)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def load(self, job_id):
+        """
+        读取任务状态，任务不存在时返回 None。
+
+        提交任务的工作进程已退出（如被强制终止）而任务仍未完成时，任务不会再有结果，报告为失败。
+        """
+        state = self._read(job_id)
+        if state is not None and state['status'] in (JOB_QUEUED, JOB_RUNNING) and not process_alive(state['pid']):
+            state['status'] = JOB_FAILED
+            state['error'] = '任务所在的工作进程已退出，训练未完成'
+        return state
+
+    def report_progress(self, job_id, progress):
+        """在执行训练的进程中将任务标记为运行中并更新进度 (已完成, 总数)"""
+        state = self._read(job_id)
+        if state is None:
+            return
+        state['status'] = JOB_RUNNING
+        state['progress'] = progress_dict(state['mode'], state['params'], progress)
+        self.save(state)
+
+    def prune(self):
+        """删除超出保留数量的最旧的已完成任务"""
+        paths = [os.path.join(self.root_dir, name) for name in os.listdir(self.root_dir) if name.endswith('.json')]
+        if len(paths) <= self.max_files:
+            return
+        for path in sorted(paths, key=os.path.getmtime)[:len(paths) - self.max_files]:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    finished = json.load(f)['status'] in (JOB_SUCCEEDED, JOB_FAILED)
+                if finished:
+                    os.remove(path)
+            except (OSError, ValueError, KeyError):
+                continue
+
+
+class TrainingJobQueue:
+    """
+    后台训练任务队列。
+
+    训练在进程池中执行，请求线程提交后立即返回任务ID；
+    相同数据与参数的任务在执行期间只会提交一次。
+    任务状态、进度与结果保存在模型仓库的 jobs 目录中（见 JobStore），可由任意Web工作进程查询。
+    """
+
+    def __init__(self, registry_dir, max_workers=1, max_history=100, parallelism=None, reload_guard=None):
+        """
+        :param registry_dir: 模型仓库目录，工作进程直接向其中注册新版本
+        :param max_workers: 训练进程数量
+        :param max_history: 内存中保留的已完成任务数量
+        :param parallelism: 每个训练任务的并行度配置 (TrainingParallelism)
+        :param reload_guard: serving.ReloadGuard，任务从提交到完成（含回调）期间登记，推迟平滑重启
+        """
+        self.registry_dir = registry_dir
+        self.max_workers = max_workers
+        self.max_history = max_history
+        self.parallelism = parallelism or TrainingParallelism(training_workers=max_workers)
+        self.reload_guard = reload_guard
+        self.store = JobStore(os.path.join(registry_dir, JOBS_DIR))
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._inflight = {}
+        self._executor = None
+        self._callbacks = []
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=process_context())
+
+    def _start(self, job, fn, *args):
+        """记录新任务并提交 fn(job_id, *args) 到进程池（调用方持有锁）"""
+        self._ensure_started()
+        if self.reload_guard is not None:
+            job.hold = self.reload_guard.acquire(f'job-{job.job_id}')
+        self._jobs[job.job_id] = job
+        self._inflight[job.key] = job.job_id
+        self.store.save(job.to_dict())
+        try:
+            job.future = self._executor.submit(fn, job.job_id, *args)
+        except Exception as e:
+            self._inflight.pop(job.key, None)
+            job.status, job.error, job.finished_at = JOB_FAILED, str(e), time.time()
+            self.store.save(job.to_dict())
+            if self.reload_guard is not None:
+                self.reload_guard.release(job.hold)
+            raise
+
+    def add_done_callback(self, callback):
+        """注册任务成功后的回调 callback(job)，在后台线程中调用"""
+        self._callbacks.append(callback)
+
+    def submit(self, df, dataset_key=None, target_column='stress_level', params=None,
+               mode=MODE_FULL, baseline=False, profile_memory=False):
+        """
+        提交训练任务。
+
+        :param df: 训练数据
+        :param dataset_key: 数据集版本标识，用于识别重复任务
+        :param target_column: 目标列名称
+        :param params: 模型超参数
+        :param mode: 训练方式，见 TRAINING_MODES
+        :param baseline: 增量训练时是否同时全量重训作为准确率基线
+        :param profile_memory: 是否记录训练的内存分配，报告见结果的 memory_profile
+        :return: (TrainingJob, 是否新建)
+        """
+        params = {**DEFAULT_MODEL_PARAMS, **(params or {})}
+        key = json.dumps([dataset_key, target_column, params, mode, bool(baseline)], sort_keys=True, default=str)
+
+        with self._lock:
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                return self._jobs[job_id], False
+
+            job = TrainingJob(uuid.uuid4().hex, key, params, mode)
+            self._start(job, _run_training_job, df, target_column, params, self.registry_dir, self.store,
+                        mode, baseline, self.parallelism, profile_memory)
+            self._trim_history()
+
+        job.future.add_done_callback(lambda future, job=job: self._on_done(job, future))
+        return job, True
+
+    def submit_tuning(self, df, dataset_key=None, target_column='stress_level', options=None,
+                      profile_memory=False):
+        """
+        提交超参数搜索任务，完成后注册最佳参数训练的模型版本。
+
+        :param options: model_tuning.tune 的参数（param_grid、method、cv、n_jobs、time_budget、patience、target_score）
+        :param profile_memory: 是否记录搜索与训练的内存分配，报告见结果的 memory_profile
+        :return: (TrainingJob, 是否新建)
+        """
+        options = dict(options or {})
+        key = json.dumps([dataset_key, target_column, MODE_TUNE, options], sort_keys=True, default=str)
+
+        with self._lock:
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                return self._jobs[job_id], False
+
+            job = TrainingJob(uuid.uuid4().hex, key, options, MODE_TUNE)
+            self._start(job, _run_tuning_job, df, target_column, options, self.registry_dir, self.store,
+                        self.parallelism, profile_memory)
+            self._trim_history()
+
+        job.future.add_done_callback(lambda future, job=job: self._on_done(job, future))
+        return job, True
+
+    def _on_done(self, job, future):
+        try:
+            with self._lock:
+                self._inflight.pop(job.key, None)
+                job.finished_at = time.time()
+                error = future.exception()
+                if error is None:
+                    job.status = JOB_SUCCEEDED
+                    job.result = future.result()
+                else:
+                    job.status = JOB_FAILED
+                    job.error = str(error)
+                    print(f"训练任务 {job.job_id} 失败: {error}")
+                state = self.store.load(job.job_id) or job.to_dict()
+                state.update(status=job.status, finished_at=job.finished_at, result=job.result, error=job.error)
+                self.store.save(state)
+                self.store.prune()
+
+            if job.status == JOB_SUCCEEDED:
+                for callback in self._callbacks:
+                    try:
+                        callback(job)
+                    except Exception as e:
+                        print(f"训练任务回调出错: {e}")
+        finally:
+            # 回调（如启动预渲染）自行登记，之后再结束本任务的登记
+            if self.reload_guard is not None:
+                self.reload_guard.release(job.hold)
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in (JOB_SUCCEEDED, JOB_FAILED)]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """获取任务状态字典（包括其他Web工作进程提交的任务），任务不存在时返回 None"""
+        return self.store.load(job_id)
+
+    def active(self):
+        """本进程中尚未完成的任务数量"""
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self, wait=True):
+        """关闭进程池；wait 为 True 时等待进行中的任务完成"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
@@ -0,0 +1,160 @@
+"""
+训练并行度配置。
+
+随机森林的决策树可以并行训练。TrainingParallelism 根据可用CPU核数、Web服务的工作进程数
+与同时运行的训练任务数计算每次训练可用的并行度，并按内存上限进一步限制，避免多个进程
+同时训练时超额占用主机。
+
+并行度通过 joblib 的上下文配置生效，模型本身的 n_jobs 保持默认值，
+注册后的模型在线推理时仍然单线程执行。
+"""
+import multiprocessing
+import os
+import resource
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from joblib import parallel_config
+from joblib.externals.loky import get_reusable_executor
+
+BACKEND_THREADS = 'threads'
+BACKEND_PROCESSES = 'processes'
+BACKENDS = (BACKEND_THREADS, BACKEND_PROCESSES)
+
+# joblib 后端名称
+_JOBLIB_BACKENDS = {
+    BACKEND_THREADS: 'threading',
+    BACKEND_PROCESSES: 'loky',
+}
+
+# 内存估算
+WORKER_BYTES_PER_ROW = 32                   # 每个并行单元训练一棵树时每行的临时内存（自助采样索引、样本权重与排序缓冲）
+PROCESS_WORKER_OVERHEAD = 150 * 1024 ** 2   # 每个工作进程的解释器与依赖库常驻内存
+
+
+def available_cpus():
+    """当前进程可用的CPU核数（考虑CPU亲和性限制）"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def process_context():
+    """
+    进程池使用的多进程上下文。
+
+    Web 服务进程是多线程的，fork 会把其他线程正持有的锁原样复制进子进程；优先使用 forkserver
+    （工作进程由单线程的服务进程 fork 出），不支持时（Windows）使用 spawn。
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def data_nbytes(X):
+    """数组或 DataFrame 占用的字节数"""
+    if hasattr(X, 'memory_usage'):
+        return int(X.memory_usage(index=False).sum())
+    return int(X.nbytes)
+
+
+def estimate_worker_memory(X, backend):
+    """
+    估算每增加一个并行单元所需的内存字节数。
+
+    线程共享训练数据，只需要临时缓冲；进程各自持有一份训练数据副本与解释器开销。
+    """
+    working = len(X) * WORKER_BYTES_PER_ROW
+    if backend == BACKEND_PROCESSES:
+        return working + data_nbytes(X) + PROCESS_WORKER_OVERHEAD
+    return working
+
+
+def _cpu_seconds():
+    """本进程与已回收子进程的累计CPU时间（用户态+内核态）"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+@dataclass
+class TrainingParallelism:
+    """
+    训练并行度配置。
+
+    :param backend: 'threads' 在训练进程内用线程并行（共享数据，内存开销小），
+                    'processes' 用独立进程并行（不受GIL限制，内存开销大）
+    :param n_jobs: 每次训练的并行单元数，None 表示按CPU预算自动确定
+    :param max_memory_mb: 训练可使用的内存上限（MB），None 表示不限制
+    :param web_workers: Web服务的工作进程数，每个进程都可能同时训练
+    :param training_workers: 每个Web进程中同时运行的训练任务数
+    """
+    backend: str = BACKEND_THREADS
+    n_jobs: int = None
+    max_memory_mb: float = None
+    web_workers: int = 1
+    training_workers: int = 1
+
+    def __post_init__(self):
+        if self.backend not in BACKENDS:
+            raise ValueError(f'backend 必须是以下之一: {", ".join(BACKENDS)}')
+
+    def cpu_budget(self):
+        """每个训练任务可用的CPU核数：可用核数平均分给所有可能同时运行的训练任务"""
+        concurrent_jobs = max(1, self.web_workers) * max(1, self.training_workers)
+        return max(1, available_cpus() // concurrent_jobs)
+
+    def resolve_n_jobs(self, X=None):
+        """
+        计算本次训练的并行单元数。
+
+        :param X: 训练特征矩阵，用于按内存上限限制并行度
+        :return: 并行单元数（至少为1）
+        """
+        budget = self.cpu_budget()
+        n_jobs = min(self.n_jobs, budget) if self.n_jobs else budget
+        if self.max_memory_mb and X is not None:
+            available = self.max_memory_mb * 1024 ** 2 - data_nbytes(X)
+            per_worker = max(1, estimate_worker_memory(X, self.backend))
+            n_jobs = min(n_jobs, max(1, int(available // per_worker)))
+        return max(1, n_jobs)
+
+    @contextmanager
+    def fitting(self, X=None):
+        """
+        在上下文中执行的随机森林训练使用配置的并行后端与并行度，并统计耗时。
+
+        用法::
+
+            with parallelism.fitting(X_train) as usage:
+                model.fit(X_train, y_train)
+            print(usage['wall_seconds'], usage['cpu_seconds'])
+
+        :return: 统计字典，上下文结束后填入 wall_seconds、cpu_seconds 与 cpu_utilization
+        """
+        n_jobs = self.resolve_n_jobs(X)
+        usage = {'backend': self.backend, 'n_jobs': n_jobs}
+        wall_started, cpu_started = time.perf_counter(), _cpu_seconds()
+        try:
+            with parallel_config(backend=_JOBLIB_BACKENDS[self.backend], n_jobs=n_jobs):
+                yield usage
+        finally:
+            if self.backend == BACKEND_PROCESSES and n_jobs > 1:
+                # 回收工作进程，使其CPU时间计入 RUSAGE_CHILDREN
+                get_reusable_executor().shutdown(wait=True)
+            wall = time.perf_counter() - wall_started
+            cpu = _cpu_seconds() - cpu_started
+            usage.update(wall_seconds=wall, cpu_seconds=cpu,
+                         cpu_utilization=cpu / wall if wall > 0 else None)
+
+    def to_dict(self):
+        return {
+            'backend': self.backend,
+            'n_jobs': self.n_jobs,
+            'max_memory_mb': self.max_memory_mb,
+            'web_workers': self.web_workers,
+            'training_workers': self.training_workers,
+            'available_cpus': available_cpus(),
+            'cpu_budget': self.cpu_budget(),
+        }
@@ -1,14 +1,406 @@
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+import argparse
+import datetime
 import os
+import queue
+import shutil
 import sys
 import tempfile
+import threading
+
+from hive_pool import create_hive_engine
+
+# 流式上传配置
+DEFAULT_CHUNK_ROWS = 100000   # 每个分块（即每个分区文件）的行数
+SCHEMA_SAMPLE_ROWS = 10000    # 推断表结构时读取的样本行数
+PIPELINE_DEPTH = 2            # 相邻阶段之间最多缓冲的分块数，决定内存上限
+
+# 表存储格式与对应的压缩属性
+STORAGE_FORMATS = ('TEXTFILE', 'ORC', 'PARQUET')
+COMPRESSION_PROPERTIES = {
+    'ORC': 'orc.compress',            # NONE / ZLIB / SNAPPY / ZSTD
+    'PARQUET': 'parquet.compression',  # UNCOMPRESSED / SNAPPY / GZIP / ZSTD
+}
+
+# 按上传日期分区时使用的分区列（不在CSV中，由上传时写入）
+INGEST_DATE_COLUMN = 'ingest_date'
+
+# Hive 类型对应的 pandas 读取类型；INT 使用可空整数，缺失值不会把整列变成浮点
+PANDAS_READ_TYPES = {
+    'INT': 'Int64',
+    'DOUBLE': 'float64',
+    'STRING': 'string',
+}
+
+
+def hive_type(dtype):
+    """将pandas数据类型映射到Hive数据类型"""
+    if 'int' in str(dtype):
+        return 'INT'
+    elif 'float' in str(dtype):
+        return 'DOUBLE'
+    else:
+        return 'STRING'
+
+
+def infer_schema(csv_file_path, sample_rows=SCHEMA_SAMPLE_ROWS):
+    """
+    根据CSV文件开头的样本推断表结构，整个上传过程都使用该结构，保证各分块类型一致
+
+    参数:
+        csv_file_path (str): CSV文件的路径
+        sample_rows (int): 样本行数
+
+    返回:
+        list: [(列名, Hive类型), ...]
+    """
+    sample = pd.read_csv(csv_file_path, nrows=sample_rows)
+    return [(col_name, hive_type(dtype)) for col_name, dtype in sample.dtypes.items()]
+
+
+def partition_schema(schema, partition_by):
+    """
+    拆分普通列与分区列
+
+    参数:
+        schema (list): 表结构，见 infer_schema
+        partition_by (list): 分区列名，可以是表中的列或 INGEST_DATE_COLUMN
+
+    返回:
+        tuple: (普通列结构, 分区列结构)
+    """
+    types = dict(schema)
+    partitions = []
+    for col_name in partition_by or []:
+        if col_name == INGEST_DATE_COLUMN and col_name not in types:
+            partitions.append((col_name, 'STRING'))
+        elif col_name in types:
+            partitions.append((col_name, types[col_name]))
+        else:
+            raise ValueError(f"分区列 '{col_name}' 不存在")
+    partition_names = {col_name for col_name, _ in partitions}
+    return [column for column in schema if column[0] not in partition_names], partitions
+
+
+def create_table_sql(table_name, schema, storage_format='TEXTFILE', compression=None,
+                     partition_by=None, bucket_by=None, num_buckets=None):
+    """
+    生成建表语句
+
+    参数:
+        table_name (str): 表名
+        schema (list): 表结构，见 infer_schema
+        storage_format (str): 存储格式，见 STORAGE_FORMATS
+        compression (str): 列式格式的压缩算法，如 SNAPPY、ZLIB、ZSTD
+        partition_by (list): 分区列名
+        bucket_by (list): 分桶列名
+        num_buckets (int): 分桶数量
+
+    返回:
+        str: CREATE TABLE 语句
+    """
+    storage_format = storage_format.upper()
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"不支持的存储格式: {storage_format}")
+    if compression and storage_format not in COMPRESSION_PROPERTIES:
+        raise ValueError(f"{storage_format} 格式不支持压缩选项")
+    if bucket_by and not num_buckets:
+        raise ValueError("分桶时必须指定分桶数量")
+
+    columns, partitions = partition_schema(schema, partition_by)
+    missing = [col_name for col_name in bucket_by or [] if col_name not in dict(columns)]
+    if missing:
+        raise ValueError(f"分桶列必须是非分区列: {', '.join(missing)}")
+    sql = f"CREATE TABLE IF NOT EXISTS `{table_name}` (\n"
+    sql += ',\n'.join(f"    `{col_name}` {col_type}" for col_name, col_type in columns)
+    sql += "\n)\n"
+    if partitions:
+        sql += f"PARTITIONED BY ({', '.join(f'`{col_name}` {col_type}' for col_name, col_type in partitions)})\n"
+    if bucket_by:
+        sql += f"CLUSTERED BY ({', '.join(f'`{col_name}`' for col_name in bucket_by)}) INTO {int(num_buckets)} BUCKETS\n"
+    if storage_format == 'TEXTFILE':
+        sql += "ROW FORMAT DELIMITED\nFIELDS TERMINATED BY ','\n"
+    sql += f"STORED AS {storage_format}"
+    if compression:
+        sql += f"\nTBLPROPERTIES ('{COMPRESSION_PROPERTIES[storage_format]}'='{compression.upper()}')"
+    return sql
+
+
+def create_table(conn, table_name, schema, replace=True, **options):
+    """
+    创建Hive表，options 见 create_table_sql
+
+    参数:
+        replace (bool): 是否先删除已存在的表；False 时保留已有的表及其分区
+    """
+    if replace:
+        # 如果表已存在，先删除 - 使用text()包装SQL字符串
+        conn.execute(text(f"DROP TABLE IF EXISTS `{table_name}`"))
+    conn.execute(text(create_table_sql(table_name, schema, **options)))
+
+
+def partitioned_by_ingest_date(schema, partition_by):
+    """
+    是否按上传日期分区（分区列 INGEST_DATE_COLUMN 不在数据中，由上传时写入）
+
+    此时目标表保留历史分区，每次上传只覆盖当天的分区。上传日期作为静态分区写入，
+    Hive 要求静态分区列位于动态分区列之前，因此它必须是第一个分区列。
+
+    返回:
+        bool: 是否按上传日期分区
+    """
+    _, partitions = partition_schema(schema, partition_by)
+    names = [col_name for col_name, _ in partitions]
+    if INGEST_DATE_COLUMN not in names or INGEST_DATE_COLUMN in dict(schema):
+        return False
+    if names[0] != INGEST_DATE_COLUMN:
+        raise ValueError(f"{INGEST_DATE_COLUMN} 必须是第一个分区列")
+    return True
+
+
+def insert_from_staging(conn, staging_table, table_name, schema, partition_by=None, ingest_date=None):
+    """
+    将文本格式的暂存表转换写入目标表（列式格式、分区与分桶由目标表定义决定）
+
+    LOAD DATA 只能原样移动文件，无法生成ORC/Parquet文件或按分区、分桶拆分数据，
+    因此先加载到暂存表，再由Hive执行一次 INSERT OVERWRITE ... SELECT 完成转换。
+    按上传日期分区时该日期为静态分区，INSERT OVERWRITE 只覆盖这一天的分区。
+    """
+    columns, partitions = partition_schema(schema, partition_by)
+    select_list = [f"`{col_name}`" for col_name, _ in columns]
+    partition_spec = []
+    dynamic = False
+    for col_name, _ in partitions:
+        if col_name == INGEST_DATE_COLUMN and col_name not in dict(schema):
+            partition_spec.append(f"`{col_name}`='{ingest_date or datetime.date.today().isoformat()}'")
+        else:
+            # 动态分区：分区值由 SELECT 的最后几列决定
+            select_list.append(f"`{col_name}`")
+            partition_spec.append(f"`{col_name}`")
+            dynamic = True
+
+    partition_clause = ''
+    if partitions:
+        if dynamic:
+            conn.execute(text("SET hive.exec.dynamic.partition=true"))
+            conn.execute(text("SET hive.exec.dynamic.partition.mode=nonstrict"))
+        partition_clause = f" PARTITION ({', '.join(partition_spec)})"
+
+    conn.execute(text(f"INSERT OVERWRITE TABLE `{table_name}`{partition_clause} "
+                      f"SELECT {', '.join(select_list)} FROM `{staging_table}`"))
+
+
+def load_local_file(conn, table_name, file_path):
+    """使用LOAD DATA语句将本地文件追加到表中"""
+    # 在Windows上，需要将路径转换为适合Hive的格式
+    hive_path = file_path.replace('\\', '/')
+    load_data_sql = f"""
+    LOAD DATA LOCAL INPATH '{hive_path}'
+    INTO TABLE `{table_name}`
+    """
+    conn.execute(text(load_data_sql))
+
+
+def print_progress(progress):
+    """默认的进度输出"""
+    percent = f" ({progress['bytes_read'] / progress['total_bytes'] * 100:.1f}%)" if progress['total_bytes'] else ''
+    print(f"已读取 {progress['rows_read']} 行{percent}，"
+          f"已写入 {progress['files_written']} 个分区文件，已加载 {progress['rows_loaded']} 行")
+
+
+class _Stage(threading.Thread):
+    """流水线中的一个阶段：从输入队列取分块，处理后放入输出队列；None 表示结束"""
+
+    def __init__(self, name, handler, inbox, outbox=None):
+        super().__init__(name=name, daemon=True)
+        self.handler = handler
+        self.inbox = inbox
+        self.outbox = outbox
+        self.error = None
+
+    def run(self):
+        try:
+            while True:
+                item = self.inbox.get()
+                if item is None:
+                    break
+                result = self.handler(item)
+                if self.outbox is not None:
+                    self.outbox.put(result)
+        except Exception as e:
+            self.error = e
+            # 出错后继续取走上游的分块，避免上游阻塞在已满的队列上
+            while self.inbox.get() is not None:
+                pass
+        finally:
+            if self.outbox is not None:
+                self.outbox.put(None)
+
+
+def stream_chunks_to_table(conn, chunks, table_name, schema, progress=print_progress, total_bytes=0, tell=None):
+    """
+    分块流式地将数据加载到已创建的表中
+
+    写分区文件、LOAD DATA 两个阶段在后台线程中与产生分块的调用方并行执行，阶段之间通过有界队列连接，
+    内存中最多同时存在约 (2 * PIPELINE_DEPTH + 3) 个分块，与数据总量无关。
+    每个分块写为一个分区文件，加载完成后立即删除。
+
+    参数:
+        conn: Hive连接
+        chunks (iterable): 依次产生的 DataFrame 分块，列顺序须与表结构一致
+        table_name (str): 目标表名
+        schema (list): 表结构，见 infer_schema
+        progress (callable): 进度回调，每加载完一个分块调用一次，参数为进度字典；None 表示不报告
+        total_bytes (int): 数据源的总字节数，用于计算进度百分比；0 表示未知
+        tell (callable): 返回数据源当前已读取字节数的函数；None 表示不统计
+
+    返回:
+        int: 加载的行数
+    """
+    state = {
+        'rows_read': 0,
+        'bytes_read': 0,
+        'total_bytes': total_bytes,
+        'files_written': 0,
+        'rows_loaded': 0,
+    }
+    lock = threading.Lock()
+
+    def report(notify=False, **updates):
+        with lock:
+            for key, value in updates.items():
+                state[key] += value
+            snapshot = dict(state)
+        if notify and progress is not None:
+            progress(snapshot)
+
+    work_dir = tempfile.mkdtemp(prefix=f'{table_name}_')
+    columns = [col_name for col_name, _ in schema]
+
+    def write_part(item):
+        index, chunk = item
+        part_path = os.path.join(work_dir, f'part-{index:05d}.csv')
+        # 保存分块到分区文件（不包含标题行）
+        chunk.to_csv(part_path, index=False, header=False)
+        report(files_written=1)
+        return part_path, len(chunk)
+
+    def load_part(item):
+        part_path, rows = item
+        load_local_file(conn, table_name, part_path)
+        os.unlink(part_path)
+        report(notify=True, rows_loaded=rows)
+
+    to_writer = queue.Queue(maxsize=PIPELINE_DEPTH)
+    to_loader = queue.Queue(maxsize=PIPELINE_DEPTH)
+    writer = _Stage('csv-part-writer', write_part, to_writer, to_loader)
+    loader = _Stage('hive-loader', load_part, to_loader)
+    writer.start()
+    loader.start()
+
+    try:
+        for index, chunk in enumerate(chunks):
+            if list(chunk.columns) != columns:
+                raise ValueError(f"第 {index} 个分块的列与表结构不一致")
+            report(rows_read=len(chunk), bytes_read=tell() - state['bytes_read'] if tell else 0)
+            if writer.error is not None or loader.error is not None:
+                break
+            to_writer.put((index, chunk))
+    finally:
+        to_writer.put(None)
+        writer.join()
+        loader.join()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for stage in (writer, loader):
+        if stage.error is not None:
+            raise stage.error
+    return state['rows_loaded']
+
+
+def stream_csv_to_table(conn, csv_file_path, table_name, schema, chunk_size=DEFAULT_CHUNK_ROWS,
+                        progress=print_progress):
+    """
+    分块流式地将CSV文件加载到已创建的表中，读取阶段与写分区文件、LOAD DATA 并行执行
+
+    参数:
+        conn: Hive连接
+        csv_file_path (str): CSV文件的路径
+        table_name (str): 目标表名
+        schema (list): 表结构，见 infer_schema
+        chunk_size (int): 每个分块的行数
+        progress (callable): 进度回调，见 stream_chunks_to_table
+
+    返回:
+        int: 加载的行数
+    """
+    dtypes = {col_name: PANDAS_READ_TYPES[col_type] for col_name, col_type in schema}
+    with open(csv_file_path, 'rb') as f:
+        # 每个分块按表结构转换类型
+        reader = pd.read_csv(f, chunksize=chunk_size, dtype=dtypes)
+        return stream_chunks_to_table(conn, reader, table_name, schema, progress,
+                                      total_bytes=os.path.getsize(csv_file_path), tell=f.tell)
+
+
+def _upload_to_hive(load, table_name, hive_host, hive_port, hive_user, hive_database,
+                    storage_format='TEXTFILE', compression=None, partition_by=None, bucket_by=None,
+                    num_buckets=None):
+    """
+    连接Hive，调用 load(conn, load_table) 将数据加载到文本格式的表中（返回表结构），
+    需要时再转换写入目标格式、分区与分桶的目标表
+
+    返回:
+        bool: 上传是否成功
+    """
+    try:
+        # 创建Hive连接
+        print(f"正在连接到Hive: {hive_host}:{hive_port}/{hive_database}")
+        # 使用连接池引擎：服务不可达时快速失败；LOAD DATA 与 INSERT OVERWRITE 可能耗时较长，不设查询超时
+        engine = create_hive_engine(f'hive://{hive_user}@{hive_host}:{hive_port}/{hive_database}',
+                                    pool_size=1, max_overflow=0, query_timeout=None)
+        conn = engine.connect()
+
+        # 文本格式且不分区、不分桶时直接加载到目标表，否则先加载到文本格式的暂存表再转换
+        table_options = {'storage_format': storage_format, 'compression': compression,
+                         'partition_by': partition_by, 'bucket_by': bucket_by, 'num_buckets': num_buckets}
+        direct = storage_format.upper() == 'TEXTFILE' and not partition_by and not bucket_by
+        load_table = table_name if direct else f'{table_name}__staging'
+
+        schema = load(conn, load_table)
+
+        if not direct:
+            # 按上传日期分区时保留已有的表与其他日期的分区，否则整表替换
+            append = partitioned_by_ingest_date(schema, partition_by)
+            print(f"正在{'创建（已存在时保留）' if append else '创建或替换'}表: {table_name}（{storage_format.upper()}）")
+            create_table(conn, table_name, schema, replace=not append, **table_options)
+            print(f"正在将暂存数据转换写入表: {table_name}")
+            try:
+                insert_from_staging(conn, load_table, table_name, schema, partition_by)
+            finally:
+                conn.execute(text(f"DROP TABLE IF EXISTS `{load_table}`"))
+
+        # 验证数据是否已加载
+        result = conn.execute(text(f"SELECT COUNT(*) FROM `{table_name}`"))
+        count = result.fetchone()[0]
+
+        print(f"成功上传 {count} 行数据到 {table_name}")
+        return True
+
+    except Exception as e:
+        print(f"上传过程中发生错误: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 
 def upload_csv_to_hive(csv_file_path, table_name, hive_host='localhost', hive_port=10005,
-                      hive_user='24130', hive_database='default'):
+                      hive_user='24130', hive_database='default', chunk_size=None,
+                      progress=print_progress, storage_format='TEXTFILE', compression=None,
+                      partition_by=None, bucket_by=None, num_buckets=None):
     """
     将本地CSV文件上传到Hive表中
-    
+
     参数:
         csv_file_path (str): CSV文件的路径
         table_name (str): 要上传到的Hive表名
@@ -16,99 +408,113 @@ def upload_csv_to_hive(csv_file_path, table_name, hive_host='localhost', hive_po
         hive_port (int): Hive服务器端口
         hive_user (str): Hive用户名
         hive_database (str): Hive数据库名
-    
+        chunk_size (int): 流式上传时每个分块的行数；None 表示一次性读取整个文件
+        progress (callable): 流式上传的进度回调
+        storage_format (str): 表存储格式：TEXTFILE、ORC 或 PARQUET
+        compression (str): ORC/PARQUET 的压缩算法，如 SNAPPY、ZLIB、ZSTD
+        partition_by (list): 分区列，如 ['stress_level'] 或 [INGEST_DATE_COLUMN]
+        bucket_by (list): 分桶列
+        num_buckets (int): 分桶数量
+
     返回:
         bool: 上传是否成功
     """
-    try:
-        # 检查CSV文件是否存在
-        if not os.path.exists(csv_file_path):
-            print(f"错误: 文件 '{csv_file_path}' 不存在")
-            return False
-        
+    # 检查CSV文件是否存在
+    if not os.path.exists(csv_file_path):
+        print(f"错误: 文件 '{csv_file_path}' 不存在")
+        return False
+
+    def load(conn, load_table):
+        if chunk_size:
+            # 流式上传：根据样本确定表结构，分块读取、写入并加载
+            print(f"正在推断表结构: {csv_file_path}")
+            schema = infer_schema(csv_file_path)
+            print(f"正在创建或替换表: {load_table}")
+            create_table(conn, load_table, schema)
+            print(f"正在分块加载数据到表: {load_table}（每块 {chunk_size} 行）")
+            stream_csv_to_table(conn, csv_file_path, load_table, schema, chunk_size, progress)
+            return schema
+
         # 读取CSV文件
         print(f"正在读取CSV文件: {csv_file_path}")
         df = pd.read_csv(csv_file_path)
-        
-        # 创建Hive连接
-        print(f"正在连接到Hive: {hive_host}:{hive_port}/{hive_database}")
-        engine = create_engine(f'hive://{hive_user}@{hive_host}:{hive_port}/{hive_database}')
-        conn = engine.connect()
-        
+
         # 方法1：使用CREATE TABLE语句创建表结构
-        print(f"正在创建或替换表: {table_name}")
-        
-        # 获取列名和数据类型
-        columns = []
-        for col_name, dtype in df.dtypes.items():
-            # 将pandas数据类型映射到Hive数据类型
-            if 'int' in str(dtype):
-                hive_type = 'INT'
-            elif 'float' in str(dtype):
-                hive_type = 'DOUBLE'
-            else:
-                hive_type = 'STRING'
-            columns.append(f"`{col_name}` {hive_type}")
-        
-        # 创建表
-        create_table_sql = f"""
-        CREATE TABLE IF NOT EXISTS `{table_name}` (
-            {', '.join(columns)}
-        )
-        ROW FORMAT DELIMITED
-        FIELDS TERMINATED BY ','
-        STORED AS TEXTFILE
-        """
-        
-        # 如果表已存在，先删除 - 使用text()包装SQL字符串
-        conn.execute(text(f"DROP TABLE IF EXISTS `{table_name}`"))
-        conn.execute(text(create_table_sql))
-        
+        print(f"正在创建或替换表: {load_table}")
+        schema = [(col_name, hive_type(dtype)) for col_name, dtype in df.dtypes.items()]
+        create_table(conn, load_table, schema)
+
         # 方法2：将数据保存为临时CSV文件，然后使用LOAD DATA语句加载
         # 创建临时文件
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
         temp_file_path = temp_file.name
         temp_file.close()
-        
+
         # 保存数据到临时CSV文件（不包含标题行）
         df.to_csv(temp_file_path, index=False, header=False)
-        
-        # 构建LOAD DATA语句的本地文件路径
-        # 在Windows上，需要将路径转换为适合Hive的格式
-        hive_path = temp_file_path.replace('\\', '/')
-        
+        del df
+
         # 加载数据
-        print(f"正在将数据加载到表: {table_name}")
-        load_data_sql = f"""
-        LOAD DATA LOCAL INPATH '{hive_path}'
-        INTO TABLE `{table_name}`
-        """
-        
-        conn.execute(text(load_data_sql))
-        
+        print(f"正在将数据加载到表: {load_table}")
+        load_local_file(conn, load_table, temp_file_path)
+
         # 清理临时文件
         os.unlink(temp_file_path)
-        
-        # 验证数据是否已加载
-        result = conn.execute(text(f"SELECT COUNT(*) FROM `{table_name}`"))
-        count = result.fetchone()[0]
-        
-        print(f"成功上传 {count} 行数据到 {table_name}")
-        return True
-        
-    except Exception as e:
-        print(f"上传过程中发生错误: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
+        return schema
+
+    return _upload_to_hive(load, table_name, hive_host, hive_port, hive_user, hive_database,
+                           storage_format, compression, partition_by, bucket_by, num_buckets)
+
+
+def upload_chunks_to_hive(chunks, schema, table_name, hive_host='localhost', hive_port=10005,
+                          hive_user='24130', hive_database='default', progress=print_progress,
+                          storage_format='TEXTFILE', compression=None, partition_by=None,
+                          bucket_by=None, num_buckets=None):
+    """
+    将依次产生的 DataFrame 分块（如合成数据生成器的输出）流式上传到Hive表中，不经过本地CSV文件
+
+    参数:
+        chunks (iterable): DataFrame 分块，列顺序须与表结构一致
+        schema (list): 表结构 [(列名, Hive类型)]
+        其余参数见 upload_csv_to_hive
+
+    返回:
+        bool: 上传是否成功
+    """
+    def load(conn, load_table):
+        print(f"正在创建或替换表: {load_table}")
+        create_table(conn, load_table, schema)
+        print(f"正在分块加载数据到表: {load_table}")
+        stream_chunks_to_table(conn, chunks, load_table, schema, progress)
+        return schema
+
+    return _upload_to_hive(load, table_name, hive_host, hive_port, hive_user, hive_database,
+                           storage_format, compression, partition_by, bucket_by, num_buckets)
+
 
 if __name__ == '__main__':
-    # 设置文件路径和表名
-    csv_file_path = r'C:\Users\24130\Desktop\stress-prediction-frontend\StressLevelDataset.csv'
-    table_name = 'stress_level_dataset'
-    
-    # 调用上传函数
-    success = upload_csv_to_hive(csv_file_path, table_name)
-    
+    # 默认上传仓库根目录的 ShapCompatibleDataset.csv（后端在 Hive 不可用时读取的同一份数据）
+    default_csv = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'ShapCompatibleDataset.csv')
+    parser = argparse.ArgumentParser(description='上传CSV文件到Hive表')
+    parser.add_argument('csv_file_path', nargs='?', default=default_csv, help='CSV文件的路径')
+    parser.add_argument('--table', default='stress_level_dataset', help='Hive表名')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='流式上传的分块行数，0 表示一次性读取整个文件')
+    parser.add_argument('--format', default='TEXTFILE', choices=STORAGE_FORMATS, type=str.upper,
+                        help='表存储格式')
+    parser.add_argument('--compression', help='ORC/PARQUET 的压缩算法，如 SNAPPY、ZLIB、ZSTD')
+    parser.add_argument('--partition-by', nargs='+',
+                        help=f'分区列，如 stress_level 或 {INGEST_DATE_COLUMN}（按上传日期）')
+    parser.add_argument('--bucket-by', nargs='+', help='分桶列')
+    parser.add_argument('--buckets', type=int, help='分桶数量')
+    args = parser.parse_args()
+
+    # 调用上传函数（默认分块流式上传，内存占用与文件大小无关）
+    success = upload_csv_to_hive(args.csv_file_path, args.table, chunk_size=args.chunk_size or None,
+                                 storage_format=args.format, compression=args.compression,
+                                 partition_by=args.partition_by, bucket_by=args.bucket_by,
+                                 num_buckets=args.buckets)
+
     # 根据上传结果设置退出代码
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    sys.exit(0 if success else 1)
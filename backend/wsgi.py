@@ -0,0 +1,17 @@
+"""
+WSGI 入口。
+
+gunicorn 通过应用工厂创建应用（见 gunicorn.conf.py）::
+
+    cd backend && gunicorn -c gunicorn.conf.py
+
+配置了 preload_app 时工厂只在主进程中调用一次：预热后的模型与数据由 fork 出的工作进程共享。
+"""
+
+
+def create_app():
+    """导入应用并预热，返回 Flask 应用"""
+    import app as backend
+
+    backend.warm_up()
+    return backend.app